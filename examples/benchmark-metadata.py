@@ -0,0 +1,25 @@
+"""Benchmark that measures opening a tomogram with cold and warm metadata caches."""
+import os
+import tempfile
+import time
+
+from cryoet_data_portal import Client, Tomogram
+
+from napari_cryoet_data_portal import _store
+from napari_cryoet_data_portal._cache import CACHE_DIR_ENV
+from napari_cryoet_data_portal._reader import read_tomogram_ome_zarr
+
+tomogram = Client().find_one(Tomogram)
+path = tomogram.https_omezarr_dir
+
+# Use an empty, temporary persistent cache, so that the first open is cold.
+with tempfile.TemporaryDirectory() as cache_dir:
+    os.environ[CACHE_DIR_ENV] = cache_dir
+    for label in ("cold", "warm"):
+        _store._CACHE.clear()
+        store = _store.open_store(path)
+        start = time.perf_counter()
+        _store.preload_metadata(store)
+        read_tomogram_ome_zarr(path)
+        seconds = time.perf_counter() - start
+        print(f"{label}: {store.fetch_count} metadata requests, {seconds:.2f} s")
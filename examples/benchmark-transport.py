@@ -0,0 +1,40 @@
+"""Benchmark that compares reading a tomogram over HTTPS and anonymous S3.
+
+To compare against a local S3-compatible server (e.g. MinIO or moto) with a
+copy of the portal's bucket instead of AWS, pass its URL as the first argument.
+The transport that the "auto" mode would then choose from the throughput it
+measured during those reads is printed last, and should be the faster one.
+"""
+import sys
+import time
+
+import numpy as np
+from cryoet_data_portal import Client, Tomogram
+
+from napari_cryoet_data_portal import _session, _store
+from napari_cryoet_data_portal._reader import read_tomogram
+from napari_cryoet_data_portal._session import (
+    AUTO_TRANSPORT,
+    HTTPS_TRANSPORT,
+    S3_TRANSPORT,
+    HttpOptions,
+    portal_url,
+    set_http_options,
+)
+
+endpoint_url = sys.argv[1] if len(sys.argv) > 1 else None
+tomogram = Client().find_one(Tomogram)
+_session._THROUGHPUT.clear()
+
+for transport in (HTTPS_TRANSPORT, S3_TRANSPORT):
+    set_http_options(HttpOptions(transport=transport, s3_endpoint_url=endpoint_url))
+    _store._CACHE.clear()
+    start = time.perf_counter()
+    data, _, _ = read_tomogram(tomogram)
+    nbytes = np.asarray(data[1]).nbytes
+    seconds = time.perf_counter() - start
+    print(f"{transport}: {nbytes / seconds / 2**20:.1f} MiB/s ({seconds:.2f} s)")
+
+set_http_options(HttpOptions(transport=AUTO_TRANSPORT, s3_endpoint_url=endpoint_url))
+url = portal_url(tomogram.https_omezarr_dir, tomogram.s3_omezarr_dir)
+print(f"auto: chooses {S3_TRANSPORT if url.startswith('s3') else HTTPS_TRANSPORT}")
@@ -2,22 +2,52 @@ try:
     from ._version import version as __version__
 except ImportError:
     __version__ = "unknown"
+from ._async_reader import (
+    find_async,
+    read_annotation_files_async,
+    read_annotations_async,
+    read_points_annotations_ndjson_async,
+    read_tomogram_async,
+)
+from ._convert import convert_ome_zarr
+from ._download import download
 from ._reader import (
     points_annotations_reader,
     read_annotation,
     read_points_annotations_ndjson,
+    read_region,
+    read_segmentation_mask_ome_zarr,
     read_tomogram,
+    read_tomogram_mrc,
     read_tomogram_ome_zarr,
+    tomogram_mrc_reader,
     tomogram_ome_zarr_reader,
 )
+from ._run_reader import read_runs
+from ._spatial import PointsIndex
+from ._subtomograms import extract_subtomograms
 from ._widget import DataPortalWidget
 
 __all__ = (
     "DataPortalWidget",
+    "PointsIndex",
+    "convert_ome_zarr",
+    "download",
+    "extract_subtomograms",
+    "find_async",
     "points_annotations_reader",
     "read_annotation",
+    "read_annotation_files_async",
+    "read_annotations_async",
     "read_tomogram",
+    "read_tomogram_async",
+    "read_tomogram_mrc",
     "read_tomogram_ome_zarr",
     "read_points_annotations_ndjson",
+    "read_points_annotations_ndjson_async",
+    "read_region",
+    "read_runs",
+    "read_segmentation_mask_ome_zarr",
+    "tomogram_mrc_reader",
     "tomogram_ome_zarr_reader",
 )
@@ -0,0 +1,112 @@
+from dataclasses import dataclass
+from typing import FrozenSet, Optional, Sequence, Tuple
+
+from qtpy.QtCore import Qt
+from qtpy.QtWidgets import (
+    QListWidget,
+    QListWidgetItem,
+    QWidget,
+)
+
+from napari_cryoet_data_portal._logging import logger
+
+AnnotationKey = Tuple[str, str]
+
+# Shape types of annotation files that are usually large, so are only
+# loaded after they are checked.
+UNCHECKED_SHAPE_TYPES = frozenset({"SegmentationMask"})
+
+
+@dataclass(frozen=True)
+class AnnotationChoice:
+    """An annotation file that can be chosen to be loaded."""
+
+    name: str
+    shape_type: str
+    format: str
+    # The number of annotated objects, if provided by the portal.
+    count: Optional[int] = None
+
+    @property
+    def key(self) -> AnnotationKey:
+        return (self.name, self.shape_type)
+
+    def label(self) -> str:
+        details = [self.shape_type, self.format]
+        if self.count is not None and self.shape_type != "SegmentationMask":
+            details.append(f"{self.count} points")
+        return f"{self.name} ({', '.join(details)})"
+
+
+@dataclass(frozen=True)
+class AnnotationSelection:
+    """The annotation files that were checked or unchecked to be loaded.
+
+    This is immutable, so it can be passed to other threads.
+    """
+
+    checked: FrozenSet[AnnotationKey] = frozenset()
+    unchecked: FrozenSet[AnnotationKey] = frozenset()
+
+    def includes(self, key: AnnotationKey) -> bool:
+        """Returns true if the annotation file should be loaded.
+
+        Annotations that were never checked or unchecked are loaded unless
+        their shape type is usually large.
+        """
+        if key in self.checked:
+            return True
+        if key in self.unchecked:
+            return False
+        return key[1] not in UNCHECKED_SHAPE_TYPES
+
+
+class AnnotationListWidget(QListWidget):
+    """A list of annotation files that can be checked to be loaded.
+
+    Checked and unchecked annotations are remembered by name and shape type,
+    so that they are also loaded or skipped when opening other tomograms.
+    """
+
+    def __init__(self, parent: Optional[QWidget] = None) -> None:
+        super().__init__(parent)
+        self._selection = AnnotationSelection()
+        self.itemChanged.connect(self._onItemChanged)
+
+    def selection(self) -> AnnotationSelection:
+        """Returns the current selection of annotations."""
+        return self._selection
+
+    def addChoices(self, choices: Sequence[AnnotationChoice]) -> None:
+        """Adds the choices that are not already listed."""
+        logger.debug("AnnotationListWidget.addChoices: %s", choices)
+        listed = {self.item(i).data(Qt.ItemDataRole.UserRole) for i in range(self.count())}
+        self.blockSignals(True)
+        for choice in choices:
+            if choice.key in listed:
+                continue
+            listed.add(choice.key)
+            item = QListWidgetItem(choice.label())
+            item.setData(Qt.ItemDataRole.UserRole, choice.key)
+            item.setFlags(item.flags() | Qt.ItemFlag.ItemIsUserCheckable)
+            item.setCheckState(
+                Qt.CheckState.Checked
+                if self._selection.includes(choice.key)
+                else Qt.CheckState.Unchecked
+            )
+            self.addItem(item)
+        self.blockSignals(False)
+
+    def _onItemChanged(self, item: QListWidgetItem) -> None:
+        key = item.data(Qt.ItemDataRole.UserRole)
+        selection = self._selection
+        if item.checkState() == Qt.CheckState.Checked:
+            selection = AnnotationSelection(
+                selection.checked | {key}, selection.unchecked - {key}
+            )
+        else:
+            selection = AnnotationSelection(
+                selection.checked - {key}, selection.unchecked | {key}
+            )
+        self._selection = selection
+        logger.debug("AnnotationListWidget._onItemChanged: %s", selection)
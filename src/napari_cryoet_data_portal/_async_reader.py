@@ -0,0 +1,269 @@
+"""Asynchronous counterparts of the readers, for use in asyncio applications.
+
+Files and GraphQL queries are read on a shared background event loop that
+owns the HTTP sessions, so they can be awaited from any event loop and many
+of them can be in flight at once without blocking it.
+"""
+
+import asyncio
+from functools import partial
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    TypeVar,
+)
+
+import fsspec.asyn
+from cryoet_data_portal import Annotation, AnnotationFile, Client, Tomogram
+from gql import Client as GQLClient
+from gql.transport.aiohttp import AIOHTTPTransport
+from graphql import GraphQLSchema
+from npe2.types import FullLayerData
+
+from napari_cryoet_data_portal._logging import logger
+from napari_cryoet_data_portal._mirror import MirrorClient
+from napari_cryoet_data_portal._projection import to_where
+from napari_cryoet_data_portal._reader import (
+    _labels_annotation_layer,
+    _points_annotation_layer,
+    _points_from_ndjson,
+    _points_layer,
+    _tomogram_layer,
+    read_segmentation_mask_ome_zarr,
+    read_tomogram_ome_zarr,
+)
+from napari_cryoet_data_portal._session import http_options, portal_url, retry_async
+from napari_cryoet_data_portal._store import (
+    open_store,
+    preload_metadata_async,
+    read_bytes_async,
+    run_on_loop,
+)
+
+# Guard with type checking because this is a private import.
+if TYPE_CHECKING:
+    from cryoet_data_portal._gql_base import GQLExpression, Model
+
+M = TypeVar("M", bound="Model")
+T = TypeVar("T")
+
+# Maximum number of files read concurrently by one call.
+DEFAULT_MAX_CONCURRENCY = 64
+
+
+async def find_async(
+    cls: Type[M],
+    client: Client,
+    query_filters: Optional[Iterable["GQLExpression"]] = None,
+) -> List[M]:
+    """Finds portal entities without blocking the event loop.
+
+    This is the counterpart of `Model.find`. The returned entities use the
+    given client for their relationships, which block when accessed, so
+    prefer finding related entities with this instead.
+
+    Examples
+    --------
+    >>> client = Client()
+    >>> runs = await find_async(Run, client, [Run.dataset_id == 10000])
+    """
+    filters = to_where(query_filters or ())
+    if isinstance(client, MirrorClient):
+        # The mirror reads its catalog from disk, which may block.
+        return await _run_blocking(client.find, cls, filters)
+    gql_type = cls._get_gql_type()
+    url, schema, query = _build_request(client, cls, filters)
+    response = await run_on_loop(_execute(url, schema, query), fsspec.asyn.get_loop())
+    return [cls(client, **item) for item in response[gql_type]]
+
+
+def _build_request(
+    client: Client, cls: Type[M], filters: Dict[str, Any]
+) -> Tuple[str, Optional[GraphQLSchema], Any]:
+    # The portal's client only runs queries synchronously, so reuse the
+    # parts of it that build them, which are not public. The query is
+    # whatever the installed version of gql executes.
+    try:
+        query = client.build_query(cls, cls._get_gql_type(), filters)
+        return client.client.transport.url, client.client.schema, query
+    except AttributeError as e:
+        raise RuntimeError(
+            "Finding entities asynchronously is not supported by this version "
+            f"of cryoet_data_portal: {e}"
+        ) from e
+
+
+# The GraphQL sessions by URL, which are only used on the background loop.
+_SESSIONS: Dict[str, "asyncio.Future[Any]"] = {}
+
+
+async def _execute(url: str, schema: Optional[GraphQLSchema], query: Any) -> Dict[str, Any]:
+    session = _SESSIONS.get(url)
+    if session is None:
+        logger.debug("_execute: new session for %s", url)
+        session = asyncio.ensure_future(_connect(url, schema))
+        _SESSIONS[url] = session
+    try:
+        connected = await session
+    except BaseException:
+        _SESSIONS.pop(url, None)
+        raise
+    return await retry_async(lambda: connected.execute(query))
+
+
+async def _connect(url: str, schema: Optional[GraphQLSchema]) -> Any:
+    transport = AIOHTTPTransport(url=url, timeout=int(http_options().read_timeout))
+    # Reuse the schema that was already parsed by the synchronous client.
+    client = GQLClient(transport=transport, schema=schema)
+    return await client.connect_async(reconnecting=False)
+
+
+async def read_tomogram_async(tomogram: Tomogram) -> FullLayerData:
+    """Reads a napari image layer from a tomogram without blocking the event loop.
+
+    This is the counterpart of `read_tomogram`. The metadata is fetched
+    asynchronously, then the lazy multiscale data is built from memory.
+    """
+    path = portal_url(tomogram.https_omezarr_dir, tomogram.s3_omezarr_dir)
+    await preload_metadata_async(open_store(path))
+    layer = await _run_blocking(read_tomogram_ome_zarr, path)
+    return _tomogram_layer(layer, tomogram)
+
+
+async def read_points_annotations_ndjson_async(path: str) -> FullLayerData:
+    """Reads a napari points layer from an NDJSON annotation file without
+    blocking the event loop.
+
+    This is the counterpart of `read_points_annotations_ndjson`.
+    """
+    return _points_layer(_points_from_ndjson(await read_bytes_async(path)))
+
+
+async def read_annotation_files_async(
+    annotation: Annotation,
+    *,
+    tomogram: Optional[Tomogram] = None,
+    skip_empty_chunks: bool = False,
+    files: Optional[Sequence[AnnotationFile]] = None,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+) -> AsyncIterator[FullLayerData]:
+    """Reads the layers of an annotation's files concurrently, yielding each as it completes.
+
+    This is the counterpart of `read_annotation_files`.
+
+    Examples
+    --------
+    >>> async for data, attrs, typ in read_annotation_files_async(annotation):
+            layer = Layer.create(data, attrs, typ)
+    """
+    async for layer in read_annotations_async(
+        (annotation,),
+        tomogram=tomogram,
+        skip_empty_chunks=skip_empty_chunks,
+        files=files,
+        max_concurrency=max_concurrency,
+    ):
+        yield layer
+
+
+async def read_annotations_async(
+    annotations: Sequence[Annotation],
+    *,
+    tomogram: Optional[Tomogram] = None,
+    skip_empty_chunks: bool = False,
+    files: Optional[Sequence[AnnotationFile]] = None,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+) -> AsyncIterator[FullLayerData]:
+    """Reads the layers of many annotations' files concurrently, yielding each as it completes.
+
+    The files of all the annotations are found with one query, then at most
+    `max_concurrency` files are read at once. Unsupported files are skipped.
+
+    Parameters
+    ----------
+    annotations : sequence of Annotation
+        The annotations to read.
+    tomogram : Tomogram, optional
+        The associated tomogram, which may be used for other metadata.
+    skip_empty_chunks : bool
+        If true, read segmentation masks with `read_segmentation_mask_ome_zarr`
+        so that empty chunks are skipped.
+    files : sequence of AnnotationFile, optional
+        The files of the annotations to read. If None, all of their files are read.
+    max_concurrency : int
+        The maximum number of files that are read at once.
+
+    Yields
+    -------
+    napari layer data tuple
+        The data, attributes, and type name of each layer in the order they
+        are read, which may differ from the order of the files.
+    """
+    if len(annotations) == 0:
+        return
+    if files is None:
+        ids = [a.id for a in annotations]
+        files = await find_async(
+            AnnotationFile, annotations[0]._client, [AnnotationFile.annotation_id._in(ids)]
+        )
+    by_id = {a.id: a for a in annotations}
+    semaphore = asyncio.Semaphore(max_concurrency)
+    readers = []
+    for f in files:
+        anno = by_id.get(f.annotation_id)
+        if anno is None:
+            continue
+        if (f.shape_type in ("Point", "OrientedPoint")) and (f.format == "ndjson"):
+            readers.append(partial(_read_points_file, f, anno, tomogram))
+        elif (f.shape_type == "SegmentationMask") and (f.format == "zarr"):
+            readers.append(partial(_read_labels_file, f, anno, tomogram, skip_empty_chunks))
+        else:
+            logger.warning("Found unsupported annotation file: %s, %s. Skipping.", f.shape_type, f.format)
+    async for layer in _as_completed(readers, semaphore):
+        yield layer
+
+
+async def _read_points_file(anno_file: AnnotationFile, anno: Annotation, tomogram: Optional[Tomogram]) -> FullLayerData:
+    path = portal_url(anno_file.https_path, anno_file.s3_path)
+    layer = await read_points_annotations_ndjson_async(path)
+    return _points_annotation_layer(layer, anno_file, anno=anno, tomogram=tomogram)
+
+
+async def _read_labels_file(anno_file: AnnotationFile, anno: Annotation, tomogram: Optional[Tomogram], skip_empty_chunks: bool) -> FullLayerData:
+    path = portal_url(anno_file.https_path, anno_file.s3_path)
+    await preload_metadata_async(open_store(path))
+    read = read_segmentation_mask_ome_zarr if skip_empty_chunks else read_tomogram_ome_zarr
+    layer = await _run_blocking(read, path)
+    return _labels_annotation_layer(layer, anno_file, anno=anno, tomogram=tomogram)
+
+
+async def _as_completed(
+    readers: Sequence[Callable[[], Awaitable[T]]], semaphore: asyncio.Semaphore
+) -> AsyncIterator[T]:
+    async def limited(read: Callable[[], Awaitable[T]]) -> T:
+        async with semaphore:
+            return await read()
+
+    tasks = [asyncio.ensure_future(limited(r)) for r in readers]
+    try:
+        for task in asyncio.as_completed(tasks):
+            yield await task
+    finally:
+        # Stop the remaining reads if the caller stops early or fails.
+        for task in tasks:
+            task.cancel()
+
+
+def _run_blocking(func: Callable[..., T], *args: Any) -> "asyncio.Future[T]":
+    # The remaining work is mostly served from memory, but may still block.
+    return asyncio.get_running_loop().run_in_executor(None, partial(func, *args))
@@ -0,0 +1,113 @@
+"""Persistent and in-memory caches for data read from the portal."""
+
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Optional, Tuple
+
+from napari_cryoet_data_portal._logging import logger
+
+# Environment variable that overrides the default cache directory.
+CACHE_DIR_ENV = "NAPARI_CRYOET_DATA_PORTAL_CACHE_DIR"
+
+
+def cache_dir() -> Path:
+    """Returns the root directory of the persistent caches."""
+    path = os.environ.get(CACHE_DIR_ENV)
+    if path:
+        return Path(path)
+    return Path.home() / ".cache" / "napari-cryoet-data-portal"
+
+
+class JsonCache:
+    """Stores JSON serializable values on disk by string key.
+
+    Each value is stored in its own file, so that concurrent writers of
+    different keys do not interfere with each other. Failures to read or
+    write are logged and otherwise ignored, so that a broken cache only
+    costs performance.
+    """
+
+    def __init__(self, namespace: str) -> None:
+        self._namespace = namespace
+
+    def get(self, key: str) -> Optional[Any]:
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning("Failed to read cache entry %s: %s", path, e)
+            return None
+
+    def put(self, key: str, value: Any) -> None:
+        path = self._path(key)
+        tmp_path = None
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Write to a unique file, so that concurrent writers of the same
+            # key in any thread or process never write to the same file.
+            fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=path.parent)
+            with os.fdopen(fd, "w") as f:
+                json.dump(value, f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning("Failed to write cache entry %s: %s", path, e)
+            if tmp_path is not None:
+                with contextlib.suppress(OSError):
+                    os.remove(tmp_path)
+
+    def _path(self, key: str) -> Path:
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return cache_dir() / self._namespace / f"{digest}.json"
+
+
+class MemoryCache:
+    """A thread-safe, least-recently-used cache bounded by size in bytes."""
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self._items: "OrderedDict[str, Tuple[Any, int]]" = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        return self._nbytes
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._items
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            self._items.move_to_end(key)
+            return item[0]
+
+    def put(self, key: str, value: Any, nbytes: int) -> None:
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._nbytes -= old[1]
+            self._items[key] = (value, nbytes)
+            self._nbytes += nbytes
+            while self._nbytes > self.max_bytes:
+                _, (_, evicted) = self._items.popitem(last=False)
+                self._nbytes -= evicted
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._nbytes = 0
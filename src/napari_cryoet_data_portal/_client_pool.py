@@ -0,0 +1,105 @@
+"""Reusable portal clients that can be safely used from many threads."""
+
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from cryoet_data_portal import Client
+from gql.transport.requests import RequestsHTTPTransport
+
+from napari_cryoet_data_portal._logging import logger
+from napari_cryoet_data_portal._mirror import MirrorClient, mirror_root
+
+
+class _KeepAliveTransport(RequestsHTTPTransport):
+    """Keeps its HTTP session open between queries, so that connections are reused.
+
+    The default transport opens and closes a session for each query.
+    """
+
+    def connect(self) -> None:
+        if self.session is None:
+            super().connect()
+
+    def close(self) -> None:
+        # Closed by shutdown instead, after the client is no longer used.
+        pass
+
+    def shutdown(self) -> None:
+        super().close()
+
+
+class ClientPool:
+    """Hands out portal clients that are reused by the thread that gets them.
+
+    A single client is not thread safe, so each thread gets its own client
+    for each URI. Reusing a client avoids parsing the schema and setting up
+    new HTTP connections for every task.
+    """
+
+    def __init__(self) -> None:
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._clients: List[Client] = []
+        # Incremented when the pool is cleared, so that threads do not
+        # reuse clients from before then.
+        self._generation = 0
+
+    def get(self, uri: Optional[str] = None) -> Client:
+        """Returns the client of the calling thread for the given URI."""
+        clients: Dict[Optional[str], Tuple[int, Client]] = getattr(
+            self._local, "clients", {}
+        )
+        self._local.clients = clients
+        generation, client = clients.get(uri, (-1, None))
+        if client is not None and generation == self._generation:
+            return client
+        logger.debug("ClientPool.get: new client for %s", uri)
+        client = _make_client(uri)
+        with self._lock:
+            self._clients.append(client)
+            clients[uri] = (self._generation, client)
+        return client
+
+    def clear(self) -> None:
+        """Closes the connections of all clients and stops reusing them."""
+        logger.debug("ClientPool.clear: %s", len(self._clients))
+        with self._lock:
+            clients = self._clients
+            self._clients = []
+            self._generation += 1
+        for client in clients:
+            if isinstance(client, MirrorClient):
+                continue
+            transport = client.client.transport
+            if isinstance(transport, _KeepAliveTransport):
+                transport.shutdown()
+
+
+def _make_client(uri: Optional[str]) -> Client:
+    root = mirror_root(uri)
+    if root is not None:
+        return MirrorClient(root)
+    client = Client(uri)
+    transport = client.client.transport
+    client.client.transport = _KeepAliveTransport(
+        url=transport.url,
+        headers=transport.headers,
+        retries=transport.retries,
+    )
+    return client
+
+
+_POOL = ClientPool()
+
+
+def get_client(uri: Optional[str] = None) -> Client:
+    """Returns a portal client for the given URI that is only used by the calling thread.
+
+    If the URI refers to a local mirror, the client finds entities in it instead.
+    """
+    return _POOL.get(uri)
+
+
+def clear_clients() -> None:
+    """Closes and forgets all pooled portal clients, e.g. when disconnecting."""
+    _POOL.clear()
@@ -0,0 +1,191 @@
+"""Conversion of portal images into local multiscale OME-Zarr images."""
+
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import zarr
+from numcodecs import Blosc
+
+from napari_cryoet_data_portal._logging import logger
+from napari_cryoet_data_portal._reader import (
+    _multiscale_paths,
+    read_tomogram_ome_zarr,
+)
+from napari_cryoet_data_portal._store import open_store
+
+# Chunk shape of the converted images, which suits browsing and
+# extracting small regions better than the portal's larger chunks.
+DEFAULT_CHUNKS = (64, 64, 64)
+# Number of levels of the converted images, including the full resolution.
+DEFAULT_LEVELS = 3
+
+Box = Tuple[Tuple[int, int], ...]
+
+
+def convert_ome_zarr(
+    path: str,
+    output_path: str,
+    *,
+    labels: bool = False,
+    chunks: Sequence[int] = DEFAULT_CHUNKS,
+    levels: int = DEFAULT_LEVELS,
+    max_workers: Optional[int] = None,
+) -> str:
+    """Converts an OME-Zarr image into a local multiscale OME-Zarr image.
+
+    The full resolution level of the source is streamed block by block and
+    rewritten with the given chunk shape and a fast compressor. Each lower
+    resolution level is then computed from the previous one by downsampling
+    by 2 along each axis. Blocks are processed in parallel across processes,
+    and no process holds more than a few blocks in memory.
+
+    Parameters
+    ----------
+    path : str
+        The path or URL of the source OME-Zarr image, e.g. a tomogram's
+        `https_omezarr_dir` or a segmentation mask's `https_path`.
+    output_path : str
+        The local path of the OME-Zarr directory to write.
+    labels : bool
+        If true, downsample by taking the most common value of each block
+        of voxels, which is suitable for segmentation masks. Otherwise,
+        downsample by taking their mean.
+    chunks : sequence of int
+        The chunk shape of each level of the output.
+    levels : int
+        The number of levels of the output, including the full resolution.
+    max_workers : int, optional
+        The maximum number of processes. Defaults to the number of CPUs.
+
+    Returns
+    -------
+    str
+        The output path, which can be read with `read_tomogram_ome_zarr`.
+
+    Examples
+    --------
+    >>> client = Client()
+    >>> tomogram = client.find_one(Tomogram)
+    >>> convert_ome_zarr(tomogram.https_omezarr_dir, 'TS_026.zarr')
+    >>> data, attrs, _ = read_tomogram_ome_zarr('TS_026.zarr')
+    """
+    _, attributes, _ = read_tomogram_ome_zarr(path)
+    source_group = zarr.open_group(open_store(path), mode="r")
+    source = source_group[_multiscale_paths(source_group)[0]]
+    chunks = tuple(chunks)
+    scale = tuple(attributes["scale"])
+    logger.debug("convert_ome_zarr: %s, %s, %s", path, source.shape, source.chunks)
+
+    group = zarr.open_group(output_path, mode="w", zarr_format=2)
+    shape = tuple(source.shape)
+    shapes = []
+    for level in range(levels):
+        if level > 0 and min(shape) < 2:
+            break
+        group.create_array(
+            str(level),
+            shape=shape,
+            chunks=tuple(min(c, s) for c, s in zip(chunks, shape)),
+            dtype=source.dtype,
+            compressors=Blosc(cname="lz4", clevel=5, shuffle=Blosc.SHUFFLE),
+            fill_value=0,
+        )
+        shapes.append(shape)
+        shape = tuple(s // 2 for s in shape)
+    group.attrs["multiscales"] = [_multiscale_metadata(len(shapes), scale, attributes)]
+
+    with ProcessPoolExecutor(max_workers) as executor:
+        block = _block_shape(chunks, tuple(source.chunks))
+        tasks = [(path, output_path, box) for box in _boxes(shapes[0], block)]
+        for _ in executor.map(_copy_block, *zip(*tasks)):
+            pass
+        for level in range(1, len(shapes)):
+            tasks = [
+                (output_path, level, box, labels)
+                for box in _boxes(shapes[level], _block_shape(chunks, chunks))
+            ]
+            for _ in executor.map(_downsample_block, *zip(*tasks)):
+                pass
+    return output_path
+
+
+def _multiscale_metadata(
+    levels: int, scale: Tuple[float, ...], attributes: Dict[str, Any]
+) -> Dict[str, Any]:
+    units = attributes.get("units") or ("angstrom",) * len(scale)
+    datasets = []
+    for level in range(levels):
+        factor = 2**level
+        transforms: List[Dict[str, Any]] = [
+            {"type": "scale", "scale": [s * factor for s in scale]}
+        ]
+        if level > 0:
+            # Keep the centers of the downsampled voxels aligned.
+            transforms.append(
+                {"type": "translation", "translation": [s * (factor - 1) / 2 for s in scale]}
+            )
+        datasets.append({"path": str(level), "coordinateTransformations": transforms})
+    return {
+        "version": "0.4",
+        "axes": [
+            {"name": n, "type": "space", "unit": u} for n, u in zip("zyx", units)
+        ],
+        "datasets": datasets,
+    }
+
+
+def _block_shape(chunks: Tuple[int, ...], source_chunks: Tuple[int, ...]) -> Tuple[int, ...]:
+    # Whole output chunks, so that processes never write the same chunk,
+    # covering at least whole source chunks, so each is read about once.
+    return tuple(-(-max(c, s) // c) * c for c, s in zip(chunks, source_chunks))
+
+
+def _boxes(shape: Tuple[int, ...], block: Tuple[int, ...]) -> Iterator[Box]:
+    ranges = (range(0, s, b) for s, b in zip(shape, block))
+    for starts in itertools.product(*ranges):
+        yield tuple((o, min(o + b, s)) for o, b, s in zip(starts, block, shape))
+
+
+def _copy_block(path: str, output_path: str, box: Box) -> None:
+    source_group = zarr.open_group(open_store(path), mode="r")
+    source = source_group[_multiscale_paths(source_group)[0]]
+    output = zarr.open_group(output_path, mode="r+")["0"]
+    region = tuple(slice(*b) for b in box)
+    output[region] = source[region]
+
+
+def _downsample_block(output_path: str, level: int, box: Box, labels: bool) -> None:
+    group = zarr.open_group(output_path, mode="r+")
+    source = group[str(level - 1)]
+    region = tuple(slice(2 * start, 2 * stop) for start, stop in box)
+    data = source[region]
+    group[str(level)][tuple(slice(*b) for b in box)] = (
+        _downsample_mode(data) if labels else _downsample_mean(data)
+    )
+
+
+def _blocks_of_2(data: np.ndarray) -> np.ndarray:
+    """Reshapes an array so that each 2x2x2 block is along the last axis."""
+    shape = tuple(s // 2 for s in data.shape)
+    data = data[tuple(slice(0, 2 * s) for s in shape)]
+    blocks = data.reshape(shape[0], 2, shape[1], 2, shape[2], 2)
+    return blocks.transpose(0, 2, 4, 1, 3, 5).reshape(shape + (8,))
+
+
+def _downsample_mean(data: np.ndarray) -> np.ndarray:
+    mean = _blocks_of_2(data).mean(axis=-1, dtype=np.float64)
+    if np.issubdtype(data.dtype, np.integer):
+        mean = np.rint(mean)
+    return mean.astype(data.dtype)
+
+
+def _downsample_mode(data: np.ndarray) -> np.ndarray:
+    blocks = _blocks_of_2(data)
+    counts = np.stack(
+        [np.count_nonzero(blocks == blocks[..., i:i + 1], axis=-1) for i in range(8)],
+        axis=-1,
+    )
+    index = np.argmax(counts, axis=-1)
+    return np.take_along_axis(blocks, index[..., np.newaxis], axis=-1)[..., 0]
@@ -0,0 +1,512 @@
+"""Headless bulk download of tomograms and annotations from the portal."""
+
+import argparse
+import base64
+import hashlib
+import itertools
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set
+from urllib.parse import urlparse
+
+import aiohttp
+import fsspec
+import zarr
+from cryoet_data_portal import (
+    Annotation,
+    Client,
+    Dataset,
+    Run,
+    Tomogram,
+    TomogramVoxelSpacing,
+)
+
+from napari_cryoet_data_portal._client_pool import get_client
+from napari_cryoet_data_portal._filter import Filter, make_filter
+from napari_cryoet_data_portal._logging import logger
+from napari_cryoet_data_portal._mirror import CATALOG_NAME, Catalog
+from napari_cryoet_data_portal._reader import _multiscale_paths
+from napari_cryoet_data_portal._session import (
+    TRANSPORTS,
+    http_options,
+    portal_url,
+    record_throughput,
+    retry,
+    set_http_options,
+    storage_options,
+)
+from napari_cryoet_data_portal._sparse import list_chunk_files
+from napari_cryoet_data_portal._store import open_store, preload_metadata
+
+# Maximum number of files downloaded concurrently.
+DEFAULT_MAX_WORKERS = 8
+# Number of files planned ahead of each worker, which bounds the memory used
+# by pending downloads of large runs.
+_PENDING_PER_WORKER = 4
+# Name of the file in the output directory that describes the downloaded files.
+MANIFEST_NAME = "manifest.json"
+
+# Maximum number of bytes read by one request, so that large files are
+# streamed to disk and an interrupted transfer loses at most this much.
+_BLOCK_BYTES = 4 * 2**20
+# Suffix of files that are still being downloaded.
+_PART_SUFFIX = ".part"
+# Matches an ETag that is the MD5 digest of the whole file, unlike the
+# ETag of a file uploaded in multiple parts.
+_MD5_ETAG = re.compile(r'^"?([0-9a-fA-F]{32})"?$')
+
+COMPLETE = "complete"
+SKIPPED = "skipped"
+MISSING = "missing"
+FAILED = "failed"
+
+
+@dataclass(frozen=True)
+class DownloadFile:
+    """A file to download.
+
+    Attributes
+    ----------
+    url : str
+        The URL of the file to read.
+    path : str
+        The path of the file to write, relative to the output directory.
+    size : int, optional
+        The size of the file in bytes, if it is already known from a
+        listing. Otherwise it is requested before the file is read.
+    md5 : str, optional
+        The expected MD5 digest of the file, if it is known from a listing.
+    """
+
+    url: str
+    path: str
+    size: Optional[int] = None
+    md5: Optional[str] = None
+
+
+@dataclass
+class DownloadReport:
+    """Summarizes a bulk download.
+
+    Attributes
+    ----------
+    complete : int
+        The number of files that were downloaded.
+    skipped : int
+        The number of files that were already downloaded.
+    missing : int
+        The number of files that do not exist, like empty zarr chunks.
+    failed : list of str
+        The paths of the files that could not be downloaded or verified.
+    nbytes : int
+        The number of bytes that were downloaded.
+    seconds : float
+        The time taken by the download.
+    """
+
+    complete: int = 0
+    skipped: int = 0
+    missing: int = 0
+    failed: List[str] = field(default_factory=list)
+    nbytes: int = 0
+    seconds: float = 0
+
+    @property
+    def bytes_per_second(self) -> float:
+        """The aggregate throughput over all concurrent transfers."""
+        return self.nbytes / self.seconds if self.seconds > 0 else 0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.complete} downloaded, {self.skipped} skipped, "
+            f"{self.missing} missing, {len(self.failed)} failed: "
+            f"{self.nbytes / 2**20:.1f} MiB in {self.seconds:.1f} s "
+            f"({self.bytes_per_second / 2**20:.1f} MiB/s)"
+        )
+
+
+class _VerificationError(Exception):
+    pass
+
+
+# Errors of one file that should not stop the download of the others.
+_FILE_ERRORS = (OSError, aiohttp.ClientError, _VerificationError)
+
+
+def download(
+    filter: Filter,
+    output_dir: str,
+    *,
+    levels: Optional[Sequence[int]] = None,
+    annotations: bool = True,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    uri: Optional[str] = None,
+) -> DownloadReport:
+    """Downloads tomograms and their annotations from the portal.
+
+    Files are written under the output directory with the same relative
+    paths as on the portal. Downloads resume where an earlier call stopped,
+    files that are already complete are skipped, and each downloaded file
+    is verified against its size and, where the server provides it, its
+    MD5 checksum. A manifest of all files is written to `manifest.json`
+    in the output directory.
+
+    The metadata of the downloaded entities is also added to `catalog.json`
+    in the output directory, so that it can be used as a local mirror of the
+    portal, e.g. by passing it as the URI to `get_client` or the plugin.
+
+    Parameters
+    ----------
+    filter : Filter
+        The datasets, runs, voxel spacings or tomograms to download,
+        e.g. from `make_filter`.
+    output_dir : str
+        The local directory to write to.
+    levels : sequence of int, optional
+        The indices of the multiscale levels of the OME-Zarr images to
+        download, where 0 is the full resolution. The metadata of all
+        levels is always downloaded. If None, all levels are downloaded.
+    annotations : bool
+        If true, also download the annotation files of the tomograms.
+    max_workers : int
+        The maximum number of files to download concurrently.
+    uri : str, optional
+        The URI of the portal's GraphQL API. If None, uses the default.
+
+    Returns
+    -------
+    DownloadReport
+        The numbers of files and bytes downloaded and the throughput.
+
+    Examples
+    --------
+    >>> report = download(make_filter(Run, (15050,)), 'portal', levels=(2,))
+    >>> print(report)
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    catalog_path = os.path.join(output_dir, CATALOG_NAME)
+    catalog = Catalog.read(catalog_path)
+    files = plan_download(
+        filter, get_client(uri), levels=levels, annotations=annotations, catalog=catalog
+    )
+    try:
+        return download_files(files, output_dir, max_workers=max_workers)
+    finally:
+        catalog.write(catalog_path)
+
+
+def plan_download(
+    filter: Filter,
+    client: Client,
+    *,
+    levels: Optional[Sequence[int]] = None,
+    annotations: bool = True,
+    catalog: Optional[Catalog] = None,
+) -> Iterator[DownloadFile]:
+    """Generates the files of the tomograms and annotations that match a filter.
+
+    If a catalog is given, the records of the datasets, runs, voxel spacings,
+    tomograms and annotations of the files are also added to it.
+    """
+    spacing_ids: Set[int] = set()
+    for dataset, tomograms in filter.load(client):
+        if catalog is not None:
+            catalog.add(dataset)
+        for tomogram in tomograms:
+            logger.debug("plan_download: %s", tomogram.name)
+            yield from _ome_zarr_files(
+                tomogram.https_omezarr_dir, tomogram.s3_omezarr_dir, levels
+            )
+            spacing_id = tomogram.tomogram_voxel_spacing_id
+            if catalog is not None:
+                catalog.add(
+                    tomogram, https_omezarr_dir=_relative_path(tomogram.https_omezarr_dir)
+                )
+            # Tomograms with the same voxel spacing share their annotations.
+            if spacing_id in spacing_ids:
+                continue
+            spacing_ids.add(spacing_id)
+            if catalog is not None:
+                spacing = tomogram.tomogram_voxel_spacing
+                catalog.add(spacing)
+                catalog.add(spacing.run)
+            if not annotations:
+                continue
+            for annotation in Annotation.find(
+                client, [Annotation.tomogram_voxel_spacing_id == spacing_id]
+            ):
+                if catalog is not None:
+                    catalog.add(annotation)
+                for f in annotation.files:
+                    if catalog is not None:
+                        catalog.add(f, https_path=_relative_path(f.https_path))
+                    if f.format == "zarr":
+                        yield from _ome_zarr_files(f.https_path, f.s3_path, levels)
+                    else:
+                        url = portal_url(f.https_path, f.s3_path)
+                        yield DownloadFile(url, _relative_path(f.https_path))
+
+
+def _ome_zarr_files(
+    https_url: str, s3_url: Optional[str], levels: Optional[Sequence[int]]
+) -> Iterator[DownloadFile]:
+    url = portal_url(https_url, s3_url).rstrip("/")
+    root = _relative_path(https_url).rstrip("/")
+    store = open_store(url)
+    metadata = preload_metadata(store)
+    for key, text in metadata.items():
+        if text is not None:
+            yield DownloadFile(f"{url}/{key}", f"{root}/{key}")
+    group = zarr.open_group(store, mode="r")
+    paths = _multiscale_paths(group)
+    selected = paths if levels is None else [paths[i] for i in levels if 0 <= i < len(paths)]
+    for path in selected:
+        array = group[path]
+        # Listing the stored chunks skips the ones that were never written,
+        # like most chunks of a mask, and finds the sizes of the others
+        # without requesting each of them.
+        listed = list_chunk_files(f"{url}/{path}", array.ndim)
+        if listed is None:
+            # Each shard is stored as one file, like a chunk of an unsharded array.
+            file_shape = array.shards or array.chunks
+            grid = (range(-(-s // c)) for s, c in zip(array.shape, file_shape))
+            listed = dict.fromkeys(itertools.product(*grid), {})
+        for coords, info in sorted(listed.items()):
+            key = f"{path}/{array.metadata.encode_chunk_key(coords)}"
+            yield DownloadFile(
+                f"{url}/{key}",
+                f"{root}/{key}",
+                size=info.get("size"),
+                md5=_expected_md5(info),
+            )
+
+
+def _relative_path(https_url: str) -> str:
+    # Use the path of the HTTPS URL regardless of the transport,
+    # so that the layout of the output does not depend on it.
+    return urlparse(https_url).path.lstrip("/")
+
+
+def download_files(
+    files: Iterator[DownloadFile],
+    output_dir: str,
+    *,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+) -> DownloadReport:
+    """Downloads files concurrently, resuming and verifying them, and writes a manifest.
+
+    Files are planned while earlier files are downloading, and the manifest
+    is written even if the download is interrupted, so that the next call
+    can skip the files that were completed without requesting them again.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    entries = _read_manifest(manifest_path)
+    report = DownloadReport()
+    start = time.perf_counter()
+
+    def record(entry: Dict[str, Any]) -> None:
+        entries[entry["path"]] = entry
+        status = entry["status"]
+        if status == COMPLETE:
+            report.complete += 1
+            report.nbytes += entry["downloaded"]
+        elif status == SKIPPED:
+            report.skipped += 1
+        elif status == MISSING:
+            report.missing += 1
+        else:
+            report.failed.append(entry["path"])
+
+    try:
+        with ThreadPoolExecutor(max_workers) as executor:
+            submitted: Set[str] = set()
+            pending: Set[Future] = set()
+            for f in files:
+                if f.path in submitted:
+                    continue
+                submitted.add(f.path)
+                # Wait for some downloads to finish before planning more.
+                if len(pending) >= max_workers * _PENDING_PER_WORKER:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        record(future.result())
+                pending.add(
+                    executor.submit(_download_file, f, output_dir, entries.get(f.path))
+                )
+            for future in as_completed(pending):
+                record(future.result())
+    finally:
+        report.seconds = time.perf_counter() - start
+        _write_manifest(manifest_path, entries, report)
+    logger.info("download_files: %s", report)
+    return report
+
+
+def _download_file(
+    file: DownloadFile, output_dir: str, previous: Optional[Dict[str, Any]]
+) -> Dict[str, Any]:
+    dest = os.path.join(output_dir, file.path)
+    entry: Dict[str, Any] = {"path": file.path, "url": file.url}
+    # Trust the previous manifest to avoid requesting complete files again.
+    if (
+        previous is not None
+        and previous.get("status") in (COMPLETE, SKIPPED)
+        and os.path.isfile(dest)
+        and os.path.getsize(dest) == previous.get("size")
+    ):
+        return {**previous, **entry, "status": SKIPPED, "downloaded": 0}
+    try:
+        entry.update(retry(lambda: _transfer(file, dest)))
+    except FileNotFoundError:
+        entry["status"] = MISSING
+    except _FILE_ERRORS as e:
+        logger.warning("Failed to download %s: %s", file.url, e)
+        entry.update(status=FAILED, error=str(e))
+    return entry
+
+
+def _transfer(file: DownloadFile, dest: str) -> Dict[str, Any]:
+    url = file.url
+    fs, path = fsspec.core.url_to_fs(url, **storage_options(url))
+    size, expected_md5 = file.size, file.md5
+    if size is None:
+        info = fs.info(path)
+        size = info.get("size")
+        expected_md5 = _expected_md5(info)
+    if os.path.isfile(dest) and size is not None and os.path.getsize(dest) == size:
+        return {"status": SKIPPED, "size": size, "md5": expected_md5, "downloaded": 0}
+
+    part = dest + _PART_SUFFIX
+    os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+    md5 = hashlib.md5()
+    offset = 0
+    # Resume a partial transfer if the server tells us the size to expect.
+    if size is not None and os.path.isfile(part) and os.path.getsize(part) <= size:
+        with open(part, "rb") as existing:
+            for block in iter(lambda: existing.read(_BLOCK_BYTES), b""):
+                md5.update(block)
+                offset += len(block)
+    else:
+        Path(part).write_bytes(b"")
+
+    downloaded = 0
+    start = time.perf_counter()
+    with open(part, "ab") as out:
+        while size is None or offset < size:
+            end = None if size is None else min(offset + _BLOCK_BYTES, size)
+            block = fs.cat_file(path, start=offset, end=end)
+            out.write(block)
+            md5.update(block)
+            offset += len(block)
+            downloaded += len(block)
+            if size is None or not block:
+                break
+    record_throughput(url, downloaded, time.perf_counter() - start)
+
+    if size is not None and offset != size:
+        os.remove(part)
+        raise _VerificationError(f"Expected {size} bytes, but got {offset}")
+    digest = md5.hexdigest()
+    if expected_md5 is not None and digest != expected_md5:
+        os.remove(part)
+        raise _VerificationError(f"Expected MD5 {expected_md5}, but got {digest}")
+    os.replace(part, dest)
+    return {"status": COMPLETE, "size": offset, "md5": digest, "downloaded": downloaded}
+
+
+def _expected_md5(info: Dict[str, Any]) -> Optional[str]:
+    content_md5 = info.get("Content-MD5")
+    if content_md5:
+        return base64.b64decode(content_md5).hex()
+    match = _MD5_ETAG.match(str(info.get("ETag") or info.get("etag") or ""))
+    return match.group(1).lower() if match else None
+
+
+def _read_manifest(path: str) -> Dict[str, Dict[str, Any]]:
+    if not os.path.isfile(path):
+        return {}
+    try:
+        with open(path) as f:
+            return {e["path"]: e for e in json.load(f)["files"]}
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning("Ignoring unreadable manifest %s: %s", path, e)
+        return {}
+
+
+def _write_manifest(
+    path: str, entries: Dict[str, Dict[str, Any]], report: DownloadReport
+) -> None:
+    manifest = {
+        "bytes": report.nbytes,
+        "seconds": report.seconds,
+        "files": sorted(entries.values(), key=lambda e: e["path"]),
+    }
+    temp_path = path + _PART_SUFFIX
+    with open(temp_path, "w") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(temp_path, path)
+
+
+_ENTITY_TYPES = {
+    "dataset": Dataset,
+    "run": Run,
+    "spacing": TomogramVoxelSpacing,
+    "tomogram": Tomogram,
+}
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Runs the command line interface of `download`."""
+    parser = argparse.ArgumentParser(
+        description="Download tomograms and annotations from the CryoET Data Portal."
+    )
+    parser.add_argument("output_dir", help="The local directory to write to.")
+    ids = parser.add_mutually_exclusive_group(required=True)
+    for name in _ENTITY_TYPES:
+        ids.add_argument(
+            f"--{name}-ids", type=int, nargs="+", metavar="ID",
+            help=f"Download the tomograms of these {name} IDs.",
+        )
+    parser.add_argument(
+        "--levels", type=int, nargs="+", metavar="LEVEL",
+        help="The multiscale levels to download, where 0 is the full resolution. Defaults to all.",
+    )
+    parser.add_argument(
+        "--no-annotations", action="store_true", help="Do not download annotations."
+    )
+    parser.add_argument("--max-workers", type=int, default=DEFAULT_MAX_WORKERS)
+    parser.add_argument("--transport", choices=TRANSPORTS, default=http_options().transport)
+    parser.add_argument("--uri", help="The URI of the portal's GraphQL API.")
+    args = parser.parse_args(argv)
+    if args.levels is not None and any(level < 0 for level in args.levels):
+        parser.error("--levels must not be negative")
+
+    name, values = next(
+        (n, getattr(args, f"{n}_ids")) for n in _ENTITY_TYPES if getattr(args, f"{n}_ids")
+    )
+    set_http_options(replace(http_options(), transport=args.transport))
+    report = download(
+        make_filter(_ENTITY_TYPES[name], tuple(values)),
+        args.output_dir,
+        levels=args.levels,
+        annotations=not args.no_annotations,
+        max_workers=args.max_workers,
+        uri=args.uri,
+    )
+    print(report)
+    for path in report.failed:
+        print(f"Failed: {path}", file=sys.stderr)
+    return 1 if report.failed else 0
@@ -1,18 +1,28 @@
 from __future__ import annotations
+import datetime
 from collections import defaultdict
 from dataclasses import dataclass
-from typing import TYPE_CHECKING, Dict, Generator, List, Protocol, Tuple, Type, Union
+from typing import TYPE_CHECKING, Any, Collection, Dict, Generator, Iterable, List, Optional, Protocol, Sequence, Tuple, Type, Union
 
 from cryoet_data_portal import Client, Dataset, Run, Tomogram, TomogramVoxelSpacing
 
+from napari_cryoet_data_portal._projection import Fields, find_items, to_model, to_where
+
+# Maximum number of tomograms found by each query of a search.
+DEFAULT_SEARCH_PAGE_SIZE = 100
+
 # Guard with type checking because this is a private import.
 if TYPE_CHECKING:
     from cryoet_data_portal._gql_base import GQLExpression, GQLField
 
 
 class Filter(Protocol):
-    def load(self, client: Client) -> Generator[Tuple[Dataset, List[Tomogram]], None, None]:
-        """Load the datasets and tomograms that match this filter."""
+    def load(self, client: Client, *, fields: Optional[Fields] = None) -> Generator[Tuple[Dataset, List[Tomogram]], None, None]:
+        """Load the datasets and tomograms that match this filter.
+
+        If fields are given, only those fields of the entities are found.
+        The other fields can be found later with `complete`.
+        """
         ...
 
 
@@ -20,29 +30,29 @@ class Filter(Protocol):
 class DatasetFilter:
     ids: Tuple[int, ...] = ()
 
-    def load(self, client: Client) -> Generator[Tuple[Dataset, List[Tomogram]], None, None]:
-        gql_filters = _ids_to_gql(Dataset.id, self.ids)
-        for dataset in Dataset.find(client, gql_filters):
-            tomograms: List[Tomogram] = []
-            for run in dataset.runs:
-                for spacing in run.tomogram_voxel_spacings:
-                    tomograms.extend(spacing.tomograms)
-            yield dataset, tomograms
+    def load(self, client: Client, *, fields: Optional[Fields] = None) -> Generator[Tuple[Dataset, List[Tomogram]], None, None]:
+        gql_filters = to_where(_ids_to_gql(Dataset.id, self.ids))
+        for item in find_items(client, Dataset, gql_filters, fields=fields):
+            dataset = to_model(client, Dataset, item, fields)
+            yield dataset, _dataset_tomograms(client, dataset.id, fields)
 
 
 @dataclass(frozen=True)
 class RunFilter:
     ids: Tuple[int, ...] = ()
 
-    def load(self, client: Client) -> Generator[Tuple[Dataset, List[Tomogram]], None, None]:
+    def load(self, client: Client, *, fields: Optional[Fields] = None) -> Generator[Tuple[Dataset, List[Tomogram]], None, None]:
         datasets: Dict[int, Dataset] = {}
         tomograms: Dict[int, List[Tomogram]] = defaultdict(list)
-        gql_filters = _ids_to_gql(Run.id, self.ids)
-        for run in Run.find(client, gql_filters):
-            dataset = run.dataset
+        gql_filters = to_where(_ids_to_gql(Run.id, self.ids))
+        related = {"dataset": {}, "tomogram_voxel_spacings": {"tomograms": {}}}
+        for run in find_items(client, Run, gql_filters, fields=fields, related=related):
+            dataset = to_model(client, Dataset, run["dataset"], fields)
             datasets[dataset.id] = dataset
-            for spacing in run.tomogram_voxel_spacings:
-                tomograms[dataset.id].extend(spacing.tomograms)
+            for spacing in run["tomogram_voxel_spacings"]:
+                tomograms[dataset.id].extend(
+                    to_model(client, Tomogram, t, fields) for t in spacing["tomograms"]
+                )
         for i in datasets:
             yield datasets[i], tomograms[i]
 
@@ -51,14 +61,17 @@ class RunFilter:
 class SpacingFilter:
     ids: Tuple[int, ...] = ()
 
-    def load(self, client: Client) -> Generator[Tuple[Dataset, List[Tomogram]], None, None]:
+    def load(self, client: Client, *, fields: Optional[Fields] = None) -> Generator[Tuple[Dataset, List[Tomogram]], None, None]:
         datasets: Dict[int, Dataset] = {}
         tomograms: Dict[int, List[Tomogram]] = defaultdict(list)
-        gql_filters = _ids_to_gql(TomogramVoxelSpacing.id, self.ids)
-        for spacing in TomogramVoxelSpacing.find(client, gql_filters):
-            dataset = spacing.run.dataset
+        gql_filters = to_where(_ids_to_gql(TomogramVoxelSpacing.id, self.ids))
+        related = {"run": {"dataset": {}}, "tomograms": {}}
+        for spacing in find_items(client, TomogramVoxelSpacing, gql_filters, fields=fields, related=related):
+            dataset = to_model(client, Dataset, spacing["run"]["dataset"], fields)
             datasets[dataset.id] = dataset
-            tomograms[dataset.id].extend(spacing.tomograms)
+            tomograms[dataset.id].extend(
+                to_model(client, Tomogram, t, fields) for t in spacing["tomograms"]
+            )
         for i in datasets:
             yield datasets[i], tomograms[i]
 
@@ -67,18 +80,126 @@ class SpacingFilter:
 class TomogramFilter:
     ids: Tuple[int, ...] = ()
 
-    def load(self, client: Client) -> Generator[Tuple[Dataset, List[Tomogram]], None, None]:
+    def load(self, client: Client, *, fields: Optional[Fields] = None) -> Generator[Tuple[Dataset, List[Tomogram]], None, None]:
         datasets: Dict[int, Dataset] = {}
         tomograms: Dict[int, List[Tomogram]] = defaultdict(list)
-        gql_filters = _ids_to_gql(Tomogram.id, self.ids)
-        for tomogram in Tomogram.find(client, gql_filters):
-            dataset = tomogram.tomogram_voxel_spacing.run.dataset
+        gql_filters = to_where(_ids_to_gql(Tomogram.id, self.ids))
+        for dataset, tomogram in _find_tomograms(client, gql_filters, fields):
             datasets[dataset.id] = dataset
             tomograms[dataset.id].append(tomogram)
         for i in datasets:
             yield datasets[i], tomograms[i]
 
 
+@dataclass(frozen=True)
+class SearchFilter:
+    """Finds the tomograms whose name, run name, dataset title or annotated
+    object names contain some text, ignoring case.
+
+    The portal does the search, so each page of results is found with one
+    query without listing everything first.
+    """
+
+    text: str = ""
+    page_size: int = DEFAULT_SEARCH_PAGE_SIZE
+
+    def load(self, client: Client, *, fields: Optional[Fields] = None) -> Generator[Tuple[Dataset, List[Tomogram]], None, None]:
+        gql_filters = _search_to_gql(self.text)
+        offset = 0
+        while True:
+            page = _find_tomograms(
+                client,
+                gql_filters,
+                fields,
+                limit=self.page_size,
+                offset=offset,
+                order_by=[{"id": "asc"}],
+            )
+            # A dataset may be yielded again by a later page, with its other tomograms.
+            datasets: Dict[int, Dataset] = {}
+            tomograms: Dict[int, List[Tomogram]] = defaultdict(list)
+            for dataset, tomogram in page:
+                datasets[dataset.id] = dataset
+                tomograms[dataset.id].append(tomogram)
+            for i in datasets:
+                yield datasets[i], tomograms[i]
+            if len(page) < self.page_size:
+                return
+            offset += self.page_size
+
+
+def load_changes(
+    filter: Filter,
+    client: Client,
+    *,
+    since: datetime.date,
+    dataset_ids: Collection[int],
+    fields: Optional[Fields] = None,
+) -> Generator[Tuple[Dataset, List[Tomogram]], None, Tuple[int, ...]]:
+    """Loads the changes to a listing of a filter since some date.
+
+    Yields the datasets that were released or modified on or after the date,
+    with all of their tomograms that match the filter, so they can replace
+    any listed ones. Only the given fields of those are found, as with
+    `Filter.load`. Returns the IDs of the listed datasets that no longer
+    match the filter.
+
+    Only the datasets of a `DatasetFilter` are compared by date, together
+    with the depositions of their tomograms, because tomograms can be added
+    to a dataset without changing its dates. That takes four queries in
+    total, plus the queries for the tomograms of changed datasets. Other filters find a bounded set of entities, so all of their
+    datasets are loaded again.
+    """
+    if not isinstance(filter, DatasetFilter):
+        loaded = set()
+        for dataset, tomograms in filter.load(client, fields=fields):
+            loaded.add(dataset.id)
+            yield dataset, tomograms
+        return tuple(i for i in dataset_ids if i not in loaded)
+    scope = {"id": {"_in": list(filter.ids)}} if len(filter.ids) > 0 else {}
+    current_ids = {
+        item["id"] for item in find_items(client, Dataset, scope, fields={Dataset: ("id",)})
+    }
+    date = since.isoformat()
+    dates = [
+        {"release_date": {"_gte": date}},
+        {"last_modified_date": {"_gte": date}},
+    ]
+    changed_ids = {
+        item["id"]
+        for item in find_items(client, Dataset, {**scope, "_or": dates}, fields={Dataset: ("id",)})
+    }
+    # Tomograms can be added to a dataset without changing its dates,
+    # so also find the datasets of tomograms from newer depositions.
+    deposited = find_items(
+        client,
+        Tomogram,
+        {"deposition": {"_or": dates}},
+        fields={Tomogram: ("id",), TomogramVoxelSpacing: ("id",), Run: ("dataset_id",)},
+        related={"tomogram_voxel_spacing": {"run": {}}},
+    )
+    changed_ids.update(t["tomogram_voxel_spacing"]["run"]["dataset_id"] for t in deposited)
+    changed_ids &= current_ids
+    if len(changed_ids) > 0:
+        changed = {"id": {"_in": sorted(changed_ids)}}
+        for item in find_items(client, Dataset, changed, fields=fields):
+            dataset = to_model(client, Dataset, item, fields)
+            yield dataset, _dataset_tomograms(client, dataset.id, fields)
+    return tuple(i for i in dataset_ids if i not in current_ids)
+
+
+def listing_watermark(datasets: Iterable[Dataset]) -> Optional[datetime.date]:
+    """Returns the latest release or modification date of some datasets,
+    or None if none of them have one."""
+    dates = [
+        d
+        for dataset in datasets
+        for d in (dataset.release_date, dataset.last_modified_date)
+        if d is not None
+    ]
+    return max(dates, default=None)
+
+
 def make_filter(type: Union[Type[Dataset], Type[Run], Type[TomogramVoxelSpacing], Type[Tomogram]], ids: Tuple[int, ...]) -> Filter:
     if type is Dataset:
         return DatasetFilter(ids=ids)
@@ -94,3 +215,49 @@ def make_filter(type: Union[Type[Dataset], Type[Run], Type[TomogramVoxelSpacing]
 
 def _ids_to_gql(id_field: "GQLField", ids: Tuple[int, ...]) -> Tuple["GQLExpression", ...]:
     return () if len(ids) == 0 else (id_field._in(ids),)
+
+
+def _dataset_tomograms(client: Client, dataset_id: int, fields: Optional[Fields]) -> List[Tomogram]:
+    gql_filters = to_where(
+        (Tomogram.tomogram_voxel_spacing.run.dataset_id == dataset_id,)
+    )
+    return [
+        to_model(client, Tomogram, item, fields)
+        for item in find_items(client, Tomogram, gql_filters, fields=fields)
+    ]
+
+
+def _search_to_gql(text: str) -> Dict[str, Any]:
+    # Match the text literally, rather than as a pattern.
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    pattern = f"%{escaped}%"
+    spacing = Tomogram.tomogram_voxel_spacing
+    return _any_to_gql(
+        (
+            Tomogram.name.ilike(pattern),
+            spacing.run.name.ilike(pattern),
+            spacing.run.dataset.title.ilike(pattern),
+            spacing.annotations.object_name.ilike(pattern),
+        )
+    )
+
+
+def _any_to_gql(expressions: Sequence["GQLExpression"]) -> Dict[str, Any]:
+    return {"_or": [e.to_gql() for e in expressions]}
+
+
+def _find_tomograms(
+    client: Client, gql_filters: Dict[str, Any], fields: Optional[Fields], **arguments: Any
+) -> List[Tuple[Dataset, Tomogram]]:
+    """Finds tomograms with their datasets in one query."""
+    related = {"tomogram_voxel_spacing": {"run": {"dataset": {}}}}
+    items = find_items(
+        client, Tomogram, gql_filters, fields=fields, related=related, **arguments
+    )
+    return [
+        (
+            to_model(client, Dataset, item["tomogram_voxel_spacing"]["run"]["dataset"], fields),
+            to_model(client, Tomogram, item, fields),
+        )
+        for item in items
+    ]
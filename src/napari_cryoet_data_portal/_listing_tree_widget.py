@@ -1,8 +1,9 @@
-from typing import Optional
+from typing import List, Optional, Tuple
 
 from qtpy.QtCore import QRegularExpression
 from qtpy.QtWidgets import (
     QTreeWidget,
+    QTreeWidgetItem,
     QWidget,
 )
 
@@ -23,7 +24,7 @@ class ListingTreeWidget(QTreeWidget):
         self.setHeaderHidden(True)
         self.setDragDropMode(QTreeWidget.DragDropMode.NoDragDrop)
         self.setSelectionBehavior(QTreeWidget.SelectionBehavior.SelectRows)
-        self.setSelectionMode(QTreeWidget.SelectionMode.SingleSelection)
+        self.setSelectionMode(QTreeWidget.SelectionMode.ExtendedSelection)
 
     def updateVisibleItems(self, pattern: str) -> None:
         logger.debug("ListingTreeWidget.updateVisibleItems: %s", pattern)
@@ -31,3 +32,26 @@ class ListingTreeWidget(QTreeWidget):
         for i in range(self.topLevelItemCount()):
             top_level_item = self.topLevelItem(i)
             _update_visible_items(top_level_item, self.last_filter)
+
+    def neighbourItems(self, item: QTreeWidgetItem, depth: int) -> Tuple[QTreeWidgetItem, ...]:
+        """Returns the visible siblings within some distance of the given item.
+
+        The siblings are ordered by distance, alternating between the next
+        and the previous ones.
+        """
+        parent = item.parent()
+        if parent is None:
+            siblings = [self.topLevelItem(i) for i in range(self.topLevelItemCount())]
+        else:
+            siblings = [parent.child(i) for i in range(parent.childCount())]
+        visible = [s for s in siblings if not s.isHidden()]
+        if item not in visible:
+            return ()
+        index = visible.index(item)
+        neighbours: List[QTreeWidgetItem] = []
+        for distance in range(1, depth + 1):
+            if index + distance < len(visible):
+                neighbours.append(visible[index + distance])
+            if index - distance >= 0:
+                neighbours.append(visible[index - distance])
+        return tuple(neighbours)
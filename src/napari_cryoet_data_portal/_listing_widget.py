@@ -1,4 +1,5 @@
-from typing import Dict, Generator, List, Optional, Tuple
+import datetime
+from typing import Dict, Generator, List, Optional, Set, Tuple
 
 from qtpy.QtCore import Qt
 from qtpy.QtWidgets import (
@@ -8,12 +9,19 @@ from qtpy.QtWidgets import (
     QVBoxLayout,
     QWidget,
 )
-from cryoet_data_portal import Client, Dataset, Tomogram
+from cryoet_data_portal import Dataset, Tomogram
 
-from napari_cryoet_data_portal._filter import DatasetFilter, Filter
+from napari_cryoet_data_portal._client_pool import get_client
+from napari_cryoet_data_portal._filter import (
+    DatasetFilter,
+    Filter,
+    listing_watermark,
+    load_changes,
+)
 from napari_cryoet_data_portal._listing_tree_widget import ListingTreeWidget
 from napari_cryoet_data_portal._logging import logger
 from napari_cryoet_data_portal._progress_widget import ProgressWidget
+from napari_cryoet_data_portal._projection import LISTING_FIELDS
 from napari_cryoet_data_portal._vendored.superqt._searchable_tree_widget import (
     _update_visible_items,
 )
@@ -33,7 +41,15 @@ class ListingWidget(QGroupBox):
         self._progress: ProgressWidget = ProgressWidget(
             work=self._loadDatasets,
             yieldCallback=self._onDatasetLoaded,
+            returnCallback=self._onDatasetsLoaded,
         )
+        # The URI, filter and watermark of the last complete listing,
+        # which are used to only load later changes.
+        self._uri: Optional[str] = None
+        self._filter: Optional[Filter] = None
+        self._watermark: Optional[datetime.date] = None
+        # The IDs of the datasets loaded by the current task.
+        self._loaded_ids: Set[int] = set()
 
         self.filter.textChanged.connect(self.tree.updateVisibleItems)
 
@@ -45,31 +61,110 @@ class ListingWidget(QGroupBox):
         self.setLayout(layout)
 
     def load(self, uri: str, *, filter: Filter = DatasetFilter()) -> None:
-        """Lists the datasets and tomograms using the given portal URI."""
+        """Lists the datasets and tomograms using the given portal URI.
+
+        If the same URI and filter were last listed completely, only the
+        changes since then are loaded, as with `refresh`.
+        """
         logger.debug("ListingWidget.load: %s, %s", uri, filter)
-        self.tree.clear()
         self.show()
+        if uri == self._uri and filter == self._filter and self._watermark is not None:
+            self.refresh()
+            return
+        self.tree.clear()
+        self._uri = uri
+        self._filter = filter
+        self._watermark = None
+        self._loaded_ids.clear()
         self._progress.submit(uri, filter)
 
+    def refresh(self) -> None:
+        """Updates the last complete listing with the datasets that were
+        released, modified or removed since it was loaded."""
+        logger.debug("ListingWidget.refresh: %s, %s", self._uri, self._watermark)
+        if self._uri is None or self._filter is None:
+            return
+        if self._watermark is None:
+            self.load(self._uri, filter=self._filter)
+            return
+        self._loaded_ids.clear()
+        self._progress.submit(
+            self._uri,
+            self._filter,
+            since=self._watermark,
+            dataset_ids=tuple(self._datasetItems()),
+        )
+
     def cancel(self) -> None:
         """Cancels the last listing."""
         logger.debug("ListingWidget.cancel")
         self._progress.cancel()
 
-    def _loadDatasets(self, uri: str, filter: Filter) -> Generator[Tuple[Dataset, List[Tomogram]], None, None]:
-        logger.debug("ListingWidget._loadDatasets: %s", uri)
-        client = Client(uri)
-        yield from filter.load(client)
+    def _loadDatasets(
+        self,
+        uri: str,
+        filter: Filter,
+        *,
+        since: Optional[datetime.date] = None,
+        dataset_ids: Tuple[int, ...] = (),
+    ) -> Generator[Tuple[Dataset, List[Tomogram]], None, Tuple[int, ...]]:
+        logger.debug("ListingWidget._loadDatasets: %s, %s", uri, since)
+        client = get_client(uri)
+        # Only find what the listing shows, and the rest when it is needed.
+        if since is None:
+            yield from filter.load(client, fields=LISTING_FIELDS)
+            return ()
+        return (
+            yield from load_changes(
+                filter,
+                client,
+                since=since,
+                dataset_ids=dataset_ids,
+                fields=LISTING_FIELDS,
+            )
+        )
 
     def _onDatasetLoaded(self, result: Tuple[Dataset, List[Tomogram]]) -> None:
         dataset, tomograms = result
         logger.debug("ListingWidget._onDatasetLoaded: %s", dataset.id)
-        text = f"{dataset.id} ({len(tomograms)})"
-        item = QTreeWidgetItem((text,))
+        item = self._datasetItems().get(dataset.id)
+        is_new = item is None
+        if item is None:
+            item = QTreeWidgetItem()
+        elif dataset.id not in self._loaded_ids:
+            # Replace the tomograms listed by an earlier task.
+            item.takeChildren()
+        # Some filters find a dataset's tomograms in several parts, so add
+        # later parts to the existing item.
+        self._loaded_ids.add(dataset.id)
         item.setData(0, Qt.ItemDataRole.UserRole, dataset)
+        # Parts can overlap, so only add tomograms that are not listed yet.
+        listed_ids = {
+            item.child(i).data(0, Qt.ItemDataRole.UserRole).id
+            for i in range(item.childCount())
+        }
         for tomogram in tomograms:
+            if tomogram.id in listed_ids:
+                continue
+            listed_ids.add(tomogram.id)
             tomogram_item = QTreeWidgetItem((tomogram.name,))
             tomogram_item.setData(0, Qt.ItemDataRole.UserRole, tomogram)
             item.addChild(tomogram_item)
+        item.setText(0, f"{dataset.id} ({item.childCount()})")
         _update_visible_items(item, self.tree.last_filter)
-        self.tree.addTopLevelItem(item)
+        if is_new:
+            self.tree.addTopLevelItem(item)
+
+    def _onDatasetsLoaded(self, removed_ids: Tuple[int, ...]) -> None:
+        logger.debug("ListingWidget._onDatasetsLoaded: %s", removed_ids)
+        items = self._datasetItems()
+        for dataset_id in removed_ids:
+            item = items.pop(dataset_id, None)
+            if item is not None:
+                self.tree.takeTopLevelItem(self.tree.indexOfTopLevelItem(item))
+        datasets = (item.data(0, Qt.ItemDataRole.UserRole) for item in items.values())
+        self._watermark = listing_watermark(datasets)
+
+    def _datasetItems(self) -> Dict[int, QTreeWidgetItem]:
+        items = (self.tree.topLevelItem(i) for i in range(self.tree.topLevelItemCount()))
+        return {item.data(0, Qt.ItemDataRole.UserRole).id: item for item in items}
@@ -7,8 +7,10 @@ from qtpy.QtWidgets import (
 )
 from cryoet_data_portal import Dataset, Tomogram
 
+from napari_cryoet_data_portal._client_pool import get_client
 from napari_cryoet_data_portal._logging import logger
 from napari_cryoet_data_portal._progress_widget import ProgressWidget
+from napari_cryoet_data_portal._projection import complete
 from napari_cryoet_data_portal._vendored.superqt._searchable_tree_widget import (
     QSearchableTreeWidget,
 )
@@ -20,6 +22,7 @@ class MetadataWidget(QGroupBox):
     def __init__(self, parent: Optional[QWidget] = None) -> None:
         super().__init__(parent)
 
+        self._uri: Optional[str] = None
         self._main = QSearchableTreeWidget()
         self._main.layout().setContentsMargins(0, 0, 0, 0)
         self._main.filter.setPlaceholderText("Filter metadata")
@@ -34,6 +37,10 @@ class MetadataWidget(QGroupBox):
         layout.addStretch(0)
         self.setLayout(layout)
 
+    def setUri(self, uri: str) -> None:
+        """Sets the URI of the portal that should be used to find metadata."""
+        self._uri = uri
+
     def load(self, data: Union[Dataset, Tomogram]) -> None:
         """Loads the JSON metadata of the given dataset or tomogram."""
         logger.debug("MetadataWidget.load: %s", data)
@@ -50,7 +57,8 @@ class MetadataWidget(QGroupBox):
 
     def _loadMetadata(self, data: Union[Dataset, Tomogram]) -> Dict[str, Any]:
         logger.debug("MetadataWidget._loadMetadata: %s", data)
-        return data.to_dict()
+        # The listing only finds some fields, so find the rest now.
+        return complete(data, get_client(self._uri)).to_dict()
 
     def _onMetadataLoaded(self, metadata: Dict[str, Any]) -> None:
         logger.debug("MetadataWidget._onMetadataLoaded: %s", metadata)
@@ -0,0 +1,261 @@
+"""Local mirrors of the portal that can be browsed without a connection."""
+
+import datetime
+import functools
+import json
+import os
+import re
+import threading
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Type, TypeVar
+from urllib.parse import urlparse
+
+from cryoet_data_portal import Client
+from cryoet_data_portal._gql_base import Model, Relationship
+
+from napari_cryoet_data_portal._logging import logger
+
+M = TypeVar("M", bound=Model)
+Record = Dict[str, Any]
+
+# Name of the file in a mirror that contains the metadata of its entities.
+CATALOG_NAME = "catalog.json"
+# Version of the catalog format, which is incremented on incompatible changes.
+CATALOG_VERSION = 1
+
+
+class Catalog:
+    """The metadata records of the entities of a mirror, grouped by GraphQL type.
+
+    Fields that refer to files (e.g. `https_omezarr_dir`) are stored as paths
+    relative to the mirror, or None if the file is not in the mirror.
+    """
+
+    def __init__(self, tables: Optional[Dict[str, Iterable[Record]]] = None) -> None:
+        self._tables: Dict[str, Dict[Any, Record]] = defaultdict(dict)
+        for table, records in (tables or {}).items():
+            for record in records:
+                self._tables[table][record["id"]] = record
+        self._indices: Dict[tuple, Dict[Any, List[Record]]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def read(cls, path: str) -> "Catalog":
+        """Reads a catalog file, or returns an empty catalog if it does not exist."""
+        if not os.path.isfile(path):
+            return cls()
+        with open(path) as f:
+            catalog = json.load(f)
+        version = catalog.get("version")
+        if version != CATALOG_VERSION:
+            raise ValueError(
+                f"Unsupported catalog version {version} in {path}. "
+                f"Expected {CATALOG_VERSION}."
+            )
+        return cls(catalog["tables"])
+
+    def write(self, path: str) -> None:
+        """Writes this catalog in a deterministic order, replacing any existing file."""
+        tables = {
+            table: [records[i] for i in sorted(records)]
+            for table, records in sorted(self._tables.items())
+        }
+        temp_path = f"{path}.part"
+        with open(temp_path, "w") as f:
+            json.dump(
+                {"version": CATALOG_VERSION, "tables": tables},
+                f,
+                indent=1,
+                sort_keys=True,
+                default=_to_json,
+            )
+        os.replace(temp_path, path)
+
+    def add(self, model: Model, **files: Optional[str]) -> None:
+        """Adds or replaces the record of a model.
+
+        The keyword arguments give the relative paths of the files of the model
+        that are in the mirror. Its other file fields are cleared.
+        """
+        record = model.to_dict()
+        for name in record:
+            if name.startswith(("https_", "s3_")):
+                record[name] = None
+        record.update(files)
+        with self._lock:
+            self._tables[model._get_gql_type()][record["id"]] = record
+            self._indices.clear()
+
+    def __len__(self) -> int:
+        return sum(len(records) for records in self._tables.values())
+
+    def find(self, cls: Type[Model], where: Dict[str, Any]) -> List[Record]:
+        """Returns the records of a type that match GraphQL where filters."""
+        table = cls._get_gql_type()
+        records = self._candidates(table, where)
+        return [r for r in records if self._matches(cls, r, where)]
+
+    def _candidates(self, table: str, where: Dict[str, Any]) -> Iterable[Record]:
+        # Use an index on the first field that is compared for equality,
+        # because entities are mostly found by their ID or parent's ID.
+        for field, condition in where.items():
+            if not isinstance(condition, dict):
+                continue
+            if "_eq" in condition:
+                return self._index(table, field).get(condition["_eq"], [])
+            if "_in" in condition:
+                index = self._index(table, field)
+                return [r for value in condition["_in"] for r in index.get(value, [])]
+        return list(self._tables.get(table, {}).values())
+
+    def _index(self, table: str, field: str) -> Dict[Any, List[Record]]:
+        key = (table, field)
+        with self._lock:
+            index = self._indices.get(key)
+            if index is None:
+                index = defaultdict(list)
+                for record in self._tables.get(table, {}).values():
+                    index[record.get(field)].append(record)
+                self._indices[key] = index
+            return index
+
+    def _matches(self, cls: Type[Model], record: Record, where: Dict[str, Any]) -> bool:
+        for name, condition in where.items():
+            if name == "_or":
+                if not any(self._matches(cls, record, w) for w in condition):
+                    return False
+                continue
+            if name == "_and":
+                if not all(self._matches(cls, record, w) for w in condition):
+                    return False
+                continue
+            if name == "_not":
+                if self._matches(cls, record, condition):
+                    return False
+                continue
+            field = cls.__dict__.get(name)
+            if isinstance(field, Relationship):
+                related = field.get_related_class()
+                value = record.get(field.source_field)
+                related_where = {field.dest_field: {"_eq": value}}
+                if not any(
+                    self._matches(related, r, condition)
+                    for r in self._candidates(related._get_gql_type(), related_where)
+                ):
+                    return False
+            elif not all(
+                _compare(record.get(name), op, operand)
+                for op, operand in condition.items()
+            ):
+                return False
+        return True
+
+
+def _compare(value: Any, op: str, operand: Any) -> bool:
+    if op == "_eq":
+        return value == operand
+    if op == "_neq":
+        return value != operand
+    if op == "_in":
+        return value in operand
+    if op == "_is_null":
+        return (value is None) == operand
+    if op in ("_like", "_ilike"):
+        if value is None:
+            return False
+        flags = re.IGNORECASE if op == "_ilike" else 0
+        return _like_pattern(operand, flags).fullmatch(str(value)) is not None
+    if value is None:
+        return False
+    if op == "_gt":
+        return value > operand
+    if op == "_gte":
+        return value >= operand
+    if op == "_lt":
+        return value < operand
+    if op == "_lte":
+        return value <= operand
+    raise ValueError(f"Unsupported filter operator: {op}")
+
+
+@functools.lru_cache(maxsize=64)
+def _like_pattern(pattern: str, flags: int) -> "re.Pattern[str]":
+    parts = []
+    escaped = False
+    for c in pattern:
+        if escaped:
+            parts.append(re.escape(c))
+            escaped = False
+        elif c == "\\":
+            escaped = True
+        else:
+            parts.append(".*" if c == "%" else "." if c == "_" else re.escape(c))
+    return re.compile("".join(parts), flags | re.DOTALL)
+
+
+def _to_json(value: Any) -> Any:
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()[:10]
+    raise TypeError(f"Cannot write {type(value)} to a catalog")
+
+
+class MirrorClient(Client):
+    """A portal client that finds entities in a local mirror instead of the portal.
+
+    The file fields of the entities refer to the files in the mirror,
+    so that all readers work without a connection.
+    """
+
+    def __init__(self, root: str) -> None:
+        # Do not call the base initializer, which sets up a GraphQL client.
+        self.root = os.path.abspath(root)
+        self._catalog = _read_catalog(self.root, _catalog_mtime(self.root))
+
+    def find(self, cls: Type[M], query_filters: Optional[Dict[str, Any]] = None) -> List[M]:
+        return [cls(self, **record) for record in self.records(cls, query_filters)]
+
+    def records(self, cls: Type[Model], query_filters: Optional[Dict[str, Any]] = None) -> List[Record]:
+        """Returns the unconverted fields of the entities that match GraphQL where filters."""
+        records = self._catalog.find(cls, query_filters or {})
+        return [self._resolve(record) for record in records]
+
+    def _resolve(self, record: Record) -> Record:
+        resolved = dict(record)
+        for name, value in record.items():
+            if name.startswith("https_") and value is not None:
+                resolved[name] = os.path.join(self.root, value)
+        return resolved
+
+
+def _catalog_mtime(root: str) -> int:
+    return os.stat(os.path.join(root, CATALOG_NAME)).st_mtime_ns
+
+
+@functools.lru_cache(maxsize=4)
+def _read_catalog(root: str, mtime: int) -> Catalog:
+    # The modification time is part of the cache key, so that a catalog
+    # that is updated by a later export is read again.
+    logger.debug("_read_catalog: %s, %s", root, mtime)
+    return Catalog.read(os.path.join(root, CATALOG_NAME))
+
+
+def mirror_root(uri: Optional[str]) -> Optional[str]:
+    """Returns the directory of the mirror at a URI, or None if it is not a mirror.
+
+    The URI may be a local directory that contains a catalog, the path of
+    the catalog itself, or a file URL of either.
+    """
+    if not uri:
+        return None
+    parsed = urlparse(uri)
+    if parsed.scheme == "file":
+        path = parsed.path
+    elif parsed.scheme and len(parsed.scheme) > 1:
+        # Single letter schemes are Windows drives.
+        return None
+    else:
+        path = uri
+    path = os.path.expanduser(path)
+    if os.path.basename(path) == CATALOG_NAME:
+        path = os.path.dirname(path)
+    return path if os.path.isfile(os.path.join(path, CATALOG_NAME)) else None
@@ -1,31 +1,50 @@
+import math
 from dataclasses import dataclass
-from functools import lru_cache
-from typing import TYPE_CHECKING, Generator, Optional, Tuple
+from functools import cache
+from typing import TYPE_CHECKING, Any, Dict, Generator, List, Optional, Sequence, Tuple, Union
 
 import numpy as np
-from cryoet_data_portal import Annotation, Client, Tomogram
+from cryoet_data_portal import Annotation, AnnotationFile, Tomogram
 from npe2.types import FullLayerData
-from qtpy.QtCore import Qt
+from qtpy.QtCore import Qt, QTimer, Signal
 from qtpy.QtWidgets import (
     QCheckBox,
     QComboBox,
+    QDoubleSpinBox,
     QGroupBox,
     QHBoxLayout,
     QLabel,
     QPushButton,
+    QSpinBox,
     QVBoxLayout,
     QWidget,
 )
 
+from napari_cryoet_data_portal._annotation_list_widget import (
+    AnnotationChoice,
+    AnnotationListWidget,
+    AnnotationSelection,
+)
+from napari_cryoet_data_portal._client_pool import get_client
 from napari_cryoet_data_portal._logging import logger
+from napari_cryoet_data_portal._prefetch import (
+    DEFAULT_MAX_BYTES_PER_SECOND,
+    DEFAULT_PREFETCH_DEPTH,
+)
 from napari_cryoet_data_portal._progress_widget import ProgressWidget
+from napari_cryoet_data_portal._projection import complete
 from napari_cryoet_data_portal._reader import (
     read_annotation_files,
+    read_region,
     read_tomogram,
 )
+from napari_cryoet_data_portal._sparse import SparseChunkArray
+from napari_cryoet_data_portal._spatial import PointsIndex
+from napari_cryoet_data_portal._statistics import load_tomogram_statistics
 
 if TYPE_CHECKING:
     from napari.components import ViewerModel
+    from napari.layers import Image, Layer, Points, Shapes
 
 
 # TODO: read these from metadata instead of hard-coding them.
@@ -49,9 +68,43 @@ RESOLUTIONS: Tuple[Resolution, ...] = (
 )
 
 
+# The parts of a tomogram that can be opened: all of it, a slab around the
+# current slice, or a drawn box.
+REGION_ALL = "All"
+REGION_SLAB = "Slab"
+REGION_BOX = "Box"
+REGIONS: Tuple[str, ...] = (REGION_ALL, REGION_SLAB, REGION_BOX)
+# The lower and upper corners of a region in zyx physical coordinates.
+Region = Tuple[Tuple[float, float, float], Tuple[float, float, float]]
+
+# The metadata of a layer that identify the entity and file it was read from.
+LAYER_IDENTITY_KEYS = ("id", "https_omezarr_dir", "https_path")
+# Time to wait for more loaded layers, so that they can be added together.
+LAYER_BATCH_INTERVAL_MS = 100
+# Maximum number of tomograms that are loaded concurrently when opening many.
+MAX_CONCURRENT_LOADS = 4
+# Fraction of the largest tomogram's extent left between tomograms in a grid.
+GRID_SPACING = 0.1
+
+
+@dataclass
+class Refinement:
+    """Finer resolution data that replaces the last loaded image layer's data."""
+    layer_data: FullLayerData
+
+
+@dataclass
+class AnnotationChoices:
+    """The annotation files of a loading tomogram that can be chosen."""
+    choices: List[AnnotationChoice]
+
+
 class OpenWidget(QGroupBox):
     """Opens a tomogram and its annotations at a specific resolution."""
 
+    # Emitted with the tomogram after it and its annotations are loaded.
+    loaded = Signal(object)
+
     def __init__(
         self, viewer: "ViewerModel", parent: Optional[QWidget] = None
     ) -> None:
@@ -60,6 +113,28 @@ class OpenWidget(QGroupBox):
         self._viewer = viewer
         self._uri: Optional[str] = None
         self._tomogram: Optional[Tomogram] = None
+        # Set instead of the tomogram when opening many tomograms together.
+        self._tomograms: Tuple[Tomogram, ...] = ()
+        self._resolution: Resolution = LOW_RESOLUTION
+        # The annotations to load, which is read when loading starts, so
+        # that workers do not read the state of the list.
+        self._annotation_selection = AnnotationSelection()
+        self._queued_loads: List[Tuple[Tomogram, Tuple[float, float, float]]] = []
+        self._active_loads: List[ProgressWidget] = []
+        self._image_layer: Optional["Image"] = None
+        # Loaded layers that have not yet been added to the viewer.
+        self._pending_layers: List[Union[FullLayerData, Refinement]] = []
+        # Existing layers that will be removed after loading, unless they
+        # are unchanged by it.
+        self._stale_layers: List["Layer"] = []
+        # The points layers of the loaded annotations, and a spatial index
+        # over some of them, which is built when first needed.
+        self._points_layers: List["Points"] = []
+        self._points_index: Optional[Tuple[Tuple["Points", ...], PointsIndex]] = None
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setInterval(LAYER_BATCH_INTERVAL_MS)
+        self._flush_timer.timeout.connect(self._flushLayers)
 
         self.setTitle("Tomogram")
 
@@ -76,6 +151,7 @@ class OpenWidget(QGroupBox):
         self._progress: ProgressWidget = ProgressWidget(
             work=self._loadTomogram,
             yieldCallback=self._onLayerLoaded,
+            returnCallback=self._onTomogramLoaded,
         )
 
         self.open.clicked.connect(self.load)
@@ -89,10 +165,112 @@ class OpenWidget(QGroupBox):
         self._clear_existing_layers = QCheckBox("Clear existing layers")
         self._clear_existing_layers.setChecked(True)
 
+        self._keep_unchanged_layers = QCheckBox("Keep unchanged layers")
+        self._keep_unchanged_layers.setToolTip(
+            "Instead of clearing all existing layers before loading, only "
+            "replace the ones that change after loading"
+        )
+        self._clear_existing_layers.toggled.connect(
+            self._keep_unchanged_layers.setEnabled
+        )
+
+        self._show_low_resolution_first = QCheckBox("Show low resolution first")
+        self._show_low_resolution_first.setToolTip(
+            "Show the low resolution tomogram while the chosen resolution loads"
+        )
+        self._show_low_resolution_first.setChecked(False)
+
+        points_slab_layout = QHBoxLayout()
+        points_slab_layout.setContentsMargins(0, 0, 0, 0)
+        self._points_slab = QDoubleSpinBox()
+        self._points_slab.setRange(0, 1e6)
+        self._points_slab.setDecimals(0)
+        self._points_slab.setSingleStep(50)
+        self._points_slab.setSuffix(" Å")
+        self._points_slab.setSpecialValueText("All")
+        self._points_slab.setToolTip(
+            "Only show the annotation points within this thickness around "
+            "the current slice, e.g. in 3D. All points are shown at zero."
+        )
+        points_slab_label = QLabel("Points slab")
+        points_slab_label.setBuddy(self._points_slab)
+        points_slab_layout.addWidget(points_slab_label)
+        points_slab_layout.addWidget(self._points_slab, 1)
+        self._points_slab.valueChanged.connect(self._updatePointsSlab)
+        self._viewer.dims.events.current_step.connect(self._updatePointsSlab)
+
+        region_layout = QHBoxLayout()
+        region_layout.setContentsMargins(0, 0, 0, 0)
+        self._region = QComboBox()
+        self._region.addItems(REGIONS)
+        self._region.setToolTip(
+            "Only read the part of the tomogram and its segmentation masks "
+            "within a slab around the current slice, or within the last shape "
+            "drawn in the selected shapes layer, at the chosen resolution. "
+            "The slab is used when no shape was drawn."
+        )
+        self._region_thickness = QDoubleSpinBox()
+        self._region_thickness.setRange(1, 1e6)
+        self._region_thickness.setDecimals(0)
+        self._region_thickness.setSingleStep(50)
+        self._region_thickness.setSuffix(" Å")
+        self._region_thickness.setValue(500)
+        self._region_thickness.setToolTip("The thickness of the region along z")
+        self._region_thickness.setEnabled(False)
+        self._region.currentTextChanged.connect(
+            lambda text: self._region_thickness.setEnabled(text != REGION_ALL)
+        )
+        region_label = QLabel("Region")
+        region_label.setBuddy(self._region)
+        region_layout.addWidget(region_label)
+        region_layout.addWidget(self._region, 1)
+        region_layout.addWidget(self._region_thickness, 1)
+
+        prefetch_layout = QHBoxLayout()
+        prefetch_layout.setContentsMargins(0, 0, 0, 0)
+        self.prefetch_depth = QSpinBox()
+        self.prefetch_depth.setRange(0, 10)
+        self.prefetch_depth.setSpecialValueText("Off")
+        self.prefetch_depth.setValue(DEFAULT_PREFETCH_DEPTH)
+        self.prefetch_depth.setToolTip(
+            "The number of tomograms on either side of the opened one in the "
+            "listing whose low resolution data is fetched in the background"
+        )
+        self.prefetch_rate = QDoubleSpinBox()
+        self.prefetch_rate.setRange(0, 1e4)
+        self.prefetch_rate.setDecimals(0)
+        self.prefetch_rate.setSuffix(" MiB/s")
+        self.prefetch_rate.setSpecialValueText("Unlimited")
+        self.prefetch_rate.setValue((DEFAULT_MAX_BYTES_PER_SECOND or 0) / 2**20)
+        self.prefetch_rate.setToolTip(
+            "The maximum average rate of fetching in the background"
+        )
+        prefetch_label = QLabel("Prefetch")
+        prefetch_label.setBuddy(self.prefetch_depth)
+        prefetch_layout.addWidget(prefetch_label)
+        prefetch_layout.addWidget(self.prefetch_depth, 1)
+        prefetch_layout.addWidget(self.prefetch_rate, 1)
+
+        self._annotations = AnnotationListWidget()
+        self._annotations.setToolTip(
+            "Only checked annotations are loaded. Segmentation masks are "
+            "unchecked until they are checked once. Changes are applied when "
+            "opening a tomogram."
+        )
+
         layout = QVBoxLayout()
         layout.addLayout(control_layout)
         layout.addWidget(self._clear_existing_layers)
+        layout.addWidget(self._keep_unchanged_layers)
+        layout.addWidget(self._show_low_resolution_first)
+        layout.addLayout(points_slab_layout)
+        layout.addLayout(region_layout)
+        layout.addLayout(prefetch_layout)
+        layout.addWidget(self._annotations)
         layout.addWidget(self._progress)
+        self._loads_layout = QVBoxLayout()
+        self._loads_layout.setContentsMargins(0, 0, 0, 0)
+        layout.addLayout(self._loads_layout)
         self.setLayout(layout)
 
     def setUri(self, uri: str) -> None:
@@ -103,6 +281,7 @@ class OpenWidget(QGroupBox):
         """Sets the current tomogram that should be opened."""
         self.cancel()
         self._tomogram = tomogram
+        self._tomograms = ()
         # Reset resolution to low to handle case when user tries
         # out a higher resolution but then moves onto another tomogram.
         self.resolution.setCurrentText(LOW_RESOLUTION.name)
@@ -110,35 +289,203 @@ class OpenWidget(QGroupBox):
         self.show()
         self.load()
 
+    def setTomograms(self, tomograms: Sequence[Tomogram]) -> None:
+        """Sets many tomograms that should be opened together.
+
+        Unlike `setTomogram`, this does not load the tomograms until
+        `load` is called.
+        """
+        self.cancel()
+        self._tomogram = None
+        self._tomograms = tuple(tomograms)
+        self.resolution.setCurrentText(LOW_RESOLUTION.name)
+        self.setTitle(f"Tomograms: {len(self._tomograms)} selected")
+        self.show()
+
+    def tomograms(self) -> Tuple[Tomogram, ...]:
+        """Returns the tomograms that should be opened."""
+        if len(self._tomograms) > 0:
+            return self._tomograms
+        return () if self._tomogram is None else (self._tomogram,)
+
     def load(self) -> None:
-        """Loads the current tomogram at the current resolution."""
+        """Loads the current tomogram(s) at the current resolution."""
         resolution = self.resolution.currentData()
-        logger.debug("OpenWidget.load: %s", self._tomogram, resolution)
+        logger.debug("OpenWidget.load: %s, %s", self.tomograms(), resolution)
+        self.cancel()
+        # Find the region before clearing, which may remove the drawn box.
+        region, box_layer = self._regionToOpen()
         if self._clear_existing_layers.isChecked():
-            self._viewer.layers.clear()
-        self._progress.submit(self._tomogram, resolution)
+            # Keep the drawn box, so that it can be moved and opened again.
+            layers = [layer for layer in self._viewer.layers if layer is not box_layer]
+            if self._keep_unchanged_layers.isChecked():
+                self._stale_layers = layers
+            elif box_layer is None:
+                self._viewer.layers.clear()
+            else:
+                for layer in layers:
+                    self._viewer.layers.remove(layer)
+        self._image_layer = None
+        self._points_layers = []
+        self._points_index = None
+        self._annotations.clear()
+        self._annotation_selection = self._annotations.selection()
+        if len(self._tomograms) > 0:
+            self._loadMany(resolution)
+        else:
+            progressive = self._show_low_resolution_first.isChecked()
+            self._progress.submit(
+                self._tomogram,
+                resolution,
+                progressive,
+                region=region,
+                selection=self._annotation_selection,
+            )
 
     def cancel(self) -> None:
         """Cancels the last tomogram load."""
         logger.debug("OpenWidget.cancel")
         self._progress.cancel()
+        self._queued_loads = []
+        for progress in self._active_loads:
+            progress.cancel()
+        self._active_loads = []
+        self._discardPendingLayers()
+
+    def _regionToOpen(self) -> Tuple[Optional[Region], Optional["Shapes"]]:
+        """Returns the region of the tomogram to open, or None to open all
+        of it, and the shapes layer of the drawn box if one was used."""
+        # Tomograms opened together are laid out in a grid, where a region
+        # in physical coordinates is not meaningful.
+        mode = self._region.currentText()
+        if mode == REGION_ALL or len(self._tomograms) > 0:
+            return None, None
+        lower = [-math.inf] * 3
+        upper = [math.inf] * 3
+        center = self._viewer.dims.point[0]
+        box_layer = self._boxLayer() if mode == REGION_BOX else None
+        if box_layer is not None:
+            vertices = np.asarray(box_layer.data[-1])
+            vertices = vertices * box_layer.scale + box_layer.translate
+            lower[1:] = vertices[:, -2:].min(axis=0)
+            upper[1:] = vertices[:, -2:].max(axis=0)
+            if vertices.shape[1] == 3:
+                center = vertices[:, 0].mean()
+        thickness = self._region_thickness.value()
+        lower[0] = center - thickness / 2
+        upper[0] = center + thickness / 2
+        logger.debug("OpenWidget._regionToOpen: %s, %s", lower, upper)
+        return (tuple(lower), tuple(upper)), box_layer
+
+    def _boxLayer(self) -> Optional["Shapes"]:
+        layer = self._viewer.layers.selection.active
+        if layer is None or layer._type_string != "shapes" or layer.nshapes == 0:
+            return None
+        return layer
+
+    def _loadMany(self, resolution: Resolution) -> None:
+        # Lay out the tomograms in a grid, so they can be compared side by side.
+        self._resolution = resolution
+        offsets = _grid_offsets(self._tomograms)
+        self._queued_loads = list(zip(self._tomograms, offsets))
+        for _ in range(MAX_CONCURRENT_LOADS):
+            self._startNextLoad()
+
+    def _startNextLoad(self) -> None:
+        if len(self._queued_loads) == 0:
+            return
+        tomogram, offset = self._queued_loads.pop(0)
+        logger.debug("OpenWidget._startNextLoad: %s", tomogram.name)
+        progress: ProgressWidget = ProgressWidget(
+            work=self._loadTomogram,
+            yieldCallback=self._onLayerLoaded,
+        )
+        progress.finished.connect(lambda: self._onLoadFinished(progress))
+        self._active_loads.append(progress)
+        self._loads_layout.addWidget(progress)
+        progress.submit(
+            tomogram,
+            self._resolution,
+            False,
+            offset,
+            selection=self._annotation_selection,
+        )
+        # Show the name of the tomogram instead of the generic status.
+        progress.status.setText(tomogram.name)
+
+    def _onLoadFinished(self, progress: ProgressWidget) -> None:
+        logger.debug("OpenWidget._onLoadFinished")
+        self._loads_layout.removeWidget(progress)
+        progress.deleteLater()
+        if progress not in self._active_loads:
+            return
+        self._active_loads.remove(progress)
+        self._startNextLoad()
+        if len(self._active_loads) == 0:
+            self._flushLayers()
+            self._removeStaleLayers()
 
     def _loadTomogram(
         self,
         tomogram: Tomogram,
         resolution: Resolution,
-    ) -> Generator[FullLayerData, None, None]:
+        progressive: bool = False,
+        offset: Optional[Tuple[float, float, float]] = None,
+        region: Optional[Region] = None,
+        selection: Optional[AnnotationSelection] = None,
+    ) -> Generator[Union[FullLayerData, Refinement, AnnotationChoices], None, None]:
+        if selection is None:
+            selection = AnnotationSelection()
+        if offset is not None:
+            for layer in self._loadTomogram(
+                tomogram, resolution, progressive, region=region, selection=selection
+            ):
+                if isinstance(layer, Refinement):
+                    yield Refinement(_offset_layer(layer.layer_data, offset))
+                elif isinstance(layer, AnnotationChoices):
+                    yield layer
+                else:
+                    yield _offset_layer(layer, offset)
+            return
         logger.debug("OpenWidget._loadTomogram: %s", tomogram.name)
+        # Looking up related entities or the rest of the tomogram's fields
+        # triggers queries using the client from where the tomogram was found.
+        # A single client is not thread safe, so we need one for each thread.
+        client = get_client(self._uri)
+        complete(tomogram, client)
         image_layer = read_tomogram(tomogram)
+        # Use precomputed contrast limits, so that napari does not need to
+        # estimate them by reading more data, which is slow and inaccurate
+        # for higher resolutions.
+        statistics = load_tomogram_statistics(tomogram, image_layer[0][-1])
+        image_layer[1]["contrast_limits"] = statistics.contrast_limits
+        image_layer[1]["metadata"]["histogram"] = {
+            "counts": statistics.counts,
+            "bin_edges": statistics.bin_edges,
+        }
         # Extract image_scale before the resolution is taken into account,
         # so we can use it to align other annotations later.
         image_scale = image_layer[1]["scale"]
-        yield _handle_image_at_resolution(image_layer, resolution)
+        # A region is read into memory from the finest level that was chosen.
+        level = resolution.indices[0]
+        # Multi-resolution is already progressive in napari and low
+        # resolution is the coarsest level, so only refine the others.
+        # Regions are small, so are read at the chosen resolution directly.
+        refine = (
+            progressive
+            and region is None
+            and resolution in (MID_RESOLUTION, HIGH_RESOLUTION)
+        )
+        if region is not None:
+            yield read_region(image_layer, *region, level=level)
+        elif refine:
+            data, attrs, layer_type = image_layer
+            yield _handle_image_at_resolution(
+                (data, dict(attrs), layer_type), LOW_RESOLUTION
+            )
+        else:
+            yield _handle_image_at_resolution(image_layer, resolution)
 
-        # Looking up tomogram.tomogram_voxel_spacing.annotations triggers a query
-        # using the client from where the tomogram was found.
-        # A single client is not thread safe, so we need a new instance for each query.
-        client = Client(self._uri)
         annotations = Annotation.find(
             client,
             [
@@ -147,26 +494,254 @@ class OpenWidget(QGroupBox):
             ],
         )
 
-        for annotation in annotations:
-            for layer in read_annotation_files(annotation, tomogram=tomogram):
-                if layer[2] == "labels":
+        # Load small files first, so that something useful appears quickly.
+        files = _sorted_annotation_files(annotations)
+        choices = [_annotation_choice(a, f) for a, f in files]
+        yield AnnotationChoices(choices)
+        for (annotation, f), choice in zip(files, choices):
+            if not selection.includes(choice.key):
+                logger.debug("OpenWidget._loadTomogram: skipping %s", choice)
+                continue
+            for layer in read_annotation_files(
+                annotation, tomogram=tomogram, skip_empty_chunks=True, files=(f,)
+            ):
+                if layer[2] == "labels" and region is not None:
+                    layer = read_region(layer, *region, level=level)
+                elif layer[2] == "labels":
                     layer = _handle_image_at_resolution(layer, resolution)
                 elif layer[2] == "points":
                     layer = _handle_points_at_scale(layer, image_scale)
                 yield layer
 
-    def _onLayerLoaded(self, layer_data: FullLayerData) -> None:
+        if refine:
+            layer = _handle_image_at_resolution(image_layer, resolution)
+            # Read the middle plane, which napari shows first, so that its
+            # chunks are cached before the data is swapped on the main thread.
+            data = layer[0]
+            np.asarray(data[data.shape[0] // 2])
+            yield Refinement(layer)
+
+    def _onLayerLoaded(
+        self, layer_data: Union[FullLayerData, Refinement, AnnotationChoices]
+    ) -> None:
         logger.debug("OpenWidget._onLayerLoaded")
+        if isinstance(layer_data, AnnotationChoices):
+            self._annotations.addChoices(layer_data.choices)
+            return
+        # Add the layers that load close together in time in one pass on
+        # the main thread. The viewer's events are not suspended, so napari
+        # still updates the dims and slices each new layer as it is added.
+        self._pending_layers.append(layer_data)
+        if not self._flush_timer.isActive():
+            self._flush_timer.start()
+
+    def _flushLayers(self) -> None:
+        logger.debug("OpenWidget._flushLayers: %s", len(self._pending_layers))
+        self._flush_timer.stop()
+        pending = self._pending_layers
+        self._pending_layers = []
+        for layer_data in pending:
+            if isinstance(layer_data, Refinement):
+                self._refineImageLayer(layer_data.layer_data)
+            else:
+                self._addLayer(layer_data)
+
+    def _discardPendingLayers(self) -> None:
+        self._flush_timer.stop()
+        self._pending_layers = []
+        self._stale_layers = []
+
+    def _addLayer(self, layer_data: FullLayerData) -> None:
         data, attrs, layer_type = layer_data
+        stale_layer = self._popStaleLayer(attrs["name"], layer_type)
+        if stale_layer is not None:
+            if _is_layer_unchanged(stale_layer, layer_data):
+                logger.debug("OpenWidget._addLayer: keeping %s", stale_layer)
+                if layer_type == "image":
+                    self._image_layer = stale_layer
+                elif layer_type == "points":
+                    self._addPointsLayer(stale_layer)
+                return
+            # Remove the old layer first, so that the new one keeps its name.
+            self._viewer.layers.remove(stale_layer)
         if layer_type == "image":
-            self._viewer.add_image(data, **attrs)
+            self._image_layer = self._viewer.add_image(data, **attrs)
+            # napari limits the range to the given contrast limits, so widen
+            # it to the full range of the histogram when available.
+            bin_edges = attrs.get("metadata", {}).get("histogram", {}).get("bin_edges")
+            if bin_edges:
+                self._image_layer.contrast_limits_range = (bin_edges[0], bin_edges[-1])
         elif layer_type == "points":
-            self._viewer.add_points(data, **attrs)
+            self._addPointsLayer(self._viewer.add_points(data, **attrs))
         elif layer_type == "labels":
             self._viewer.add_labels(data, **attrs)
         else:
             raise AssertionError(f"Unexpected {layer_type=}")
 
+    def _addPointsLayer(self, layer: "Points") -> None:
+        self._points_layers.append(layer)
+        self._points_index = None
+        self._updatePointsSlab()
+
+    def _updatePointsSlab(self, *_: Any) -> None:
+        layers = [layer for layer in self._points_layers if layer in self._viewer.layers]
+        thickness = self._points_slab.value()
+        if thickness == 0:
+            for layer in layers:
+                if not np.all(layer.shown):
+                    layer.shown = np.ones(len(layer.data), dtype=bool)
+            return
+        if len(layers) == 0:
+            return
+        indexed = self._points_index
+        if indexed is None or not _are_same(indexed[0], layers):
+            logger.debug("OpenWidget._updatePointsSlab: indexing %s", len(layers))
+            # Key the points by position, because layers may be renamed.
+            index = PointsIndex(
+                {
+                    str(i): np.asarray(layer.data) * layer.scale + layer.translate
+                    for i, layer in enumerate(layers)
+                }
+            )
+            indexed = self._points_index = (tuple(layers), index)
+        indexed_layers, index = indexed
+        found = index.in_slab(self._viewer.dims.point[0], thickness)
+        for name, layer in zip(index.names, indexed_layers):
+            layer.shown = index.mask(found, name)
+
+    def _popStaleLayer(self, name: str, layer_type: str) -> Optional["Layer"]:
+        for i, layer in enumerate(self._stale_layers):
+            if layer.name == name and layer._type_string == layer_type:
+                del self._stale_layers[i]
+                return layer if layer in self._viewer.layers else None
+        return None
+
+    def _refineImageLayer(self, layer_data: FullLayerData) -> None:
+        logger.debug("OpenWidget._refineImageLayer")
+        layer = self._image_layer
+        # The user may have removed the coarse layer in the meantime.
+        if layer is None or layer not in self._viewer.layers:
+            return
+        from napari.layers import Image
+
+        data, attrs, _ = layer_data
+        # Create the refined layer with all the state of the coarse layer,
+        # which may have been changed by the user, and the final scale and
+        # translation, so that the new data is never shown at the old scale.
+        _, state, _ = layer.as_layer_data_tuple()
+        del state["multiscale"]
+        state.update(scale=attrs["scale"], translate=attrs["translate"])
+        refined = Image(data, **state)
+        refined.contrast_limits_range = layer.contrast_limits_range
+        refined.contrast_limits = layer.contrast_limits
+        # Swap in the refined layer at the same position, then take the name
+        # that napari made unique while both were in the viewer.
+        layers = self._viewer.layers
+        selected = layer in layers.selection
+        layers.insert(layers.index(layer), refined)
+        layers.remove(layer)
+        refined.name = state["name"]
+        if selected:
+            layers.selection.add(refined)
+        self._image_layer = refined
+
+    def _onTomogramLoaded(self, _: None) -> None:
+        logger.debug("OpenWidget._onTomogramLoaded")
+        self._flushLayers()
+        self._removeStaleLayers()
+        self.loaded.emit(self._tomogram)
+
+    def _removeStaleLayers(self) -> None:
+        for layer in self._stale_layers:
+            if layer in self._viewer.layers:
+                self._viewer.layers.remove(layer)
+        self._stale_layers = []
+
+
+def _sorted_annotation_files(
+    annotations: Sequence[Annotation],
+) -> List[Tuple[Annotation, AnnotationFile]]:
+    """Returns the files of the annotations, ordered from small to large.
+
+    The portal does not provide file sizes, so this estimates them: points
+    are usually much smaller than segmentation masks, and fewer points
+    are smaller than more points.
+    """
+    files = [(a, f) for a in annotations for f in a.files]
+    return sorted(files, key=lambda af: _annotation_file_cost(*af))
+
+
+def _annotation_file_cost(
+    annotation: Annotation, annotation_file: AnnotationFile
+) -> Tuple[int, int]:
+    if annotation_file.shape_type == "SegmentationMask":
+        return (1, 0)
+    return (0, annotation.object_count or 0)
+
+
+def _annotation_choice(
+    annotation: Annotation, annotation_file: AnnotationFile
+) -> AnnotationChoice:
+    return AnnotationChoice(
+        name=annotation.object_name,
+        shape_type=annotation_file.shape_type,
+        format=annotation_file.format,
+        count=annotation.object_count,
+    )
+
+
+def _grid_offsets(tomograms: Sequence[Tomogram]) -> List[Tuple[float, float, float]]:
+    """Returns the translation of each tomogram to lay them out in a square grid."""
+    extents = [
+        (t.size_y * t.voxel_spacing, t.size_x * t.voxel_spacing)
+        for t in tomograms
+    ]
+    cell_y = max((e[0] for e in extents), default=0) * (1 + GRID_SPACING)
+    cell_x = max((e[1] for e in extents), default=0) * (1 + GRID_SPACING)
+    columns = max(1, math.ceil(math.sqrt(len(tomograms))))
+    return [
+        (0, (i // columns) * cell_y, (i % columns) * cell_x)
+        for i in range(len(tomograms))
+    ]
+
+
+def _are_same(items: Sequence[Any], others: Sequence[Any]) -> bool:
+    return len(items) == len(others) and all(a is b for a, b in zip(items, others))
+
+
+def _offset_layer(
+    layer_data: FullLayerData, offset: Tuple[float, float, float]
+) -> FullLayerData:
+    data, attrs, layer_type = layer_data
+    translate = attrs.get("translate", (0,) * len(offset))
+    attrs["translate"] = tuple(t + o for t, o in zip(translate, offset))
+    return data, attrs, layer_type
+
+
+def _is_layer_unchanged(layer: "Layer", layer_data: FullLayerData) -> bool:
+    data, attrs, _ = layer_data
+    if getattr(layer, "multiscale", False):
+        old_shapes = tuple(tuple(s) for s in layer.level_shapes)
+    else:
+        old_shapes = (tuple(np.shape(layer.data)),)
+    if isinstance(data, list):
+        new_shapes = tuple(tuple(d.shape) for d in data)
+    else:
+        new_shapes = (tuple(np.shape(data)),)
+    ndim = len(layer.scale)
+    return (
+        _layer_identity(layer.metadata) == _layer_identity(attrs.get("metadata", {}))
+        and old_shapes == new_shapes
+        and np.allclose(layer.scale, attrs.get("scale", (1,) * ndim))
+        and np.allclose(layer.translate, attrs.get("translate", (0,) * ndim))
+    )
+
+
+def _layer_identity(metadata: Dict[str, Any]) -> Tuple[Any, ...]:
+    """Returns what identifies the entity and file that a layer was read from,
+    because layers of different tomograms can have the same name and shape."""
+    return tuple(metadata.get(k) for k in LAYER_IDENTITY_KEYS)
+
 
 def _handle_image_at_resolution(
     layer_data: FullLayerData, resolution: Resolution
@@ -177,9 +752,18 @@ def _handle_image_at_resolution(
     if resolution is not MULTI_RESOLUTION:
         data = data[resolution.indices[0]]
 
-    # Materialize low resolution immediately on this thread to prevent napari blocking.
-    # Once async loading is working on a stable napari release, we could remove this.
-    if resolution is LOW_RESOLUTION:
+    # Sparse segmentation masks are cropped to their stored chunks,
+    # so the translation below is offset by the origin of the crop.
+    origin = (0,) * len(attrs["scale"])
+    if isinstance(data, SparseChunkArray):
+        # Materialize low resolution immediately on this thread to prevent napari blocking.
+        # Once async loading is working on a stable napari release, we could remove this.
+        if resolution is LOW_RESOLUTION:
+            data, origin = data.read_occupied()
+        else:
+            data = data.crop_to_occupied()
+            origin = data.origin
+    elif resolution is LOW_RESOLUTION:
         data = np.asarray(data)
 
     # Adjust the scale and and translation based on the resolution.
@@ -191,8 +775,8 @@ def _handle_image_at_resolution(
     # starts at some scaled version of (-0.5, -0.5, -0.5).
     image_translate = attrs.get("translate", (0,) * len(image_scale))
     attrs["translate"] = tuple(
-        (s * (resolution.scale - 1) / 2) + t
-        for s, t in zip(image_scale, image_translate)
+        (s * (resolution.scale - 1) / 2) + t + (o * s * resolution.scale)
+        for s, t, o in zip(image_scale, image_translate, origin)
     )
     return data, attrs, layer_type
 
@@ -210,7 +794,7 @@ def _handle_points_at_scale(
     return data, attrs, layer_type
 
 
-@lru_cache(maxsize=None)
+@cache
 def _is_napari_version_less_than(version: str) -> bool:
     try:
         import napari
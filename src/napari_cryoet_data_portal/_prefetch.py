@@ -0,0 +1,186 @@
+"""Background prefetching of the tomograms next to the one that was opened."""
+
+import time
+from typing import Generator, Optional, Sequence, TypeVar
+
+import numpy as np
+import zarr
+from cryoet_data_portal import Annotation, Client, Tomogram
+from qtpy.QtCore import QObject, QThread
+
+from napari_cryoet_data_portal._client_pool import get_client
+from napari_cryoet_data_portal._logging import logger
+from napari_cryoet_data_portal._projection import complete
+from napari_cryoet_data_portal._reader import _multiscale_paths
+from napari_cryoet_data_portal._session import portal_url
+from napari_cryoet_data_portal._store import is_cached, open_store, read_bytes
+from napari_cryoet_data_portal._task_worker import TaskWorker
+
+T = TypeVar("T")
+
+# Number of tomograms on either side of the current one to prefetch.
+DEFAULT_PREFETCH_DEPTH = 1
+# Maximum average rate of prefetching, or None for no limit.
+DEFAULT_MAX_BYTES_PER_SECOND: Optional[float] = 20 * 2**20
+
+
+class Prefetcher(QObject):
+    """Fetches the data of tomograms into the local caches in the background.
+
+    This fetches the OME-Zarr metadata and lowest resolution level of each
+    tomogram and the files of its annotations, which is the data that is
+    read when opening a tomogram at low resolution.
+    Prefetching runs on a low priority thread and can be cancelled.
+    """
+
+    def __init__(
+        self,
+        parent: Optional[QObject] = None,
+        *,
+        depth: int = DEFAULT_PREFETCH_DEPTH,
+        max_bytes_per_second: Optional[float] = DEFAULT_MAX_BYTES_PER_SECOND,
+    ) -> None:
+        super().__init__(parent)
+        self.depth = depth
+        self.max_bytes_per_second = max_bytes_per_second
+        self._uri: Optional[str] = None
+        self._worker: Optional[TaskWorker] = None
+
+    def setUri(self, uri: str) -> None:
+        """Sets the URI of the portal that should be used to find annotations."""
+        self._uri = uri
+
+    def submit(self, tomograms: Sequence[Tomogram]) -> None:
+        """Prefetches the given tomograms in order, cancelling any previous prefetch."""
+        logger.debug("Prefetcher.submit: %s", [t.name for t in tomograms])
+        self.cancel()
+        if len(tomograms) == 0:
+            return
+        self._worker = TaskWorker(
+            self,
+            _at_lowest_priority,
+            _prefetch(
+                tuple(tomograms),
+                uri=self._uri,
+                max_bytes_per_second=self.max_bytes_per_second,
+            ),
+        )
+        self._worker.start()
+
+    def cancel(self) -> None:
+        """Cancels the last prefetch."""
+        if self._worker is None:
+            return
+        logger.debug("Prefetcher.cancel")
+        self._worker.cancel()
+        self._worker = None
+
+
+def _at_lowest_priority(work: Generator[T, None, None]) -> Generator[T, None, None]:
+    """Runs a generator on a thread of the lowest priority between its yields.
+
+    The priority is restored before each yield, because a worker that is quit
+    stops iterating at a yield without closing the generator, and its pool
+    thread is then reused by other tasks.
+    """
+    thread = QThread.currentThread()
+    priority = thread.priority()
+    # Threads that were never given a priority report one that cannot be set.
+    if priority == QThread.Priority.InheritPriority:
+        priority = QThread.Priority.NormalPriority
+    while True:
+        thread.setPriority(QThread.Priority.LowestPriority)
+        try:
+            value = next(work)
+        except StopIteration:
+            return
+        finally:
+            thread.setPriority(priority)
+        yield value
+
+
+def _prefetch(
+    tomograms: Sequence[Tomogram],
+    *,
+    uri: Optional[str],
+    max_bytes_per_second: Optional[float],
+) -> Generator[None, None, None]:
+    limiter = _RateLimiter(max_bytes_per_second)
+    # Looking up annotations needs a client that is only used by this thread.
+    client = get_client(uri)
+    for tomogram in tomograms:
+        logger.debug("_prefetch: %s", tomogram.name)
+        try:
+            for nbytes in _prefetch_tomogram(tomogram, client):
+                yield from limiter.throttle(nbytes)
+        except Exception as e:  # noqa: BLE001
+            # Prefetching is only an optimization, so failures should
+            # not bother the user.
+            logger.debug("Failed to prefetch %s: %s", tomogram.name, e)
+
+
+def _prefetch_tomogram(
+    tomogram: Tomogram, client: Client
+) -> Generator[int, None, None]:
+    complete(tomogram, client)
+    yield from _prefetch_lowest_level(
+        portal_url(tomogram.https_omezarr_dir, tomogram.s3_omezarr_dir)
+    )
+    annotations = Annotation.find(
+        client,
+        [
+            Annotation.tomogram_voxel_spacing_id
+            == tomogram.tomogram_voxel_spacing_id
+        ],
+    )
+    for annotation in annotations:
+        for f in annotation.files:
+            path = portal_url(f.https_path, f.s3_path)
+            if (f.shape_type in ("Point", "OrientedPoint")) and (f.format == "ndjson"):
+                if not is_cached(path):
+                    yield len(read_bytes(path))
+            elif (f.shape_type == "SegmentationMask") and (f.format == "zarr"):
+                yield from _prefetch_lowest_level(path)
+
+
+def _prefetch_lowest_level(path: str) -> Generator[int, None, None]:
+    """Reads the metadata and each chunk of the lowest level of an OME-Zarr image.
+
+    Yields the number of bytes fetched after each read.
+    """
+    store = open_store(path)
+    group = zarr.open_group(store, mode="r")
+    array = group[_multiscale_paths(group)[-1]]
+    yield store.bytes_fetched
+    chunks = array.chunks
+    grid = tuple(-(-s // c) for s, c in zip(array.shape, chunks))
+    for index in np.ndindex(*grid):
+        before = store.bytes_fetched
+        array[tuple(slice(i * c, (i + 1) * c) for i, c in zip(index, chunks))]
+        yield store.bytes_fetched - before
+
+
+class _RateLimiter:
+    """Limits the average rate of fetched bytes by sleeping.
+
+    Sleeps are short and interleaved with yields, so that a generator
+    worker can be cancelled quickly while throttled.
+    """
+
+    def __init__(self, max_bytes_per_second: Optional[float]) -> None:
+        self._max_bytes_per_second = max_bytes_per_second
+        self._start = time.monotonic()
+        self._nbytes = 0
+
+    def throttle(self, nbytes: int) -> Generator[None, None, None]:
+        self._nbytes += nbytes
+        if self._max_bytes_per_second is not None:
+            while (wait := self._wait()) > 0:
+                time.sleep(min(wait, 0.05))
+                yield
+        yield
+
+    def _wait(self) -> float:
+        assert self._max_bytes_per_second is not None
+        elapsed = time.monotonic() - self._start
+        return self._nbytes / self._max_bytes_per_second - elapsed
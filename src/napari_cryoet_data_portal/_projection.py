@@ -0,0 +1,215 @@
+"""Queries that only find some fields of portal entities and their relations.
+
+The portal's models always query all of their scalar fields and query each
+relationship separately. Selecting only the fields that are needed, with
+related entities nested in the same query, makes responses smaller and
+avoids a round trip per relationship.
+"""
+
+import threading
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Type, TypeVar
+
+from cryoet_data_portal import Client, Dataset, Run, Tomogram, TomogramVoxelSpacing
+from cryoet_data_portal._gql_base import GQLExpression, ListRelationship, Model
+from gql.dsl import DSLQuery, dsl_gql
+
+from napari_cryoet_data_portal._logging import logger
+from napari_cryoet_data_portal._mirror import MirrorClient
+
+M = TypeVar("M", bound=Model)
+# The names of the scalar fields to find for each type of entity.
+# Types that are not included have all of their scalar fields found.
+Fields = Mapping[Type[Model], Sequence[str]]
+# The names of the relationships to find for a type of entity, each with
+# the relationships to find for the related type.
+Related = Mapping[str, "Related"]
+Item = Dict[str, Any]
+
+# The fields that the listing shows or needs before opening a tomogram,
+# e.g. to lay out many tomograms in a grid.
+LISTING_FIELDS: Fields = {
+    Dataset: ("id", "release_date", "last_modified_date"),
+    Run: ("id",),
+    TomogramVoxelSpacing: ("id",),
+    Tomogram: (
+        "id",
+        "name",
+        "tomogram_voxel_spacing_id",
+        "size_x",
+        "size_y",
+        "size_z",
+        "voxel_spacing",
+    ),
+}
+
+
+def find_items(
+    client: Client,
+    cls: Type[Model],
+    where: Optional[Dict[str, Any]] = None,
+    *,
+    fields: Optional[Fields] = None,
+    related: Optional[Related] = None,
+    **arguments: Any,
+) -> List[Item]:
+    """Finds entities and their related entities with one query.
+
+    Parameters
+    ----------
+    client : Client
+        The client used to find the entities.
+    cls : type of Model
+        The type of the entities to find.
+    where : dict, optional
+        The GraphQL filters of the entities to find.
+    fields : mapping of type of Model to sequence of str, optional
+        The scalar fields to find for each type. If None, all are found.
+    related : mapping of str to mapping, optional
+        The relationships of the entities to find, which may be nested.
+    **arguments
+        Other arguments of the query, like `limit`, `offset` and `order_by`.
+
+    Returns
+    -------
+    list of dict
+        The found fields of each entity, where each relationship is a dict or
+        a list of dicts of the related entities. Use `to_model` to make models.
+    """
+    related = related or {}
+    if isinstance(client, MirrorClient):
+        return _find_mirror_items(client, cls, where or {}, fields, related, arguments)
+    if where:
+        arguments = {"where": where, **arguments}
+    ds = client.ds
+    gql_type = cls._get_gql_type()
+    query = dsl_gql(
+        DSLQuery(
+            getattr(ds.query_root, gql_type)(**arguments).select(
+                *_selection(ds, cls, fields, related)
+            )
+        )
+    )
+    response = client.client.execute(query)
+    return response[gql_type]
+
+
+def to_model(
+    client: Client, cls: Type[M], item: Item, fields: Optional[Fields] = None
+) -> M:
+    """Makes a model from an item found with `find_items` and the same fields.
+
+    If only some fields were found, the model is marked, so that its other
+    fields can be found later with `complete`.
+    """
+    model = cls(client, **item)
+    model._projected = _field_names(cls, fields) != cls._get_scalar_fields()
+    if model._projected:
+        # Models are shared between threads, which may complete them at once.
+        model._complete_lock = threading.Lock()
+    return model
+
+
+def complete(model: M, client: Client) -> M:
+    """Finds the fields of a model that were not found by a projection.
+
+    The model is updated in place, so that it can still be compared by
+    identity, and is returned for convenience. This queries the portal
+    at most once for each model, even if it is completed from many threads
+    at once, and returns only after all of its fields were found.
+    """
+    if not getattr(model, "_projected", False):
+        return model
+    with model._complete_lock:
+        if not model._projected:
+            return model
+        logger.debug("complete: %s, %s", type(model).__name__, model.id)
+        found = client.find(type(model), {"id": {"_eq": model.id}})
+        if len(found) > 0:
+            for name, value in found[0].to_dict().items():
+                setattr(model, name, value)
+        model._projected = False
+    return model
+
+
+def to_where(expressions: Iterable[GQLExpression]) -> Dict[str, Any]:
+    """Combines filter expressions into the where argument of a query.
+
+    This merges the expressions like the portal client does, so that
+    filters on the same related entity are nested together.
+    """
+    where: Dict[str, Any] = {}
+    for expression in expressions:
+        _merge_where(where, expression.to_gql())
+    return where
+
+
+def _merge_where(where: Dict[str, Any], other: Mapping[str, Any]) -> None:
+    for key, value in other.items():
+        current = where.get(key)
+        if isinstance(current, dict) and isinstance(value, Mapping):
+            _merge_where(current, value)
+        elif isinstance(current, list) and isinstance(value, list):
+            current.extend(value)
+        else:
+            where[key] = value
+
+
+def _field_names(cls: Type[Model], fields: Optional[Fields]) -> List[str]:
+    scalar_fields = cls._get_scalar_fields()
+    if fields is None or cls not in fields:
+        return scalar_fields
+    return [name for name in scalar_fields if name in fields[cls]]
+
+
+def _selection(ds: Any, cls: Type[Model], fields: Optional[Fields], related: Related) -> List[Any]:
+    gql_type = getattr(ds, cls._get_gql_type())
+    selection = [getattr(gql_type, name) for name in _field_names(cls, fields)]
+    for name, nested in related.items():
+        related_cls = cls.__dict__[name].get_related_class()
+        selection.append(
+            getattr(gql_type, name).select(*_selection(ds, related_cls, fields, nested))
+        )
+    return selection
+
+
+def _find_mirror_items(
+    client: MirrorClient,
+    cls: Type[Model],
+    where: Dict[str, Any],
+    fields: Optional[Fields],
+    related: Related,
+    arguments: Dict[str, Any],
+) -> List[Item]:
+    records = client.records(cls, where)
+    for order in reversed(arguments.get("order_by", [])):
+        for name, direction in order.items():
+            records.sort(key=lambda r: r.get(name), reverse=direction == "desc")
+    offset = arguments.get("offset", 0)
+    limit = arguments.get("limit")
+    records = records[offset:None if limit is None else offset + limit]
+    return [_mirror_item(client, cls, r, fields, related) for r in records]
+
+
+def _mirror_item(
+    client: MirrorClient,
+    cls: Type[Model],
+    record: Item,
+    fields: Optional[Fields],
+    related: Related,
+) -> Item:
+    item = {name: record.get(name) for name in _field_names(cls, fields)}
+    for name, nested in related.items():
+        relationship = cls.__dict__[name]
+        related_cls = relationship.get_related_class()
+        related_where = {
+            relationship.dest_field: {"_eq": record.get(relationship.source_field)}
+        }
+        items = [
+            _mirror_item(client, related_cls, r, fields, nested)
+            for r in client.records(related_cls, related_where)
+        ]
+        if isinstance(relationship, ListRelationship):
+            item[name] = items
+        else:
+            item[name] = items[0] if len(items) > 0 else None
+    return item
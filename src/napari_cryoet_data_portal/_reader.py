@@ -1,11 +1,16 @@
 """Functions to read data from the portal into napari types."""
 
+import os
 import warnings
-from typing import Any, Dict, Generator, List, Optional, Tuple
-import fsspec
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Generator, List, Optional, Sequence, Tuple
 
+import dask.array as da
+import mrcfile
 import numpy as np
 import ndjson
+import zarr
 from napari_ome_zarr import napari_get_reader
 from npe2.types import FullLayerData, PathOrPaths, ReaderFunction
 from cryoet_data_portal import Annotation, AnnotationFile, Tomogram
@@ -13,11 +18,20 @@ from cmap import Colormap
 from napari.utils.colormaps import direct_colormap
 
 from napari_cryoet_data_portal._logging import logger
+from napari_cryoet_data_portal._session import portal_url
+from napari_cryoet_data_portal._sparse import SparseChunkArray
+from napari_cryoet_data_portal._store import CachedStore, open_store, preload_metadata, read_bytes
 
 # Maps integer value of Annotation.object_id to a color.
 OBJECT_COLORMAP = Colormap("colorbrewer:set1_8")
 # Fallback color when ID cannot be parsed.
 DEFAULT_OBJECT_COLOR = np.array(OBJECT_COLORMAP(0).rgba)
+# Number of z-slices in each chunk of a memory-mapped MRC file, which keeps
+# each chunk contiguous in the file.
+MRC_CHUNK_DEPTH = 32
+# Environment variable of the number of downsampled levels that the MRC
+# reader entry point builds in memory, which defaults to none.
+MRC_PYRAMID_LEVELS_ENV = "NAPARI_CRYOET_DATA_PORTAL_MRC_PYRAMID_LEVELS"
 
 
 def _annotation_color(annotation: Annotation) -> np.ndarray:
@@ -86,11 +100,169 @@ def read_tomogram_ome_zarr(path: str) -> FullLayerData:
     >>> data, attrs, _ = read_tomogram_ome_zarr(path)
     >>> image = Image(data, **attrs)
     """
-    reader = napari_get_reader(path)
-    layers = reader(path)
+    return _read_ome_zarr(open_store(path))
+
+
+def _read_ome_zarr(store: CachedStore) -> FullLayerData:
+    preload_metadata(store)
+    reader = napari_get_reader(store)
+    layers = reader(store)
     return layers[0]
 
 
+def read_segmentation_mask_ome_zarr(path: str) -> FullLayerData:
+    """Reads a napari labels layer from a segmentation mask in the OME-Zarr format.
+
+    Unlike `read_tomogram_ome_zarr`, each level of the returned multiscale
+    data skips reading chunks that are not stored, which is typically most
+    of a segmentation mask. Chunk occupancy is found by listing the store
+    or from a persistent cache. For stores that cannot be listed (e.g. HTTPS),
+    the occupancy of a level is found by reading it once with
+    `SparseChunkArray.read_occupied`, and reads of it are passed through
+    until then, so that no stored labels are skipped.
+
+    Parameters
+    ----------
+    path : str
+        The path of the OME-Zarr directory.
+
+    Returns
+    -------
+    napari layer data tuple
+        The data, attributes, and type name of the labels layer that would be
+        returned by `Labels.as_layer_data_tuple`.
+
+    Examples
+    --------
+    >>> path = 's3://cryoet-data-portal-public/10000/TS_026/Tomograms/VoxelSpacing13.480/Annotations/mask.zarr'
+    >>> data, attrs, _ = read_segmentation_mask_ome_zarr(path)
+    >>> cropped = data[-1].crop_to_occupied()
+    """
+    store = open_store(path)
+    _, attributes, _ = _read_ome_zarr(store)
+    group = zarr.open_group(store, mode="r")
+    paths = _multiscale_paths(group)
+    url = path.rstrip("/")
+    data = [SparseChunkArray(group[p], f"{url}/{p}") for p in paths]
+    return data, attributes, "labels"
+
+
+def _multiscale_paths(group: zarr.Group) -> List[str]:
+    attrs = group.attrs.asdict()
+    # OME-Zarr v0.5 nests the metadata under an "ome" key.
+    multiscales = attrs.get("ome", attrs)["multiscales"]
+    return [d["path"] for d in multiscales[0]["datasets"]]
+
+
+def tomogram_mrc_reader(path: PathOrPaths) -> Optional[ReaderFunction]:
+    """napari plugin entry point for reading local tomograms in the MRC format.
+
+    Parameters
+    ----------
+    path : str or sequence of str
+        The path or paths of the MRC files containing tomograms.
+
+    Returns
+    -------
+    A function that can be called with the same path parameter to produce
+    a list of napari image layer data tuples.
+
+    See also
+    --------
+    read_tomogram_mrc : reads napari layer data from one MRC file
+
+    Examples
+    --------
+    >>> path = '/data/10000/TS_026/Tomograms/VoxelSpacing13.48/CanonicalTomogram/TS_026.mrc'
+    >>> reader = tomogram_mrc_reader(path)
+    >>> layers = reader(path)
+    """
+    return _read_many_tomograms_mrc
+
+
+def _read_many_tomograms_mrc(paths: PathOrPaths) -> List[FullLayerData]:
+    if isinstance(paths, str):
+        paths = [paths]
+    pyramid_levels = int(os.environ.get(MRC_PYRAMID_LEVELS_ENV, 0))
+    return [read_tomogram_mrc(p, pyramid_levels=pyramid_levels) for p in paths]
+
+
+def read_tomogram_mrc(path: str, *, pyramid_levels: int = 0) -> FullLayerData:
+    """Reads a napari image layer from a local tomogram in the MRC format.
+
+    The file is memory-mapped rather than read, so opening it is fast
+    regardless of its size, and only the data that is displayed is read.
+
+    Parameters
+    ----------
+    path : str
+        The path of the MRC file.
+    pyramid_levels : int
+        The number of levels, each downsampled by 2 from the previous one,
+        to build in memory. Building these reads the whole file, but makes
+        exploring the tomogram faster afterwards.
+
+    Returns
+    -------
+    napari layer data tuple
+        The data, attributes, and type name of the image layer that would be
+        returned by `Image.as_layer_data_tuple`.
+
+    Examples
+    --------
+    >>> path = '/data/10000/TS_026/Tomograms/VoxelSpacing13.48/CanonicalTomogram/TS_026.mrc'
+    >>> data, attrs, _ = read_tomogram_mrc(path, pyramid_levels=2)
+    >>> image = Image(data, **attrs)
+    """
+    with mrcfile.mmap(path, mode="r", permissive=True) as mrc:
+        # The memory-mapped data stays valid after closing the file.
+        memmap = mrc.data
+        voxel_size = mrc.voxel_size
+    scale = tuple(
+        float(s) if s > 0 else 1.0
+        for s in (voxel_size.z, voxel_size.y, voxel_size.x)
+    )
+    chunks = (MRC_CHUNK_DEPTH,) + memmap.shape[1:]
+    data: Any = da.from_array(memmap, chunks=chunks)
+    attributes: Dict[str, Any] = {
+        "name": Path(path).stem,
+        "scale": scale,
+        "metadata": {"path": path},
+    }
+    if pyramid_levels > 0:
+        data = [data] + _build_pyramid(memmap, pyramid_levels)
+        attributes["multiscale"] = True
+    return data, attributes, "image"
+
+
+def _build_pyramid(data: np.ndarray, levels: int) -> List[np.ndarray]:
+    pyramid: List[np.ndarray] = []
+    with ThreadPoolExecutor() as executor:
+        for _ in range(levels):
+            if min(data.shape) < 2:
+                break
+            data = _downsample(data, executor)
+            pyramid.append(data)
+    return pyramid
+
+
+def _downsample(data: np.ndarray, executor: ThreadPoolExecutor) -> np.ndarray:
+    """Downsamples by 2 along each axis by averaging, one z-slab per task."""
+    shape = tuple(s // 2 for s in data.shape)
+    out = np.empty(shape, dtype=data.dtype)
+
+    def downsample_slab(z: int) -> None:
+        stop = min(z + MRC_CHUNK_DEPTH, shape[0])
+        slab = np.asarray(
+            data[2 * z:2 * stop, :2 * shape[1], :2 * shape[2]], dtype=np.float32
+        )
+        slab = slab.reshape(stop - z, 2, shape[1], 2, shape[2], 2)
+        out[z:stop] = slab.mean(axis=(1, 3, 5)).astype(data.dtype)
+
+    list(executor.map(downsample_slab, range(0, shape[0], MRC_CHUNK_DEPTH)))
+    return out
+
+
 def read_tomogram(tomogram: Tomogram) -> FullLayerData:
     """Reads a napari image layer from a tomogram.
 
@@ -112,7 +284,76 @@ def read_tomogram(tomogram: Tomogram) -> FullLayerData:
     >>> data, attrs, _ = read_tomogram(tomogram)
     >>> image = Image(data, **attrs)
     """
-    data, attributes, layer_type = read_tomogram_ome_zarr(tomogram.https_omezarr_dir)
+    path = portal_url(tomogram.https_omezarr_dir, tomogram.s3_omezarr_dir)
+    return _tomogram_layer(read_tomogram_ome_zarr(path), tomogram)
+
+
+def read_region(
+    layer: FullLayerData,
+    lower: Sequence[float],
+    upper: Sequence[float],
+    *,
+    level: int = 0,
+) -> FullLayerData:
+    """Reads a box of one level of a multiscale image or labels layer into memory.
+
+    Only the chunks of the level that intersect the box are read, so a small
+    region costs a small read even at full resolution.
+
+    Parameters
+    ----------
+    layer : napari layer data tuple
+        A multiscale layer, like those returned by `read_tomogram`,
+        `read_tomogram_ome_zarr` or `read_segmentation_mask_ome_zarr`.
+    lower : sequence of float
+        The lower corner of the box in zyx physical coordinates.
+    upper : sequence of float
+        The upper corner of the box in zyx physical coordinates.
+    level : int
+        The index of the multiscale level to read.
+
+    Returns
+    -------
+    napari layer data tuple
+        The layer with the voxels of the level that overlap the box, where the
+        scale and translation place them at the same physical position as in
+        the whole layer.
+
+    Examples
+    --------
+    >>> layer = read_tomogram(tomogram)
+    >>> data, attrs, _ = read_region(layer, (1000, 0, 0), (1500, 4000, 4000))
+    >>> image = Image(data, **attrs)
+    """
+    data, attributes, layer_type = layer
+    attributes = dict(attributes)
+    if "multiscale" in attributes:
+        attributes["multiscale"] = False
+    array = data[level]
+    ndim = len(array.shape)
+    image_scale = np.asarray(attributes.get("scale", (1,) * ndim), dtype=float)
+    image_translate = np.asarray(attributes.get("translate", (0,) * ndim), dtype=float)
+    # Each level is downsampled by an integer factor, but odd sizes make
+    # the ratio of shapes slightly smaller.
+    factors = np.maximum(np.round(np.asarray(data[0].shape) / np.asarray(array.shape)), 1)
+    scale = image_scale * factors
+    # Offset by the larger first voxel of lower resolutions, like
+    # `_handle_image_at_resolution`.
+    translate = image_translate + image_scale * (factors - 1) / 2
+    # Include every voxel whose extent overlaps the box.
+    start = np.floor((np.asarray(lower, dtype=float) - translate) / scale + 0.5)
+    stop = np.ceil((np.asarray(upper, dtype=float) - translate) / scale + 0.5)
+    start = np.clip(start, 0, array.shape).astype(int)
+    stop = np.clip(stop, start, array.shape).astype(int)
+    logger.debug("read_region: %s, %s, %s", level, start, stop)
+    region = np.asarray(array[tuple(slice(a, b) for a, b in zip(start, stop))])
+    attributes["scale"] = tuple(float(s) for s in scale)
+    attributes["translate"] = tuple(float(t) for t in translate + start * scale)
+    return region, attributes, layer_type
+
+
+def _tomogram_layer(layer: FullLayerData, tomogram: Tomogram) -> FullLayerData:
+    data, attributes, layer_type = layer
     attributes["name"] = tomogram.name
     attributes["metadata"] = tomogram.to_dict()
     return data, attributes, layer_type
@@ -174,7 +415,10 @@ def read_points_annotations_ndjson(path: str) -> FullLayerData:
     >>> data, attrs, _ = read_points_annotations_ndjson(path)
     >>> points = Points(data, **attrs)
     """
-    data = _read_points_data(path)
+    return _points_layer(_read_points_data(path))
+
+
+def _points_layer(data: List[Tuple[float, float, float]]) -> FullLayerData:
     attributes = {
         "name": "annotations",
         "size": 14,
@@ -232,7 +476,7 @@ def read_annotation(annotation: Annotation, *, tomogram: Optional[Tomogram] = No
     return data, attributes, layer_type
 
 
-def read_annotation_files(annotation: Annotation, *, tomogram: Optional[Tomogram] = None) -> Generator[FullLayerData, None, None]:
+def read_annotation_files(annotation: Annotation, *, tomogram: Optional[Tomogram] = None, skip_empty_chunks: bool = False, files: Optional[Sequence[AnnotationFile]] = None) -> Generator[FullLayerData, None, None]:
     """Reads multiple annotation layers.
 
     Parameters
@@ -241,6 +485,11 @@ def read_annotation_files(annotation: Annotation, *, tomogram: Optional[Tomogram
         The tomogram annotation.
     tomogram : Tomogram, optional
         The associated tomogram, which may be used for other metadata.
+    skip_empty_chunks : bool
+        If true, read segmentation masks with `read_segmentation_mask_ome_zarr`
+        so that empty chunks are skipped.
+    files : sequence of AnnotationFile, optional
+        The files of the annotation to read. If None, all of its files are read.
 
     Yields
     -------
@@ -255,11 +504,11 @@ def read_annotation_files(annotation: Annotation, *, tomogram: Optional[Tomogram
     >>> for data, attrs, typ in read_annotation_files(annotation):
             layer = Layer.create(data, attrs, typ)
     """
-    for f in annotation.files:
+    for f in annotation.files if files is None else files:
         if (f.shape_type in ("Point", "OrientedPoint")) and (f.format == "ndjson"):
             yield _read_points_annotation_file(f, anno=annotation, tomogram=tomogram)
         elif (f.shape_type == "SegmentationMask") and (f.format == "zarr"):
-            yield _read_labels_annotation_file(f, anno=annotation, tomogram=tomogram)
+            yield _read_labels_annotation_file(f, anno=annotation, tomogram=tomogram, skip_empty_chunks=skip_empty_chunks)
         else:
             logger.warn("Found unsupported annotation file: %s, %s. Skipping.", f.shape_type, f.format)
 
@@ -267,7 +516,14 @@ def read_annotation_files(annotation: Annotation, *, tomogram: Optional[Tomogram
 def _read_points_annotation_file(anno_file: AnnotationFile, *, anno: Annotation, tomogram: Optional[Tomogram]) -> FullLayerData:
     assert anno_file.shape_type in ("Point", "OrientedPoint")
     assert anno_file.format == "ndjson"
-    data, attributes, layer_type = read_points_annotations_ndjson(anno_file.https_path)
+    path = portal_url(anno_file.https_path, anno_file.s3_path)
+    return _points_annotation_layer(
+        read_points_annotations_ndjson(path), anno_file, anno=anno, tomogram=tomogram
+    )
+
+
+def _points_annotation_layer(layer: FullLayerData, anno_file: AnnotationFile, *, anno: Annotation, tomogram: Optional[Tomogram]) -> FullLayerData:
+    data, attributes, layer_type = layer
     name = anno.object_name
     if tomogram is None:
         attributes["name"] = name
@@ -278,10 +534,19 @@ def _read_points_annotation_file(anno_file: AnnotationFile, *, anno: Annotation,
     return data, attributes, layer_type
 
 
-def _read_labels_annotation_file(anno_file: AnnotationFile, *, anno: Annotation, tomogram: Optional[Tomogram]) -> FullLayerData:
+def _read_labels_annotation_file(anno_file: AnnotationFile, *, anno: Annotation, tomogram: Optional[Tomogram], skip_empty_chunks: bool = False) -> FullLayerData:
     assert anno_file.shape_type == "SegmentationMask"
     assert anno_file.format == "zarr"
-    data, attributes, _ = read_tomogram_ome_zarr(anno_file.https_path)
+    path = portal_url(anno_file.https_path, anno_file.s3_path)
+    if skip_empty_chunks:
+        layer = read_segmentation_mask_ome_zarr(path)
+    else:
+        layer = read_tomogram_ome_zarr(path)
+    return _labels_annotation_layer(layer, anno_file, anno=anno, tomogram=tomogram)
+
+
+def _labels_annotation_layer(layer: FullLayerData, anno_file: AnnotationFile, *, anno: Annotation, tomogram: Optional[Tomogram]) -> FullLayerData:
+    data, attributes, _ = layer
     name = anno.object_name
     if tomogram is None:
         attributes["name"] = name
@@ -299,15 +564,15 @@ def _read_labels_annotation_file(anno_file: AnnotationFile, *, anno: Annotation,
 def _read_points_data(
     path: str,
 ) -> List[Tuple[float, float, float]]:
-    data: List[Tuple[float, float, float]] = []
-    with fsspec.open(path) as f:
-        sub_data = [
-            _annotation_to_point(annotation)
-            for annotation in ndjson.load(f)
-            if annotation["type"] in ("point", "orientedPoint")
-        ]
-        data.extend(sub_data)
-    return data
+    return _points_from_ndjson(read_bytes(path))
+
+
+def _points_from_ndjson(content: bytes) -> List[Tuple[float, float, float]]:
+    return [
+        _annotation_to_point(annotation)
+        for annotation in ndjson.loads(content.decode())
+        if annotation["type"] in ("point", "orientedPoint")
+    ]
 
 
 def _annotation_to_point(
@@ -0,0 +1,146 @@
+"""Batch reading of all the tomograms and annotations of runs."""
+
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import Dict, Generator, Iterable, List, Optional, Sequence, Tuple, Union
+
+from cryoet_data_portal import (
+    Annotation,
+    AnnotationFile,
+    Run,
+    Tomogram,
+    TomogramVoxelSpacing,
+)
+from npe2.types import FullLayerData
+
+from napari_cryoet_data_portal._client_pool import get_client
+from napari_cryoet_data_portal._logging import logger
+from napari_cryoet_data_portal._reader import read_annotation_files, read_tomogram
+
+# Maximum number of files read concurrently.
+DEFAULT_MAX_WORKERS = 8
+
+
+def read_runs(
+    runs: Iterable[Union[Run, int]],
+    *,
+    uri: Optional[str] = None,
+    annotations: bool = True,
+    skip_empty_chunks: bool = False,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+) -> Generator[FullLayerData, None, None]:
+    """Reads the layers of all the tomograms and annotations of runs.
+
+    Unlike reading each tomogram and annotation in turn, which queries the
+    portal for each of their related entities, this finds the voxel spacings,
+    tomograms, annotations and annotation files of all the runs with four
+    queries in total. Then tomograms and annotation files are read
+    concurrently, and their layers are yielded as each is read.
+
+    Parameters
+    ----------
+    runs : iterable of Run or int
+        The runs, or their IDs, to read.
+    uri : str, optional
+        The URI of the portal or mirror to query. If None, uses the default.
+    annotations : bool
+        If true, also read the annotations of the tomograms.
+    skip_empty_chunks : bool
+        If true, read segmentation masks with `read_segmentation_mask_ome_zarr`
+        so that empty chunks are skipped.
+    max_workers : int
+        The maximum number of tomograms and files read concurrently.
+
+    Yields
+    -------
+    napari layer data tuple
+        The data, attributes, and type name of each layer in the order they
+        are read. Annotation layers are named after the first tomogram with
+        the same voxel spacing.
+
+    Examples
+    --------
+    >>> for data, attrs, typ in read_runs([15050, 15051]):
+            layer = Layer.create(data, attrs, typ)
+    """
+    run_ids = tuple(r.id if isinstance(r, Run) else r for r in runs)
+    if len(run_ids) == 0:
+        return
+    client = get_client(uri)
+    spacings = TomogramVoxelSpacing.find(
+        client, [TomogramVoxelSpacing.run_id._in(run_ids)]
+    )
+    spacing_ids = tuple(s.id for s in spacings)
+    logger.debug("read_runs: %s, %s", run_ids, spacing_ids)
+    if len(spacing_ids) == 0:
+        return
+
+    with ThreadPoolExecutor(max_workers) as executor:
+        # The annotations only depend on the voxel spacings, so find them
+        # while the tomograms are found.
+        found_annotations: Optional[Future] = None
+        if annotations:
+            found_annotations = executor.submit(_find_annotations, uri, spacing_ids)
+        tomograms = Tomogram.find(
+            client, [Tomogram.tomogram_voxel_spacing_id._in(spacing_ids)]
+        )
+        futures: List[Future] = [executor.submit(_read_tomogram, t) for t in tomograms]
+        if found_annotations is not None:
+            first_tomograms: Dict[int, Tomogram] = {}
+            for t in tomograms:
+                first_tomograms.setdefault(t.tomogram_voxel_spacing_id, t)
+            for annotation, files in found_annotations.result():
+                for f in files:
+                    futures.append(
+                        executor.submit(
+                            _read_annotation_file,
+                            annotation,
+                            f,
+                            first_tomograms.get(annotation.tomogram_voxel_spacing_id),
+                            skip_empty_chunks,
+                        )
+                    )
+        try:
+            for future in as_completed(futures):
+                yield from future.result()
+        finally:
+            # Stop the remaining reads if the caller stops early or fails.
+            for future in futures:
+                future.cancel()
+
+
+def _find_annotations(
+    uri: Optional[str], spacing_ids: Sequence[int]
+) -> List[Tuple[Annotation, List[AnnotationFile]]]:
+    client = get_client(uri)
+    annotations = Annotation.find(
+        client, [Annotation.tomogram_voxel_spacing_id._in(spacing_ids)]
+    )
+    if len(annotations) == 0:
+        return []
+    files: Dict[int, List[AnnotationFile]] = defaultdict(list)
+    for f in AnnotationFile.find(
+        client, [AnnotationFile.annotation_id._in(tuple(a.id for a in annotations))]
+    ):
+        files[f.annotation_id].append(f)
+    return [(a, files[a.id]) for a in annotations]
+
+
+def _read_tomogram(tomogram: Tomogram) -> List[FullLayerData]:
+    return [read_tomogram(tomogram)]
+
+
+def _read_annotation_file(
+    annotation: Annotation,
+    annotation_file: AnnotationFile,
+    tomogram: Optional[Tomogram],
+    skip_empty_chunks: bool,
+) -> List[FullLayerData]:
+    return list(
+        read_annotation_files(
+            annotation,
+            tomogram=tomogram,
+            skip_empty_chunks=skip_empty_chunks,
+            files=(annotation_file,),
+        )
+    )
@@ -0,0 +1,222 @@
+"""Shared configuration of the HTTP sessions used to read data from the portal."""
+
+import asyncio
+import threading
+import time
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+import aiohttp
+import fsspec
+
+from napari_cryoet_data_portal._logging import logger
+
+T = TypeVar("T")
+
+# HTTP status codes of responses that are worth retrying.
+_RETRY_STATUSES = frozenset((408, 429, 500, 502, 503, 504))
+
+# Errors of requests that may succeed when retried, whatever their details.
+_TRANSIENT_ERRORS = (aiohttp.ClientConnectionError, asyncio.TimeoutError, ConnectionError)
+
+# Errors that are retried if they are transient. Responses are retried only
+# for some statuses; anything else is raised immediately.
+_RETRIED_ERRORS = (*_TRANSIENT_ERRORS, aiohttp.ClientResponseError)
+
+# Transports that can be used to read data from the portal.
+HTTPS_TRANSPORT = "https"
+S3_TRANSPORT = "s3"
+# Chooses the transport with the highest measured throughput.
+AUTO_TRANSPORT = "auto"
+TRANSPORTS = (HTTPS_TRANSPORT, S3_TRANSPORT, AUTO_TRANSPORT)
+
+# Smaller reads are dominated by latency, so do not measure throughput.
+_MIN_MEASURED_BYTES = 64 * 2**10
+
+
+@dataclass(frozen=True)
+class HttpOptions:
+    """Options of the HTTP sessions used to read data from the portal.
+
+    Attributes
+    ----------
+    max_connections : int
+        The maximum number of open connections of each session, which
+        also caps the number of concurrent requests.
+    keepalive_timeout : float
+        The number of seconds to keep idle connections open for reuse.
+    connect_timeout : float
+        The number of seconds to wait to connect to the server.
+    read_timeout : float
+        The number of seconds to wait between reads of a response.
+    retries : int
+        The number of times to retry a request that failed temporarily.
+    retry_backoff : float
+        The number of seconds to wait before the first retry, which is
+        doubled for each later retry.
+    transport : str
+        The preferred transport of data that is available over both
+        HTTPS and S3: one of "https", "s3" or "auto".
+    s3_max_connections : int
+        The maximum number of open connections to S3, which is usually
+        higher than for HTTPS because S3 scales better with parallelism.
+    s3_endpoint_url : str, optional
+        The S3 endpoint to use instead of AWS, e.g. a local S3-compatible
+        server with a copy of the portal's bucket.
+    """
+
+    max_connections: int = 32
+    keepalive_timeout: float = 30
+    connect_timeout: float = 10
+    read_timeout: float = 60
+    retries: int = 3
+    retry_backoff: float = 0.5
+    transport: str = HTTPS_TRANSPORT
+    s3_max_connections: int = 64
+    s3_endpoint_url: Optional[str] = None
+
+    def __post_init__(self) -> None:
+        if self.transport not in TRANSPORTS:
+            raise ValueError(
+                f"transport must be one of {TRANSPORTS}, not {self.transport!r}"
+            )
+
+
+_OPTIONS = HttpOptions()
+
+
+def http_options() -> HttpOptions:
+    """Returns the options of the HTTP sessions."""
+    return _OPTIONS
+
+
+def set_http_options(options: HttpOptions) -> None:
+    """Sets the options of the HTTP sessions that are created after this call."""
+    global _OPTIONS
+    logger.debug("set_http_options: %s", options)
+    _OPTIONS = options
+
+
+def storage_options(url: str) -> Dict[str, Any]:
+    """Returns the fsspec storage options that should be used to read a URL.
+
+    fsspec reuses a filesystem, and so its session, for the same options,
+    so all reads of HTTP URLs share a session with the same options.
+    """
+    protocol = fsspec.utils.get_protocol(url)
+    if protocol in ("http", "https"):
+        return {"get_client": partial(_get_client, _OPTIONS)}
+    if protocol in ("s3", "s3a"):
+        # The portal's bucket is public, so does not need credentials.
+        options: Dict[str, Any] = {
+            "anon": True,
+            "config_kwargs": {"max_pool_connections": _OPTIONS.s3_max_connections},
+        }
+        if _OPTIONS.s3_endpoint_url is not None:
+            options["client_kwargs"] = {"endpoint_url": _OPTIONS.s3_endpoint_url}
+        return options
+    return {}
+
+
+def portal_url(https_url: str, s3_url: Optional[str]) -> str:
+    """Returns the URL of some portal data for the preferred transport."""
+    transport = _OPTIONS.transport
+    if not s3_url or transport == HTTPS_TRANSPORT:
+        return https_url
+    if transport == S3_TRANSPORT:
+        return s3_url
+    return s3_url if _THROUGHPUT.preferred() == S3_TRANSPORT else https_url
+
+
+def record_throughput(url: str, nbytes: int, seconds: float) -> None:
+    """Records the time taken to read some bytes, to choose the fastest transport."""
+    if nbytes < _MIN_MEASURED_BYTES or seconds <= 0:
+        return
+    protocol = fsspec.utils.get_protocol(url)
+    transport = S3_TRANSPORT if protocol in ("s3", "s3a") else HTTPS_TRANSPORT
+    if protocol in ("http", "https", "s3", "s3a"):
+        _THROUGHPUT.record(transport, nbytes / seconds)
+
+
+class _Throughput:
+    """Tracks a moving average of the throughput of each transport."""
+
+    # The weight of the latest measurement.
+    _ALPHA = 0.2
+
+    def __init__(self) -> None:
+        self._bytes_per_second: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def record(self, transport: str, bytes_per_second: float) -> None:
+        with self._lock:
+            last = self._bytes_per_second.get(transport)
+            if last is None:
+                self._bytes_per_second[transport] = bytes_per_second
+            else:
+                self._bytes_per_second[transport] = (
+                    self._ALPHA * bytes_per_second + (1 - self._ALPHA) * last
+                )
+
+    def preferred(self) -> str:
+        with self._lock:
+            # Try each transport before comparing them.
+            for transport in (S3_TRANSPORT, HTTPS_TRANSPORT):
+                if transport not in self._bytes_per_second:
+                    return transport
+            return max(self._bytes_per_second, key=self._bytes_per_second.__getitem__)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._bytes_per_second.clear()
+
+
+_THROUGHPUT = _Throughput()
+
+
+async def _get_client(options: HttpOptions, **kwargs: Any) -> aiohttp.ClientSession:
+    connector = aiohttp.TCPConnector(
+        limit=options.max_connections,
+        keepalive_timeout=options.keepalive_timeout,
+    )
+    timeout = aiohttp.ClientTimeout(
+        sock_connect=options.connect_timeout,
+        sock_read=options.read_timeout,
+    )
+    return aiohttp.ClientSession(connector=connector, timeout=timeout, **kwargs)
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """Returns true if a failed request may succeed when retried."""
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status in _RETRY_STATUSES
+    return isinstance(error, _TRANSIENT_ERRORS)
+
+
+def retry(func: Callable[[], T]) -> T:
+    """Calls a function, retrying it with backoff after transient errors."""
+    options = _OPTIONS
+    for attempt in range(options.retries + 1):
+        try:
+            return func()
+        except _RETRIED_ERRORS as e:
+            if attempt == options.retries or not is_transient_error(e):
+                raise
+            logger.debug("Retrying after transient error: %s", e)
+            time.sleep(options.retry_backoff * 2**attempt)
+    raise AssertionError("Unreachable")
+
+
+async def retry_async(func: Callable[[], Awaitable[T]]) -> T:
+    """Awaits a function, retrying it with backoff after transient errors."""
+    options = _OPTIONS
+    for attempt in range(options.retries + 1):
+        try:
+            return await func()
+        except _RETRIED_ERRORS as e:
+            if attempt == options.retries or not is_transient_error(e):
+                raise
+            logger.debug("Retrying after transient error: %s", e)
+            await asyncio.sleep(options.retry_backoff * 2**attempt)
+    raise AssertionError("Unreachable")
@@ -0,0 +1,348 @@
+"""Lazy access to sparse zarr arrays that skips empty chunks."""
+
+import itertools
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Optional, Tuple
+
+import fsspec
+import numpy as np
+
+from napari_cryoet_data_portal._cache import JsonCache
+from napari_cryoet_data_portal._logging import logger
+from napari_cryoet_data_portal._session import storage_options
+
+# Filesystems that cannot list the keys of a store, so chunk occupancy
+# can only be found by reading chunks.
+_UNLISTABLE_PROTOCOLS = frozenset(("http", "https"))
+
+_OCCUPANCY_CACHE = JsonCache("occupancy")
+
+
+@dataclass(frozen=True)
+class ChunkOccupancy:
+    """The stored (i.e. possibly non-empty) chunks of an array."""
+
+    shape: Tuple[int, ...]
+    chunks: Tuple[int, ...]
+    occupied: FrozenSet[Tuple[int, ...]]
+
+    def bounding_box(self) -> Optional[Tuple[Tuple[int, int], ...]]:
+        """Returns the (start, stop) pixel extent of the occupied chunks."""
+        if len(self.occupied) == 0:
+            return None
+        lower = np.min(tuple(self.occupied), axis=0)
+        upper = np.max(tuple(self.occupied), axis=0) + 1
+        return tuple(
+            (int(lo * c), int(min(up * c, s)))
+            for lo, up, c, s in zip(lower, upper, self.chunks, self.shape)
+        )
+
+
+class SparseChunkArray:
+    """Wraps a zarr array so that reads of empty chunks are skipped.
+
+    Chunk occupancy is loaded on first access from an on-disk cache or
+    by listing the keys of the store. Reads of empty chunks then return
+    the fill value without making any requests. If the store cannot be
+    listed, reads are passed through to the zarr array until the occupancy
+    is found from data read with `read_occupied`.
+
+    This array may also be a cropped window of the zarr array, where
+    `origin` is the pixel offset of the window in the zarr array.
+    """
+
+    def __init__(
+        self,
+        array: Any,
+        url: str,
+        *,
+        origin: Optional[Tuple[int, ...]] = None,
+        shape: Optional[Tuple[int, ...]] = None,
+        occupancy: Optional[ChunkOccupancy] = None,
+    ) -> None:
+        self._array = array
+        self._url = url
+        self.origin: Tuple[int, ...] = (
+            (0,) * array.ndim if origin is None else tuple(origin)
+        )
+        self.shape: Tuple[int, ...] = (
+            tuple(array.shape) if shape is None else tuple(shape)
+        )
+        self.dtype = np.dtype(array.dtype)
+        self._fill_value = (
+            0 if array.fill_value is None else array.fill_value
+        )
+        self._occupancy = occupancy
+        self._occupancy_lock = threading.Lock()
+        self._occupancy_loaded = occupancy is not None
+
+    @property
+    def ndim(self) -> int:
+        return len(self.shape)
+
+    @property
+    def size(self) -> int:
+        return int(np.prod(self.shape))
+
+    @property
+    def chunks(self) -> Tuple[int, ...]:
+        return _chunk_grid(self._array)
+
+    def load_occupancy(self) -> Optional[ChunkOccupancy]:
+        """Loads the chunk occupancy of the underlying array, if possible."""
+        with self._occupancy_lock:
+            if not self._occupancy_loaded:
+                self._occupancy = load_chunk_occupancy(self._array, self._url)
+                self._occupancy_loaded = True
+            return self._occupancy
+
+    def crop_to_occupied(self) -> "SparseChunkArray":
+        """Returns a lazy window over the bounding box of the stored chunks.
+
+        If the occupancy is unknown or no chunks are stored, this returns
+        the array itself.
+        """
+        occupancy = self.load_occupancy()
+        if occupancy is None:
+            return self
+        box = occupancy.bounding_box()
+        if box is None:
+            return self
+        return SparseChunkArray(
+            self._array,
+            self._url,
+            origin=tuple(start for start, _ in box),
+            shape=tuple(stop - start for start, stop in box),
+            occupancy=occupancy,
+        )
+
+    def read_occupied(self) -> Tuple[np.ndarray, Tuple[int, ...]]:
+        """Reads the bounding box of the stored chunks into memory.
+
+        If the occupancy is unknown, this reads the whole array instead,
+        then finds and caches the occupancy from that data, so that later
+        reads only need the stored chunks.
+
+        Returns
+        -------
+        tuple of array and origin
+            The data in the bounding box and its pixel offset in the
+            underlying zarr array.
+        """
+        cropped = self.crop_to_occupied()
+        if self._occupancy is not None:
+            return np.asarray(cropped), cropped.origin
+        data = np.asarray(self)
+        if self.origin != (0,) * self.ndim or self.shape != tuple(self._array.shape):
+            return data, self.origin
+        occupied = _scan_occupied_chunks(data, self.chunks, self._fill_value)
+        occupancy = _store_chunk_occupancy(self._array, self._url, occupied)
+        with self._occupancy_lock:
+            self._occupancy = occupancy
+            self._occupancy_loaded = True
+        box = occupancy.bounding_box()
+        if box is None:
+            return data, self.origin
+        return (
+            data[tuple(slice(start, stop) for start, stop in box)],
+            tuple(start for start, _ in box),
+        )
+
+    def __getitem__(self, key: Any) -> np.ndarray:
+        bounds, steps, squeeze_axes = _normalize_key(key, self.shape)
+        box = tuple(
+            (o + start, o + stop)
+            for o, (start, stop) in zip(self.origin, bounds)
+        )
+        return np.squeeze(self._read(box)[steps], axis=squeeze_axes)
+
+    def _read(self, box: Tuple[Tuple[int, int], ...]) -> np.ndarray:
+        occupancy = self.load_occupancy()
+        if occupancy is None:
+            return np.asarray(
+                self._array[tuple(slice(*b) for b in box)]
+            )
+        out_shape = tuple(stop - start for start, stop in box)
+        out = np.full(out_shape, self._fill_value, dtype=self.dtype)
+        if out.size == 0:
+            return out
+        chunks = occupancy.chunks
+        ranges = (
+            range(start // c, (stop - 1) // c + 1)
+            for (start, stop), c in zip(box, chunks)
+        )
+        for index in itertools.product(*ranges):
+            if index not in occupancy.occupied:
+                continue
+            read_box = tuple(
+                (max(i * c, start), min((i + 1) * c, stop))
+                for i, c, (start, stop) in zip(index, chunks, box)
+            )
+            out_slices = tuple(
+                slice(lo - start, hi - start)
+                for (lo, hi), (start, _) in zip(read_box, box)
+            )
+            out[out_slices] = self._array[
+                tuple(slice(lo, hi) for lo, hi in read_box)
+            ]
+        return out
+
+    def __array__(self, dtype: Any = None, copy: Any = None) -> np.ndarray:
+        data = self[tuple(slice(None) for _ in self.shape)]
+        return data if dtype is None else data.astype(dtype)
+
+
+def load_chunk_occupancy(array: Any, url: str) -> Optional[ChunkOccupancy]:
+    """Loads the chunk occupancy of a zarr array stored at a URL.
+
+    This first checks the on-disk cache, then tries listing the keys of
+    the store. Returns None if the occupancy could not be found.
+    """
+    shape = tuple(int(s) for s in array.shape)
+    chunks = _chunk_grid(array)
+    cached = _OCCUPANCY_CACHE.get(_occupancy_cache_key(url, shape, chunks))
+    if cached is not None:
+        return _make_occupancy(shape, chunks, cached)
+    occupied = _list_occupied_chunks(url, len(shape))
+    if occupied is None:
+        return None
+    return _store_chunk_occupancy(array, url, occupied)
+
+
+def _store_chunk_occupancy(
+    array: Any, url: str, occupied: FrozenSet[Tuple[int, ...]]
+) -> ChunkOccupancy:
+    shape = tuple(int(s) for s in array.shape)
+    chunks = _chunk_grid(array)
+    _OCCUPANCY_CACHE.put(
+        _occupancy_cache_key(url, shape, chunks),
+        sorted(list(i) for i in occupied),
+    )
+    return _make_occupancy(shape, chunks, occupied)
+
+
+def _occupancy_cache_key(url: str, shape: Tuple[int, ...], chunks: Tuple[int, ...]) -> str:
+    return f"{url}|{shape}|{chunks}"
+
+
+def _make_occupancy(shape, chunks, occupied) -> ChunkOccupancy:
+    return ChunkOccupancy(
+        shape=shape,
+        chunks=chunks,
+        occupied=frozenset(tuple(i) for i in occupied),
+    )
+
+
+def _chunk_grid(array: Any) -> Tuple[int, ...]:
+    # Sharded arrays store one object per shard rather than per chunk.
+    shards = getattr(array, "shards", None)
+    return tuple(int(c) for c in (shards or array.chunks))
+
+
+def _list_occupied_chunks(url: str, ndim: int) -> Optional[FrozenSet[Tuple[int, ...]]]:
+    files = list_chunk_files(url, ndim)
+    return None if files is None else frozenset(files)
+
+
+def list_chunk_files(url: str, ndim: int) -> Optional[Dict[Tuple[int, ...], Dict[str, Any]]]:
+    """Lists the stored chunks of a zarr array at a URL with one request.
+
+    Returns the details of the file of each stored chunk (e.g. its size)
+    by the chunk's index, or None if the store cannot be listed.
+    """
+    try:
+        fs, root = fsspec.core.url_to_fs(url, **storage_options(url))
+    except (ImportError, ValueError) as e:
+        logger.debug("Failed to find filesystem for %s: %s", url, e)
+        return None
+    protocols = (fs.protocol,) if isinstance(fs.protocol, str) else fs.protocol
+    if any(p in _UNLISTABLE_PROTOCOLS for p in protocols):
+        return None
+    try:
+        details = fs.find(root, detail=True)
+    except OSError as e:
+        logger.debug("Failed to list chunks of %s: %s", url, e)
+        return None
+    root = root.rstrip("/") + "/"
+    files = {}
+    for path, info in details.items():
+        if not path.startswith(root):
+            continue
+        index = _parse_chunk_key(path[len(root):], ndim)
+        if index is not None:
+            files[index] = info
+    return files
+
+
+def _scan_occupied_chunks(
+    data: np.ndarray, chunks: Tuple[int, ...], fill_value: Any
+) -> FrozenSet[Tuple[int, ...]]:
+    grid = tuple(-(-s // c) for s, c in zip(data.shape, chunks))
+    occupied = set()
+    for index in np.ndindex(*grid):
+        block = data[
+            tuple(slice(i * c, (i + 1) * c) for i, c in zip(index, chunks))
+        ]
+        if np.any(block != fill_value):
+            occupied.add(tuple(int(i) for i in index))
+    return frozenset(occupied)
+
+
+_CHUNK_KEY_SEPARATOR = re.compile(r"[./]")
+
+
+def _parse_chunk_key(key: str, ndim: int) -> Optional[Tuple[int, ...]]:
+    # Zarr v3 prefixes chunk keys with "c" by default, while zarr v2 does not.
+    if key.startswith(("c/", "c.")):
+        key = key[2:]
+    parts = _CHUNK_KEY_SEPARATOR.split(key)
+    if len(parts) != ndim or not all(p.isdigit() for p in parts):
+        return None
+    return tuple(int(p) for p in parts)
+
+
+def _normalize_key(
+    key: Any, shape: Tuple[int, ...]
+) -> Tuple[Tuple[Tuple[int, int], ...], Tuple[slice, ...], Tuple[int, ...]]:
+    """Converts a key of integers and slices to (start, stop) pairs.
+
+    Also returns the slices that step through the data read in those
+    bounds and the axes indexed by integers, which should be squeezed.
+    Raises an IndexError for any other kind of key, rather than reading
+    the whole array.
+    """
+    if not isinstance(key, tuple):
+        key = (key,)
+    if any(k is Ellipsis for k in key):
+        i = key.index(Ellipsis)
+        key = key[:i] + (slice(None),) * (len(shape) - len(key) + 1) + key[i + 1:]
+    key = key + (slice(None),) * (len(shape) - len(key))
+    if len(key) != len(shape):
+        raise IndexError(f"Too many indices for array with {len(shape)} dimensions")
+    bounds = []
+    steps = []
+    squeeze_axes = []
+    for axis, (k, s) in enumerate(zip(key, shape)):
+        if isinstance(k, (int, np.integer)):
+            index = int(k) + s if k < 0 else int(k)
+            if not 0 <= index < s:
+                raise IndexError(f"Index {k} is out of bounds for axis {axis} with size {s}")
+            bounds.append((index, index + 1))
+            steps.append(slice(None))
+            squeeze_axes.append(axis)
+        elif isinstance(k, slice):
+            indices = range(*k.indices(s))
+            if len(indices) == 0:
+                bounds.append((0, 0))
+                steps.append(slice(None))
+                continue
+            lower = min(indices[0], indices[-1])
+            upper = max(indices[0], indices[-1]) + 1
+            bounds.append((lower, upper))
+            stop = indices[-1] - lower + (1 if indices.step > 0 else -1)
+            steps.append(slice(indices[0] - lower, stop if stop >= 0 else None, indices.step))
+        else:
+            raise IndexError(f"Only integers and slices are supported, not {k!r}")
+    return tuple(bounds), tuple(steps), tuple(squeeze_axes)
@@ -0,0 +1,147 @@
+"""A spatial index over the points of a tomogram's annotations."""
+
+from typing import Dict, Iterable, Mapping, Tuple
+
+import numpy as np
+from npe2.types import FullLayerData
+from numpy.typing import ArrayLike
+from scipy.spatial import cKDTree
+
+
+class PointsIndex:
+    """Finds the points of many annotations in physical coordinates.
+
+    The index is built once over all points, so that each query is a few
+    vectorized operations, rather than one pass over each annotation.
+    Points are in zyx order, like the tomograms and annotation layers.
+
+    Parameters
+    ----------
+    points : mapping of str to array-like
+        The (N, 3) points of each annotation in physical coordinates.
+
+    Examples
+    --------
+    >>> index = PointsIndex.from_layers(layers)
+    >>> index.in_box((100, 0, 0), (200, 500, 500))
+    {'ribosome': array([3, 17]), 'membrane': array([], dtype=int64)}
+    """
+
+    def __init__(self, points: Mapping[str, ArrayLike]) -> None:
+        self.names: Tuple[str, ...] = tuple(points)
+        arrays = [np.asarray(p, dtype=float).reshape(-1, 3) for p in points.values()]
+        self._points = np.concatenate(arrays + [np.empty((0, 3))])
+        # The annotation of each point and its index in that annotation.
+        self._labels = np.repeat(np.arange(len(arrays)), [len(a) for a in arrays])
+        self._indices = np.concatenate([np.arange(len(a)) for a in arrays] + [np.empty(0, dtype=int)])
+        # Points sorted along z, for slices and boxes that are thin along z.
+        self._z_order = np.argsort(self._points[:, 0], kind="stable")
+        self._sorted_z = self._points[self._z_order, 0]
+        self._tree = cKDTree(self._points)
+
+    @classmethod
+    def from_layers(cls, layers: Iterable[FullLayerData]) -> "PointsIndex":
+        """Builds an index over the points layers of a tomogram's annotations.
+
+        The physical coordinates of the points are found from the scale and
+        translation of each layer, e.g. after `_handle_points_at_scale`.
+        Other types of layers are ignored. Repeated names are made unique
+        with a numeric suffix, like napari does.
+        """
+        points: Dict[str, np.ndarray] = {}
+        for data, attrs, layer_type in layers:
+            if layer_type != "points":
+                continue
+            scale = np.asarray(attrs.get("scale", (1, 1, 1)), dtype=float)
+            translate = np.asarray(attrs.get("translate", (0, 0, 0)), dtype=float)
+            name = attrs["name"]
+            suffix = 1
+            while name in points:
+                name = f"{attrs['name']} [{suffix}]"
+                suffix += 1
+            points[name] = np.asarray(data, dtype=float).reshape(-1, 3) * scale + translate
+        return cls(points)
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def in_box(self, lower: ArrayLike, upper: ArrayLike) -> Dict[str, np.ndarray]:
+        """Returns the indices of each annotation's points in an inclusive box."""
+        lower = np.asarray(lower, dtype=float)
+        upper = np.asarray(upper, dtype=float)
+        start = np.searchsorted(self._sorted_z, lower[0], side="left")
+        stop = np.searchsorted(self._sorted_z, upper[0], side="right")
+        candidates = self._z_order[start:stop]
+        inside = np.all(
+            (self._points[candidates, 1:] >= lower[1:])
+            & (self._points[candidates, 1:] <= upper[1:]),
+            axis=1,
+        )
+        return self._split(np.sort(candidates[inside]))
+
+    def in_slab(self, center: float, thickness: float, *, axis: int = 0) -> Dict[str, np.ndarray]:
+        """Returns the indices of each annotation's points within half a
+        thickness of a plane perpendicular to an axis."""
+        lower = np.full(3, -np.inf)
+        upper = np.full(3, np.inf)
+        lower[axis] = center - thickness / 2
+        upper[axis] = center + thickness / 2
+        return self.in_box(lower, upper)
+
+    def within(self, center: ArrayLike, radius: float) -> Dict[str, np.ndarray]:
+        """Returns the indices of each annotation's points within a distance of a point."""
+        found = self._tree.query_ball_point(np.asarray(center, dtype=float), radius)
+        return self._split(np.sort(np.asarray(found, dtype=int)))
+
+    def nearest(self, points: ArrayLike, k: int = 1) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Finds the nearest indexed points to each of some points.
+
+        Parameters
+        ----------
+        points : array-like
+            The (M, 3) points to query in physical coordinates.
+        k : int
+            The number of nearest points to find for each.
+
+        Returns
+        -------
+        distances : numpy.ndarray
+            The (M, k) distances to the nearest points, which are infinite
+            when there are fewer than k indexed points.
+        annotations : numpy.ndarray
+            The (M, k) indices of the annotations of the nearest points
+            into `names`, or -1 where there is no point.
+        indices : numpy.ndarray
+            The (M, k) indices of the nearest points in their annotations,
+            or -1 where there is no point.
+        """
+        queries = np.asarray(points, dtype=float).reshape(-1, 3)
+        if len(self._points) == 0:
+            missing = np.full((len(queries), k), -1)
+            return np.full((len(queries), k), np.inf), missing, missing.copy()
+        distances, found = self._tree.query(queries, k=k)
+        distances = distances.reshape(len(queries), k)
+        found = found.reshape(len(queries), k)
+        # Missing neighbours have the number of points as their index.
+        missing = found >= len(self._points)
+        found = np.where(missing, 0, found)
+        annotations = np.where(missing, -1, self._labels[found])
+        indices = np.where(missing, -1, self._indices[found])
+        return distances, annotations, indices
+
+    def mask(self, found: Mapping[str, np.ndarray], name: str) -> np.ndarray:
+        """Returns a boolean mask over one annotation's points from a query result."""
+        label = self.names.index(name)
+        mask = np.zeros(np.count_nonzero(self._labels == label), dtype=bool)
+        mask[found[name]] = True
+        return mask
+
+    def _split(self, found: np.ndarray) -> Dict[str, np.ndarray]:
+        # The points are grouped by annotation, so sorted indices split
+        # into contiguous runs.
+        labels = self._labels[found]
+        bounds = np.searchsorted(labels, np.arange(len(self.names) + 1))
+        return {
+            name: self._indices[found[bounds[i]:bounds[i + 1]]]
+            for i, name in enumerate(self.names)
+        }
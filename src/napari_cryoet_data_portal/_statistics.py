@@ -0,0 +1,74 @@
+"""Intensity statistics of tomograms used to display them."""
+
+from dataclasses import dataclass
+from typing import Any, Dict, Tuple
+
+import numpy as np
+from cryoet_data_portal import Tomogram
+
+from napari_cryoet_data_portal._cache import JsonCache
+from napari_cryoet_data_portal._logging import logger
+
+# Percentiles of the intensities used as contrast limits, which ignores
+# a few extreme values that would otherwise wash out the display.
+CONTRAST_PERCENTILES = (0.5, 99.5)
+HISTOGRAM_BINS = 256
+
+_STATISTICS_CACHE = JsonCache("statistics")
+
+
+@dataclass(frozen=True)
+class ImageStatistics:
+    """Robust contrast limits and a histogram of an image's intensities."""
+
+    contrast_limits: Tuple[float, float]
+    counts: Tuple[int, ...]
+    bin_edges: Tuple[float, ...]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "contrast_limits": list(self.contrast_limits),
+            "counts": list(self.counts),
+            "bin_edges": list(self.bin_edges),
+        }
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "ImageStatistics":
+        return cls(
+            contrast_limits=tuple(d["contrast_limits"]),
+            counts=tuple(d["counts"]),
+            bin_edges=tuple(d["bin_edges"]),
+        )
+
+
+def compute_image_statistics(data: Any) -> ImageStatistics:
+    """Computes the statistics of an image by reading all of its data."""
+    values = np.asarray(data).ravel()
+    values = values[np.isfinite(values)]
+    if values.size == 0:
+        return ImageStatistics(contrast_limits=(0, 1), counts=(), bin_edges=())
+    low, high = np.percentile(values, CONTRAST_PERCENTILES)
+    if low == high:
+        high = low + 1
+    counts, bin_edges = np.histogram(values, bins=HISTOGRAM_BINS)
+    return ImageStatistics(
+        contrast_limits=(float(low), float(high)),
+        counts=tuple(int(c) for c in counts),
+        bin_edges=tuple(float(e) for e in bin_edges),
+    )
+
+
+def load_tomogram_statistics(tomogram: Tomogram, lowest_level: Any) -> ImageStatistics:
+    """Loads the statistics of a tomogram from its lowest resolution level.
+
+    The statistics are cached on disk by tomogram, so the lowest level
+    only needs to be read the first time.
+    """
+    key = f"{tomogram.id}|{tomogram.https_omezarr_dir}"
+    cached = _STATISTICS_CACHE.get(key)
+    if cached is not None:
+        return ImageStatistics.from_dict(cached)
+    logger.debug("Computing statistics of tomogram %s", tomogram.name)
+    statistics = compute_image_statistics(lowest_level)
+    _STATISTICS_CACHE.put(key, statistics.to_dict())
+    return statistics
@@ -0,0 +1,426 @@
+"""Cached access to the files and zarr stores of the portal."""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+import json
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Coroutine,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
+
+import fsspec
+from fsspec.asyn import AsyncFileSystem
+from zarr.abc.store import ByteRequest, RangeByteRequest, Store, SuffixByteRequest
+from zarr.core.buffer import Buffer, BufferPrototype, default_buffer_prototype
+from zarr.core.sync import _get_loop, sync
+from zarr.storage import FsspecStore, LocalStore, WrapperStore
+
+from napari_cryoet_data_portal._cache import JsonCache, MemoryCache
+from napari_cryoet_data_portal._logging import logger
+from napari_cryoet_data_portal._session import (
+    record_throughput,
+    retry,
+    retry_async,
+    storage_options,
+)
+
+T = TypeVar("T")
+
+# Maximum size of the whole files and zarr store values kept in memory.
+DEFAULT_CACHE_BYTES = 1024 * 2**20
+# Minimum number of bytes read by a byte range request (e.g. for a chunk in
+# a shard), so that the following chunks are usually read by one request.
+DEFAULT_READ_AHEAD_BYTES = 4 * 2**20
+# Maximum age in seconds of the metadata in the persistent cache, after
+# which it is fetched again in case the image was updated.
+METADATA_MAX_AGE_SECONDS = 24 * 60 * 60
+
+# Shared by all stores and files, so that data fetched by one reader
+# (e.g. a prefetch) can be reused by another.
+_CACHE = MemoryCache(DEFAULT_CACHE_BYTES)
+
+
+class _InFlightRequests:
+    """Tracks requests that are being fetched, so that concurrent
+    requests for the same key from any thread can share one result.
+    """
+
+    def __init__(self) -> None:
+        self._futures: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def claim(self, key: str) -> Tuple[Future, bool]:
+        """Returns the future of the request and true if the caller should fetch it."""
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None:
+                return future, False
+            future = Future()
+            self._futures[key] = future
+            return future, True
+
+    def release(self, key: str, future: Future) -> None:
+        with self._lock:
+            if self._futures.get(key) is future:
+                del self._futures[key]
+
+
+_IN_FLIGHT = _InFlightRequests()
+
+# Result of a request whose fetch was cancelled, so it should be retried.
+_RETRY: Any = object()
+
+# Cached in place of a value that is known to not exist.
+_MISSING: Any = object()
+
+# Stores the metadata documents of OME-Zarr images by URL.
+_METADATA_CACHE = JsonCache("metadata")
+
+# Metadata documents of a zarr group or array in either zarr format.
+_NODE_METADATA_KEYS = (".zgroup", ".zattrs", ".zarray", "zarr.json")
+
+
+class CachedStore(WrapperStore[Store]):
+    """A read-only zarr store that keeps whole values in a shared memory cache.
+
+    Concurrent requests for the same value, from this or any other store
+    at the same URL, share a single fetch.
+
+    Attributes
+    ----------
+    bytes_fetched : int
+        The number of bytes this store fetched because they were not cached.
+    fetch_count : int
+        The number of requests this store made because values were not cached.
+    read_ahead_bytes : int
+        The size of the aligned windows that byte range requests read. Each
+        window is kept whole and concurrent requests for it share one fetch,
+        so that the requests for nearby ranges (e.g. for the chunks in a
+        shard) read each window once. Zero disables this.
+    """
+
+    def __init__(
+        self,
+        store: Store,
+        url: str,
+        *,
+        read_ahead_bytes: int = DEFAULT_READ_AHEAD_BYTES,
+    ) -> None:
+        super().__init__(store)
+        self._url = url.rstrip("/")
+        self.bytes_fetched = 0
+        self.fetch_count = 0
+        self.read_ahead_bytes = read_ahead_bytes
+
+    def _with_store(self, store: Store) -> "CachedStore":
+        return type(self)(
+            store,
+            self._url,
+            read_ahead_bytes=self.read_ahead_bytes,
+        )
+
+    def __str__(self) -> str:
+        return f"cached-{self._store}"
+
+    async def get(
+        self,
+        key: str,
+        prototype: BufferPrototype,
+        byte_range: Optional[ByteRequest] = None,
+    ) -> Optional[Buffer]:
+        if byte_range is not None:
+            return await self._get_range(key, prototype, byte_range)
+        return await self._get_cached(
+            f"{self._url}/{key}", lambda: self._store.get(key, prototype)
+        )
+
+    async def _get_cached(
+        self,
+        cache_key: str,
+        fetch: Callable[[], Awaitable[Optional[Buffer]]],
+    ) -> Optional[Buffer]:
+        while True:
+            value = _CACHE.get(cache_key)
+            if value is _MISSING:
+                return None
+            if value is not None:
+                return value
+            future, owner = _IN_FLIGHT.claim(cache_key)
+            if owner:
+                break
+            # Shield the shared fetch, so that cancelling one request does
+            # not cancel the others.
+            value = await asyncio.shield(asyncio.wrap_future(future))
+            if value is not _RETRY:
+                return value
+        try:
+            start = time.perf_counter()
+            self.fetch_count += 1
+            value = await retry_async(fetch)
+        except asyncio.CancelledError:
+            future.set_result(_RETRY)
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            if value is not None:
+                record_throughput(cache_key, len(value), time.perf_counter() - start)
+                self.bytes_fetched += len(value)
+                _CACHE.put(cache_key, value, len(value))
+            future.set_result(value)
+        finally:
+            _IN_FLIGHT.release(cache_key, future)
+        return value
+
+    async def _get_range(
+        self,
+        key: str,
+        prototype: BufferPrototype,
+        byte_range: ByteRequest,
+    ) -> Optional[Buffer]:
+        # Shard indices are read for every partial read of a shard, so
+        # are cached like whole values.
+        if isinstance(byte_range, SuffixByteRequest):
+            return await self._get_cached(
+                f"{self._url}/{key}#suffix={byte_range.suffix}",
+                lambda: self._store.get(key, prototype, byte_range),
+            )
+        if not isinstance(byte_range, RangeByteRequest) or self.read_ahead_bytes <= 0:
+            self.fetch_count += 1
+            value = await retry_async(
+                lambda: self._store.get(key, prototype, byte_range)
+            )
+            if value is not None:
+                self.bytes_fetched += len(value)
+            return value
+        start, end = byte_range.start, byte_range.end
+        size = self.read_ahead_bytes
+        indices = range(start // size, max(start, end - 1) // size + 1)
+        windows = await asyncio.gather(
+            *(self._get_window(key, prototype, i) for i in indices)
+        )
+        if any(w is None for w in windows):
+            return None
+        offset = indices[0] * size
+        value = windows[0] if len(windows) == 1 else sum(windows[1:], windows[0])
+        return value[start - offset:end - offset]
+
+    async def _get_window(
+        self, key: str, prototype: BufferPrototype, index: int
+    ) -> Optional[Buffer]:
+        # Windows are aligned, so that concurrent requests for nearby
+        # ranges share the fetch of the same window rather than each
+        # reading its own overlapping window.
+        size = self.read_ahead_bytes
+        byte_range = RangeByteRequest(index * size, (index + 1) * size)
+        return await self._get_cached(
+            f"{self._url}/{key}#window={size}:{index}",
+            lambda: self._store.get(key, prototype, byte_range),
+        )
+
+    async def _get_metadata(
+        self, keys: Sequence[str]
+    ) -> Dict[str, Optional[str]]:
+        prototype = default_buffer_prototype()
+        values = await asyncio.gather(*(self.get(k, prototype) for k in keys))
+        metadata = {}
+        for key, value in zip(keys, values):
+            if value is None:
+                _CACHE.put(f"{self._url}/{key}", _MISSING, 0)
+                metadata[key] = None
+            else:
+                metadata[key] = value.to_bytes().decode()
+        return metadata
+
+
+def preload_metadata(store: CachedStore) -> Dict[str, Optional[str]]:
+    """Loads all the metadata of an OME-Zarr image into the memory cache.
+
+    Readers of OME-Zarr images request each metadata document one at a
+    time, which is slow over high-latency connections. This instead reads
+    the documents from a persistent cache if they were cached less than
+    `METADATA_MAX_AGE_SECONDS` ago, otherwise from consolidated metadata
+    if present, otherwise concurrently, so that later requests for the
+    metadata are served from memory.
+
+    Returns the text of each metadata document by key, or None for keys
+    that do not exist.
+    """
+    return sync(_preload_metadata(store))
+
+
+async def preload_metadata_async(store: CachedStore) -> Dict[str, Optional[str]]:
+    """Like `preload_metadata`, but without blocking the event loop."""
+    return await run_on_loop(_preload_metadata(store), _get_loop())
+
+
+async def _preload_metadata(store: CachedStore) -> Dict[str, Optional[str]]:
+    url = store._url
+    entry = _METADATA_CACHE.get(url)
+    if (
+        isinstance(entry, dict)
+        and "time" in entry
+        and time.time() - entry["time"] <= METADATA_MAX_AGE_SECONDS
+    ):
+        logger.debug("preload_metadata: found %s in cache", url)
+        metadata = entry["metadata"]
+    else:
+        metadata = await _fetch_metadata(store)
+        _METADATA_CACHE.put(url, {"time": time.time(), "metadata": metadata})
+    prototype = default_buffer_prototype()
+    for key, text in metadata.items():
+        if text is None:
+            _CACHE.put(f"{url}/{key}", _MISSING, 0)
+        else:
+            value = prototype.buffer.from_bytes(text.encode())
+            _CACHE.put(f"{url}/{key}", value, len(value))
+    return metadata
+
+
+async def _fetch_metadata(store: CachedStore) -> Dict[str, Optional[str]]:
+    metadata = await store._get_metadata(_NODE_METADATA_KEYS + (".zmetadata",))
+    consolidated = metadata[".zmetadata"]
+    if consolidated is not None:
+        documents = json.loads(consolidated)["metadata"]
+        metadata.update({k: json.dumps(v) for k, v in documents.items()})
+        return metadata
+    # Also check for a labels group, which readers of OME-Zarr look for.
+    paths = _multiscale_paths_from_metadata(metadata) + ["labels"]
+    keys = [f"{p}/{k}" for p in paths for k in _NODE_METADATA_KEYS]
+    metadata.update(await store._get_metadata(keys))
+    return metadata
+
+
+def _multiscale_paths_from_metadata(metadata: Dict[str, Optional[str]]) -> List[str]:
+    attrs: Dict[str, Any] = {}
+    if metadata.get(".zattrs") is not None:
+        attrs = json.loads(metadata[".zattrs"])
+    elif metadata.get("zarr.json") is not None:
+        attrs = json.loads(metadata["zarr.json"]).get("attributes", {})
+    # OME-Zarr v0.5 nests the metadata under an "ome" key.
+    multiscales = attrs.get("ome", attrs).get("multiscales", [])
+    if len(multiscales) == 0:
+        return []
+    return [d["path"] for d in multiscales[0]["datasets"]]
+
+
+def open_store(
+    url: str,
+    *,
+    read_ahead_bytes: int = DEFAULT_READ_AHEAD_BYTES,
+) -> CachedStore:
+    """Opens a read-only, cached zarr store at a local path or URL.
+
+    See `CachedStore` for a description of the keyword arguments.
+    """
+    if fsspec.utils.get_protocol(url) == "file":
+        _, path = fsspec.core.url_to_fs(url)
+        store = LocalStore(path, read_only=True)
+    else:
+        store = FsspecStore.from_url(
+            url, storage_options=storage_options(url), read_only=True
+        )
+    return CachedStore(store, url, read_ahead_bytes=read_ahead_bytes)
+
+
+def is_cached(url: str) -> bool:
+    """Returns true if the contents of the file at a URL are cached."""
+    return url in _CACHE
+
+
+def read_bytes(url: str) -> bytes:
+    """Reads and caches the whole contents of a file at a local path or URL.
+
+    Concurrent reads of the same file share a single fetch.
+    """
+    while True:
+        value = _CACHE.get(url)
+        if value is not None:
+            return value
+        future, owner = _IN_FLIGHT.claim(url)
+        if owner:
+            break
+        value = future.result()
+        if value is not _RETRY:
+            return value
+    try:
+        start = time.perf_counter()
+        value = retry(lambda: _read_file(url))
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    else:
+        record_throughput(url, len(value), time.perf_counter() - start)
+        _CACHE.put(url, value, len(value))
+        future.set_result(value)
+    finally:
+        _IN_FLIGHT.release(url, future)
+    return value
+
+
+async def read_bytes_async(url: str) -> bytes:
+    """Reads and caches the whole contents of a file without blocking the event loop.
+
+    This can be awaited from any event loop. Concurrent reads of the same
+    file from any thread or event loop share a single fetch.
+    """
+    while True:
+        value = _CACHE.get(url)
+        if value is not None:
+            return value
+        future, owner = _IN_FLIGHT.claim(url)
+        if owner:
+            break
+        # Shield the shared fetch, so that cancelling one reader does not
+        # cancel the others.
+        value = await asyncio.shield(asyncio.wrap_future(future))
+        if value is not _RETRY:
+            return value
+    try:
+        start = time.perf_counter()
+        value = await _read_file_async(url)
+    except asyncio.CancelledError:
+        future.set_result(_RETRY)
+        raise
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    else:
+        record_throughput(url, len(value), time.perf_counter() - start)
+        _CACHE.put(url, value, len(value))
+        future.set_result(value)
+    finally:
+        _IN_FLIGHT.release(url, future)
+    return value
+
+
+def _read_file(url: str) -> bytes:
+    with fsspec.open(url, **storage_options(url)) as f:
+        return f.read()
+
+
+async def _read_file_async(url: str) -> bytes:
+    fs, path = fsspec.core.url_to_fs(url, **storage_options(url))
+    if isinstance(fs, AsyncFileSystem):
+        # Run on the filesystem's own event loop, which owns its session,
+        # so that reads from all event loops share its connections.
+        coroutine = retry_async(lambda: fs._cat_file(path))
+        return await run_on_loop(coroutine, fs.loop)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, retry, lambda: _read_file(url))
+
+
+def run_on_loop(coroutine: Coroutine[Any, Any, T], loop: asyncio.AbstractEventLoop) -> "asyncio.Future[T]":
+    """Runs a coroutine on another event loop and returns a future of the running loop."""
+    return asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coroutine, loop))
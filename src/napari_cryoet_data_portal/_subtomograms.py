@@ -0,0 +1,197 @@
+"""Extraction of small cubes of a tomogram around many points."""
+
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import zarr
+from numpy.typing import ArrayLike
+
+from napari_cryoet_data_portal._logging import logger
+from napari_cryoet_data_portal._reader import _multiscale_paths
+from napari_cryoet_data_portal._store import open_store
+
+# Maximum number of bytes of chunks held in memory at once by default.
+DEFAULT_MAX_BYTES = 512 * 2**20
+# Maximum number of chunks read concurrently by default.
+DEFAULT_MAX_WORKERS = 8
+
+Chunk = Tuple[int, ...]
+
+
+def extract_subtomograms(
+    path: str,
+    points: ArrayLike,
+    size: Union[int, Sequence[int]],
+    *,
+    level: int = 0,
+    output_path: Optional[str] = None,
+    fill_value: Any = 0,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+) -> Union[np.ndarray, zarr.Array]:
+    """Extracts a cube of a tomogram around each of many points.
+
+    Instead of reading each cube separately, which reads the chunks that
+    overlapping cubes share many times, the points are grouped by the chunks
+    their cubes touch. Each needed chunk is then read once, concurrently with
+    others, and copied into all of the cubes that touch it. Points are visited
+    in order of their location, and at most `max_bytes` of chunks are held
+    in memory at once.
+
+    Parameters
+    ----------
+    path : str
+        The path or URL of the tomogram's OME-Zarr image, e.g. its
+        `https_omezarr_dir`.
+    points : array-like
+        The (N, 3) centers of the cubes in zyx order, in voxels of the full
+        resolution level, like the data of annotation points layers.
+    size : int or sequence of int
+        The shape of each cube in voxels of the chosen level.
+    level : int
+        The index of the multiscale level to extract from.
+    output_path : str, optional
+        If given, the cubes are written to a Zarr array at this local path
+        as they are extracted, instead of being kept in memory.
+    fill_value : scalar
+        The value of the parts of the cubes that are outside the tomogram.
+    max_bytes : int
+        The maximum number of bytes of chunks held in memory at once.
+        A single cube that needs more is still extracted.
+    max_workers : int
+        The maximum number of chunks read concurrently.
+
+    Returns
+    -------
+    numpy.ndarray or zarr.Array
+        The (N, D, H, W) cubes in the order of the points.
+
+    Examples
+    --------
+    >>> data, attrs, _ = read_annotation(annotation)
+    >>> cubes = extract_subtomograms(tomogram.https_omezarr_dir, data, 32, level=1)
+    """
+    group = zarr.open_group(open_store(path), mode="r")
+    paths = _multiscale_paths(group)
+    array = group[paths[level]]
+    full_shape = group[paths[0]].shape
+    shape = tuple(array.shape)
+    chunks = tuple(array.chunks)
+    cube_shape = _cube_shape(size, len(shape))
+    factors = np.asarray(full_shape, dtype=float) / np.asarray(shape, dtype=float)
+    centers = np.asarray(points, dtype=float).reshape(-1, len(shape)) / factors
+    starts = np.floor(centers + 0.5).astype(np.int64) - np.asarray(cube_shape) // 2
+    logger.debug("extract_subtomograms: %s, %s, %s, %s", path, level, len(starts), chunks)
+
+    if output_path is None:
+        output: Union[np.ndarray, zarr.Array] = np.full(
+            (len(starts),) + cube_shape, fill_value, dtype=array.dtype
+        )
+    else:
+        output = zarr.open_array(
+            output_path,
+            mode="w",
+            shape=(len(starts),) + cube_shape,
+            chunks=(1,) + cube_shape,
+            dtype=array.dtype,
+            fill_value=fill_value,
+        )
+
+    chunk_bytes = int(np.prod(chunks)) * array.dtype.itemsize
+    max_chunks = max(1, max_bytes // chunk_bytes)
+    cached: Dict[Chunk, np.ndarray] = {}
+    with ThreadPoolExecutor(max_workers) as executor:
+        for batch, needed in _batches(starts, cube_shape, shape, chunks, max_chunks):
+            # Keep the chunks that the previous batch shares with this one.
+            cached = {c: cached[c] for c in needed if c in cached}
+            missing = [c for c in needed if c not in cached]
+            logger.debug("extract_subtomograms: %s points, reading %s chunks", len(batch), len(missing))
+            for chunk, data in zip(missing, executor.map(lambda c: _read_chunk(array, c), missing)):
+                cached[chunk] = data
+            for i in batch:
+                output[i] = _assemble(starts[i], cube_shape, shape, chunks, cached, output.dtype, fill_value)
+    return output
+
+
+def _cube_shape(size: Union[int, Sequence[int]], ndim: int) -> Tuple[int, ...]:
+    if isinstance(size, int):
+        return (size,) * ndim
+    if len(size) != ndim:
+        raise ValueError(f"Size must have {ndim} values: {size}")
+    return tuple(int(s) for s in size)
+
+
+def _batches(
+    starts: np.ndarray,
+    cube_shape: Tuple[int, ...],
+    shape: Tuple[int, ...],
+    chunks: Tuple[int, ...],
+    max_chunks: int,
+) -> Iterator[Tuple[List[int], List[Chunk]]]:
+    """Yields the indices of points and the chunks they need, so that nearby
+    points are in the same batch and each batch needs at most some chunks."""
+    # Visit points in order of the chunk of their first voxel, so that
+    # consecutive points share chunks.
+    order = np.lexsort(tuple((starts // chunks)[:, ::-1].T))
+    batch: List[int] = []
+    needed: Dict[Chunk, None] = {}
+    for i in order:
+        touched = _touched_chunks(starts[i], cube_shape, shape, chunks)
+        new = [c for c in touched if c not in needed]
+        if len(batch) > 0 and len(needed) + len(new) > max_chunks:
+            yield batch, list(needed)
+            batch, needed = [], {}
+            new = touched
+        batch.append(int(i))
+        needed.update(dict.fromkeys(new))
+    if len(batch) > 0:
+        yield batch, list(needed)
+
+
+def _touched_chunks(
+    start: np.ndarray,
+    cube_shape: Tuple[int, ...],
+    shape: Tuple[int, ...],
+    chunks: Tuple[int, ...],
+) -> List[Chunk]:
+    ranges = []
+    for o, n, s, c in zip(start, cube_shape, shape, chunks):
+        lo, hi = max(int(o), 0), min(int(o) + n, s)
+        if lo >= hi:
+            # The cube is entirely outside the tomogram.
+            return []
+        ranges.append(range(lo // c, (hi - 1) // c + 1))
+    return list(itertools.product(*ranges))
+
+
+def _read_chunk(array: Any, chunk: Chunk) -> np.ndarray:
+    region = tuple(
+        slice(i * c, min((i + 1) * c, s))
+        for i, c, s in zip(chunk, array.chunks, array.shape)
+    )
+    return np.asarray(array[region])
+
+
+def _assemble(
+    start: np.ndarray,
+    cube_shape: Tuple[int, ...],
+    shape: Tuple[int, ...],
+    chunks: Tuple[int, ...],
+    cached: Dict[Chunk, np.ndarray],
+    dtype: Any,
+    fill_value: Any,
+) -> np.ndarray:
+    cube = np.full(cube_shape, fill_value, dtype=dtype)
+    for chunk in _touched_chunks(start, cube_shape, shape, chunks):
+        data = cached[chunk]
+        source = []
+        target = []
+        for i, o, n, c, d in zip(chunk, start, cube_shape, chunks, data.shape):
+            lo = max(int(o), i * c)
+            hi = min(int(o) + n, i * c + d)
+            source.append(slice(lo - i * c, hi - i * c))
+            target.append(slice(lo - int(o), hi - int(o)))
+        cube[tuple(target)] = data[tuple(source)]
+    return cube
@@ -1,5 +1,9 @@
-from typing import Iterable, Tuple
+import json
+import os
+from typing import Iterable, Sequence, Tuple
 
+import numpy as np
+import zarr
 from qtpy.QtWidgets import QTreeWidget, QTreeWidgetItem
 
 
@@ -13,3 +17,80 @@ def tree_item_children(item: QTreeWidgetItem) -> Tuple[QTreeWidgetItem, ...]:
 
 def tree_items_names(items: Iterable[QTreeWidgetItem]) -> Tuple[str, ...]:
     return tuple(item.text(0) for item in items)
+
+
+def write_ome_zarr(path: str, levels: Sequence[np.ndarray], *, scale: float = 1, chunks: Tuple[int, ...] = (4, 4, 4)) -> str:
+    """Writes a minimal 3D OME-Zarr multiscale image with 2x downsampling."""
+    group = zarr.open_group(path, mode="w", zarr_format=2)
+    for i, data in enumerate(levels):
+        array = group.create_array(
+            str(i), shape=data.shape, chunks=chunks, dtype=data.dtype, fill_value=0
+        )
+        array[:] = data
+    group.attrs["multiscales"] = [
+        {
+            "version": "0.4",
+            "axes": [{"name": n, "type": "space", "unit": "angstrom"} for n in "zyx"],
+            "datasets": [
+                {
+                    "path": str(i),
+                    "coordinateTransformations": [
+                        {"type": "scale", "scale": [scale * 2**i] * 3}
+                    ],
+                }
+                for i in range(len(levels))
+            ],
+        }
+    ]
+    return path
+
+
+def write_mirror(root: str) -> str:
+    """Writes a minimal mirror with one tomogram of three levels and one points annotation."""
+    spacing_dir = "10000/TS_026/Reconstructions/VoxelSpacing13.480"
+    tomogram_dir = f"{spacing_dir}/Tomograms/100/TS_026.zarr"
+    points_path = f"{spacing_dir}/Annotations/101/ribosome.ndjson"
+    data = np.arange(8 * 8 * 8, dtype=np.uint8).reshape((8, 8, 8))
+    write_ome_zarr(os.path.join(root, tomogram_dir), [data, data[::2, ::2, ::2], data[::4, ::4, ::4]], scale=13.48)
+    os.makedirs(os.path.dirname(os.path.join(root, points_path)))
+    with open(os.path.join(root, points_path), "w") as f:
+        for z in range(3):
+            f.write(json.dumps({"type": "point", "location": {"x": 1, "y": 2, "z": z}}) + "\n")
+    tables = {
+        "datasets": [{"id": 10000, "title": "Test dataset", "release_date": "2023-01-02"}],
+        "runs": [{"id": 1, "name": "TS_026", "dataset_id": 10000}],
+        "tomogram_voxel_spacings": [{"id": 2, "run_id": 1, "voxel_spacing": 13.48}],
+        "tomograms": [
+            {
+                "id": 3,
+                "name": "TS_026",
+                "tomogram_voxel_spacing_id": 2,
+                "https_omezarr_dir": tomogram_dir,
+                "size_x": 8,
+                "size_y": 8,
+                "size_z": 8,
+                "voxel_spacing": 13.48,
+            }
+        ],
+        "annotations": [
+            {
+                "id": 4,
+                "object_id": "GO:0005840",
+                "object_name": "ribosome",
+                "object_count": 3,
+                "tomogram_voxel_spacing_id": 2,
+            }
+        ],
+        "annotation_files": [
+            {
+                "id": 5,
+                "annotation_id": 4,
+                "format": "ndjson",
+                "shape_type": "Point",
+                "https_path": points_path,
+            }
+        ],
+    }
+    with open(os.path.join(root, "catalog.json"), "w") as f:
+        json.dump({"version": 1, "tables": tables}, f)
+    return root
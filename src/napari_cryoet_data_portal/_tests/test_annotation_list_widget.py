@@ -0,0 +1,55 @@
+from pytestqt.qtbot import QtBot
+from qtpy.QtCore import Qt
+
+from napari_cryoet_data_portal._annotation_list_widget import (
+    AnnotationChoice,
+    AnnotationListWidget,
+)
+
+
+def test_add_choices_checks_new_and_skips_listed(qtbot: QtBot):
+    widget = AnnotationListWidget()
+    qtbot.add_widget(widget)
+    ribosome = AnnotationChoice("ribosome", "Point", "ndjson", count=12)
+    membrane = AnnotationChoice("membrane", "SegmentationMask", "zarr", count=1)
+
+    widget.addChoices([ribosome, membrane])
+    widget.addChoices([ribosome])
+
+    assert widget.count() == 2
+    assert widget.item(0).text() == "ribosome (Point, ndjson, 12 points)"
+    assert widget.item(1).text() == "membrane (SegmentationMask, zarr)"
+    assert widget.item(0).checkState() == Qt.CheckState.Checked
+    assert widget.selection().includes(ribosome.key)
+
+
+def test_segmentation_masks_are_unchecked_until_checked(qtbot: QtBot):
+    widget = AnnotationListWidget()
+    qtbot.add_widget(widget)
+    membrane = AnnotationChoice("membrane", "SegmentationMask", "zarr")
+    widget.addChoices([membrane])
+
+    assert widget.item(0).checkState() == Qt.CheckState.Unchecked
+    assert not widget.selection().includes(membrane.key)
+
+    widget.item(0).setCheckState(Qt.CheckState.Checked)
+    widget.clear()
+    widget.addChoices([membrane])
+
+    assert widget.item(0).checkState() == Qt.CheckState.Checked
+    assert widget.selection().includes(membrane.key)
+
+
+def test_unchecked_choices_stay_excluded(qtbot: QtBot):
+    widget = AnnotationListWidget()
+    qtbot.add_widget(widget)
+    ribosome = AnnotationChoice("ribosome", "Point", "ndjson")
+    widget.addChoices([ribosome])
+
+    widget.item(0).setCheckState(Qt.CheckState.Unchecked)
+    widget.clear()
+    widget.addChoices([ribosome])
+
+    assert widget.selection().unchecked == {ribosome.key}
+    assert not widget.selection().includes(ribosome.key)
+    assert widget.item(0).checkState() == Qt.CheckState.Unchecked
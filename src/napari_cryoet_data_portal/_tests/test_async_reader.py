@@ -0,0 +1,155 @@
+import asyncio
+from pathlib import Path
+
+import numpy as np
+import pytest
+from cryoet_data_portal import Annotation, AnnotationFile, Client, Tomogram
+from gql import Client as GQLClient
+from gql.transport.async_transport import AsyncTransport
+from graphql import ExecutionResult
+
+from napari_cryoet_data_portal import _async_reader, _store
+from napari_cryoet_data_portal._async_reader import (
+    _build_request,
+    find_async,
+    read_annotation_files_async,
+    read_annotations_async,
+    read_points_annotations_ndjson_async,
+    read_tomogram_async,
+)
+from napari_cryoet_data_portal._cache import CACHE_DIR_ENV
+from napari_cryoet_data_portal._mirror import MirrorClient
+from napari_cryoet_data_portal._reader import read_annotation_files, read_tomogram
+from napari_cryoet_data_portal._tests._utils import write_mirror
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    path = tmp_path / "cache"
+    monkeypatch.setenv(CACHE_DIR_ENV, str(path))
+    return path
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    _store._CACHE.clear()
+    yield
+    _store._CACHE.clear()
+
+
+@pytest.fixture()
+def client(tmp_path: Path) -> MirrorClient:
+    return MirrorClient(write_mirror(str(tmp_path / "mirror")))
+
+
+def test_read_tomogram_async_matches_read_tomogram(client: MirrorClient):
+    async def read():
+        tomograms = await find_async(Tomogram, client, [Tomogram.name == "TS_026"])
+        return await read_tomogram_async(tomograms[0])
+
+    data, attributes, layer_type = asyncio.run(read())
+
+    expected_data, expected_attributes, _ = read_tomogram(Tomogram.find(client)[0])
+    assert layer_type == "image"
+    assert attributes["name"] == expected_attributes["name"]
+    np.testing.assert_array_equal(np.asarray(data[0]), np.asarray(expected_data[0]))
+
+
+class _FakeTransport(AsyncTransport):
+    def __init__(self, data) -> None:
+        self.data = data
+        self.requests = []
+
+    async def connect(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    async def execute(self, request, *args, **kwargs) -> ExecutionResult:
+        self.requests.append(request)
+        return ExecutionResult(data=self.data)
+
+    def subscribe(self, *args, **kwargs):
+        raise NotImplementedError()
+
+
+def test_find_async_with_portal_client(monkeypatch: pytest.MonkeyPatch):
+    # find_async relies on parts of the portal's client that are not public,
+    # so this fails when a new version of it changes them.
+    transport = _FakeTransport({"tomograms": [{"id": 3, "name": "TS_026"}]})
+    urls = []
+
+    async def connect(url, schema):
+        urls.append(url)
+        client = GQLClient(transport=transport, schema=schema)
+        return await client.connect_async(reconnecting=False)
+
+    monkeypatch.setattr(_async_reader, "_connect", connect)
+    monkeypatch.setattr(_async_reader, "_SESSIONS", {})
+    client = Client("https://example.com/graphql")
+
+    tomograms = asyncio.run(find_async(Tomogram, client, [Tomogram.name == "TS_026"]))
+
+    assert [(t.id, t.name) for t in tomograms] == [(3, "TS_026")]
+    assert urls == ["https://example.com/graphql"]
+    assert len(transport.requests) == 1
+    assert "TS_026" in str(transport.requests[0])
+
+
+def test_build_request_fails_clearly_for_other_clients():
+    with pytest.raises(RuntimeError, match="cryoet_data_portal"):
+        _build_request(object(), Tomogram, {})
+
+
+def test_read_annotations_async_matches_read_annotation_files(client: MirrorClient):
+    annotations = Annotation.find(client)
+
+    async def read():
+        return [layer async for layer in read_annotations_async(annotations)]
+
+    layers = asyncio.run(read())
+
+    expected = list(read_annotation_files(annotations[0]))
+    assert len(layers) == len(expected) == 1
+    assert layers[0][1]["name"] == expected[0][1]["name"]
+    np.testing.assert_array_equal(layers[0][0], expected[0][0])
+
+
+def test_read_annotation_files_async_skips_unsupported_files(client: MirrorClient):
+    annotation = Annotation.find(client)[0]
+    unsupported = AnnotationFile(
+        client, id=6, annotation_id=annotation.id, format="mrc", shape_type="SegmentationMask"
+    )
+
+    async def read():
+        return [
+            layer
+            async for layer in read_annotation_files_async(
+                annotation, files=[unsupported, *annotation.files]
+            )
+        ]
+
+    assert [layer[2] for layer in asyncio.run(read())] == ["points"]
+
+
+def test_concurrent_async_reads_share_one_fetch(client: MirrorClient, monkeypatch: pytest.MonkeyPatch):
+    path = AnnotationFile.find(client)[0].https_path
+    fetches = []
+    read_file = _store._read_file
+
+    def counting_read_file(url):
+        fetches.append(url)
+        return read_file(url)
+
+    monkeypatch.setattr(_store, "_read_file", counting_read_file)
+
+    async def read():
+        return await asyncio.gather(
+            *(read_points_annotations_ndjson_async(path) for _ in range(20))
+        )
+
+    layers = asyncio.run(read())
+
+    assert len(fetches) == 1
+    assert all(len(data) == 3 for data, _, _ in layers)
@@ -0,0 +1,36 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from napari_cryoet_data_portal._client_pool import ClientPool, _KeepAliveTransport
+
+
+def test_get_reuses_client_in_same_thread():
+    pool = ClientPool()
+
+    client = pool.get()
+
+    assert pool.get() is client
+    assert isinstance(client.client.transport, _KeepAliveTransport)
+
+
+def test_get_returns_different_clients_in_different_threads():
+    pool = ClientPool()
+
+    with ThreadPoolExecutor(2) as executor:
+        other = executor.submit(pool.get).result()
+
+    assert pool.get() is not other
+
+
+def test_clear_closes_sessions_and_stops_reuse():
+    pool = ClientPool()
+    client = pool.get()
+    transport = client.client.transport
+    transport.connect()
+    transport.close()
+    session = transport.session
+    assert session is not None
+
+    pool.clear()
+
+    assert transport.session is None
+    assert pool.get() is not client
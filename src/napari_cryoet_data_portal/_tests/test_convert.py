@@ -0,0 +1,59 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+import zarr
+
+from napari_cryoet_data_portal._cache import CACHE_DIR_ENV
+from napari_cryoet_data_portal._convert import (
+    _downsample_mean,
+    _downsample_mode,
+    convert_ome_zarr,
+)
+from napari_cryoet_data_portal._reader import tomogram_ome_zarr_reader
+from napari_cryoet_data_portal._tests._utils import write_ome_zarr
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    path = tmp_path / "cache"
+    monkeypatch.setenv(CACHE_DIR_ENV, str(path))
+    return path
+
+
+def test_convert_ome_zarr_rechunks_and_builds_levels(tmp_path: Path):
+    data = np.arange(16 * 12 * 8, dtype=np.uint16).reshape((16, 12, 8))
+    path = write_ome_zarr(str(tmp_path / "source.zarr"), [data], scale=2, chunks=(8, 8, 8))
+    output_path = str(tmp_path / "output.zarr")
+
+    convert_ome_zarr(path, output_path, chunks=(4, 4, 4), levels=3, max_workers=2)
+
+    group = zarr.open_group(output_path, mode="r")
+    assert group["0"].chunks == (4, 4, 4)
+    np.testing.assert_array_equal(group["0"][:], data)
+    assert group["1"].shape == (8, 6, 4)
+    assert group["2"].shape == (4, 3, 2)
+    np.testing.assert_array_equal(group["1"][:], _downsample_mean(data))
+    layers = tomogram_ome_zarr_reader(output_path)(output_path)
+    assert len(layers[0][0]) == 3
+    np.testing.assert_allclose(layers[0][1]["scale"], (2, 2, 2))
+
+
+def test_convert_ome_zarr_labels_keeps_label_values(tmp_path: Path):
+    data = np.zeros((8, 8, 8), dtype=np.uint8)
+    data[:4, :4, :3] = 3
+    path = write_ome_zarr(str(tmp_path / "mask.zarr"), [data])
+    output_path = str(tmp_path / "output.zarr")
+
+    convert_ome_zarr(path, output_path, labels=True, chunks=(4, 4, 4), levels=2, max_workers=1)
+
+    level = zarr.open_group(output_path, mode="r")["1"][:]
+    assert set(np.unique(level)) == {0, 3}
+    assert level[0, 0, 0] == 3
+    assert level[0, 0, 1] == 3
+
+
+def test_downsample_mode_takes_most_common_value():
+    data = np.array([1, 1, 1, 2, 2, 3, 0, 0], dtype=np.uint8).reshape((2, 2, 2))
+
+    assert _downsample_mode(data)[0, 0, 0] == 1
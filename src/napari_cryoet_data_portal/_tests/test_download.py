@@ -0,0 +1,208 @@
+import json
+import os
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+import zarr
+
+from napari_cryoet_data_portal import _download, _store
+from napari_cryoet_data_portal._cache import CACHE_DIR_ENV
+from napari_cryoet_data_portal._download import (
+    COMPLETE,
+    MANIFEST_NAME,
+    MISSING,
+    SKIPPED,
+    DownloadFile,
+    _relative_path,
+    download_files,
+    plan_download,
+)
+from napari_cryoet_data_portal._tests._utils import write_ome_zarr
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    path = tmp_path / "cache"
+    monkeypatch.setenv(CACHE_DIR_ENV, str(path))
+    return path
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    _store._CACHE.clear()
+    yield
+    _store._CACHE.clear()
+
+
+@pytest.fixture()
+def image_path(tmp_path: Path) -> str:
+    data = np.arange(8 * 8 * 8, dtype=np.uint8).reshape((8, 8, 8))
+    levels = [data, data[::2, ::2, ::2]]
+    return write_ome_zarr(str(tmp_path / "portal" / "TS_026.zarr"), levels)
+
+
+class _Filter:
+    def __init__(self, tomograms) -> None:
+        self.tomograms = tomograms
+
+    def load(self, client):
+        yield None, self.tomograms
+
+
+def _tomogram(path: str) -> SimpleNamespace:
+    return SimpleNamespace(
+        name="TS_026",
+        https_omezarr_dir=path,
+        s3_omezarr_dir=None,
+        tomogram_voxel_spacing_id=1,
+    )
+
+
+def test_plan_download_lists_metadata_and_chunks_of_levels(image_path: str):
+    filter = _Filter([_tomogram(image_path)])
+
+    files = list(plan_download(filter, None, levels=(1,), annotations=False))
+
+    paths = {os.path.relpath(f.url, image_path) for f in files}
+    assert {".zgroup", ".zattrs", "0/.zarray", "1/.zarray"} <= paths
+    # Level 1 has a single 4x4x4 chunk and level 0 is not selected.
+    assert "1/0.0.0" in paths
+    assert not any(p.startswith("0/0") for p in paths)
+
+
+def test_plan_download_lists_only_stored_chunks_with_their_sizes(tmp_path: Path):
+    data = np.zeros((8, 8, 8), dtype=np.uint8)
+    data[:4, :4, :4] = 1
+    path = write_ome_zarr(str(tmp_path / "portal" / "mask.zarr"), [data])
+
+    files = list(plan_download(_Filter([_tomogram(path)]), None, annotations=False))
+
+    chunks = [f for f in files if os.path.relpath(f.url, path).startswith("0/0")]
+    assert [os.path.relpath(f.url, path) for f in chunks] == ["0/0.0.0"]
+    assert chunks[0].size == os.path.getsize(os.path.join(path, "0", "0.0.0"))
+
+
+def test_plan_download_ignores_negative_levels(image_path: str):
+    files = list(plan_download(_Filter([_tomogram(image_path)]), None, levels=(-1,), annotations=False))
+
+    paths = {os.path.relpath(f.url, image_path) for f in files}
+    assert not any(p.startswith(("0/0", "1/0")) for p in paths)
+
+
+def test_main_rejects_negative_levels(tmp_path: Path):
+    with pytest.raises(SystemExit):
+        _download.main([str(tmp_path), "--run-ids", "1", "--levels", "-1"])
+
+
+def test_download_files_writes_files_and_manifest(image_path: str, tmp_path: Path):
+    output_dir = str(tmp_path / "output")
+    files = plan_download(_Filter([_tomogram(image_path)]), None, annotations=False)
+
+    report = download_files(files, output_dir, max_workers=4)
+
+    assert report.complete > 0
+    assert report.failed == []
+    assert report.nbytes > 0
+    mirror = os.path.join(output_dir, _relative_path(image_path))
+    np.testing.assert_array_equal(
+        zarr.open_group(mirror, mode="r")["0"][:],
+        zarr.open_group(image_path, mode="r")["0"][:],
+    )
+    with open(os.path.join(output_dir, MANIFEST_NAME)) as f:
+        manifest = json.load(f)
+    assert len(manifest["files"]) == report.complete
+    assert all(e["status"] == COMPLETE for e in manifest["files"])
+
+    report = download_files(
+        plan_download(_Filter([_tomogram(image_path)]), None, annotations=False),
+        output_dir,
+    )
+
+    assert report.complete == 0
+    assert report.nbytes == 0
+    assert report.skipped == len(manifest["files"])
+
+
+def test_download_files_resumes_partial_file(tmp_path: Path):
+    source = tmp_path / "source.bin"
+    content = os.urandom(1000)
+    source.write_bytes(content)
+    output_dir = tmp_path / "output"
+    output_dir.mkdir()
+    (output_dir / "data.bin.part").write_bytes(content[:600])
+
+    report = download_files([DownloadFile(str(source), "data.bin")], str(output_dir))
+
+    assert report.complete == 1
+    assert report.nbytes == 400
+    assert (output_dir / "data.bin").read_bytes() == content
+    assert not (output_dir / "data.bin.part").exists()
+
+
+def test_download_files_reports_missing_and_verifies_size(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    source = tmp_path / "source.bin"
+    source.write_bytes(b"abcdef")
+    output_dir = tmp_path / "output"
+    files = [
+        DownloadFile(str(tmp_path / "missing.bin"), "missing.bin"),
+        DownloadFile(str(source), "data.bin"),
+    ]
+    # Simulate a server that reports more bytes than it returns.
+    monkeypatch.setattr(
+        "fsspec.implementations.local.LocalFileSystem.info",
+        lambda self, path, **kwargs: (
+            {"size": 10} if str(path).endswith("source.bin") else _raise_not_found()
+        ),
+    )
+
+    report = download_files(files, str(output_dir))
+
+    assert report.missing == 1
+    assert report.failed == ["data.bin"]
+    assert not (output_dir / "data.bin").exists()
+    with open(output_dir / MANIFEST_NAME) as f:
+        statuses = {e["path"]: e["status"] for e in json.load(f)["files"]}
+    assert statuses["missing.bin"] == MISSING
+    assert statuses["data.bin"] not in (COMPLETE, SKIPPED)
+
+
+def test_download_files_uses_listed_size_without_requesting_it(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    source = tmp_path / "source.bin"
+    source.write_bytes(b"abcdef")
+    output_dir = tmp_path / "output"
+    monkeypatch.setattr(
+        "fsspec.implementations.local.LocalFileSystem.info",
+        lambda self, path, **kwargs: _raise_not_found(),
+    )
+
+    report = download_files([DownloadFile(str(source), "data.bin", size=6)], str(output_dir))
+
+    assert report.complete == 1
+    assert (output_dir / "data.bin").read_bytes() == b"abcdef"
+
+
+def test_download_files_bounds_pending_files(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    planned = []
+    pending = []
+
+    def files():
+        for i in range(50):
+            planned.append(i)
+            yield DownloadFile(f"file://{tmp_path}/{i}.bin", f"{i}.bin")
+
+    def download_file(file, output_dir, previous):
+        pending.append(len(planned) - len(pending))
+        return {"path": file.path, "url": file.url, "status": MISSING}
+
+    monkeypatch.setattr(_download, "_download_file", download_file)
+
+    report = download_files(files(), str(tmp_path / "output"), max_workers=2)
+
+    assert report.missing == 50
+    assert max(pending) <= 2 * _download._PENDING_PER_WORKER + 1
+
+
+def _raise_not_found():
+    raise FileNotFoundError()
@@ -0,0 +1,165 @@
+import datetime
+import json
+from pathlib import Path
+
+import pytest
+
+from napari_cryoet_data_portal._filter import (
+    DatasetFilter,
+    RunFilter,
+    SearchFilter,
+    _search_to_gql,
+    listing_watermark,
+    load_changes,
+)
+from napari_cryoet_data_portal._mirror import MirrorClient
+
+
+@pytest.fixture()
+def client(tmp_path: Path) -> MirrorClient:
+    tables = {
+        "datasets": [
+            {"id": 10000, "title": "Ribosomes in cells", "release_date": "2023-01-02"},
+            {
+                "id": 10001,
+                "title": "Other dataset",
+                "release_date": "2023-01-02",
+                "last_modified_date": "2023-03-04",
+            },
+        ],
+        "runs": [
+            {"id": 1, "name": "TS_026", "dataset_id": 10000},
+            {"id": 2, "name": "TS_027", "dataset_id": 10000},
+            {"id": 3, "name": "run_100%", "dataset_id": 10001},
+        ],
+        "tomogram_voxel_spacings": [
+            {"id": 11, "run_id": 1},
+            {"id": 12, "run_id": 2},
+            {"id": 13, "run_id": 3},
+        ],
+        "tomograms": [
+            {"id": 21, "name": "TS_026", "tomogram_voxel_spacing_id": 11},
+            {"id": 22, "name": "TS_027", "tomogram_voxel_spacing_id": 12},
+            {"id": 23, "name": "TS_100", "tomogram_voxel_spacing_id": 13},
+        ],
+        "annotations": [
+            {"id": 31, "object_name": "membrane", "tomogram_voxel_spacing_id": 13},
+        ],
+    }
+    with open(tmp_path / "catalog.json", "w") as f:
+        json.dump({"version": 1, "tables": tables}, f)
+    return MirrorClient(str(tmp_path))
+
+
+def _load(filter: SearchFilter, client: MirrorClient):
+    return [
+        (dataset.id, [t.name for t in tomograms])
+        for dataset, tomograms in filter.load(client)
+    ]
+
+
+def test_search_to_gql_matches_any_name_literally():
+    gql_filters = _search_to_gql("a_b%")
+
+    conditions = gql_filters["_or"]
+    assert len(conditions) == 4
+    assert conditions[0] == {"name": {"_ilike": "%a\\_b\\%%"}}
+    assert conditions[2] == {
+        "tomogram_voxel_spacing": {
+            "run": {"dataset": {"title": {"_ilike": "%a\\_b\\%%"}}}
+        }
+    }
+
+
+def test_search_filter_matches_tomogram_name(client: MirrorClient):
+    assert _load(SearchFilter(text="ts_027"), client) == [(10000, ["TS_027"])]
+
+
+def test_search_filter_matches_dataset_title(client: MirrorClient):
+    assert _load(SearchFilter(text="RIBOSOME"), client) == [
+        (10000, ["TS_026", "TS_027"])
+    ]
+
+
+def test_search_filter_matches_object_name(client: MirrorClient):
+    assert _load(SearchFilter(text="membrane"), client) == [(10001, ["TS_100"])]
+
+
+def test_search_filter_matches_wildcards_literally(client: MirrorClient):
+    assert _load(SearchFilter(text="100%"), client) == [(10001, ["TS_100"])]
+    assert _load(SearchFilter(text="TS%6"), client) == []
+
+
+def test_search_filter_loads_pages(client: MirrorClient):
+    assert _load(SearchFilter(text="", page_size=2), client) == [
+        (10000, ["TS_026", "TS_027"]),
+        (10001, ["TS_100"]),
+    ]
+    assert _load(SearchFilter(text="TS", page_size=1), client) == [
+        (10000, ["TS_026"]),
+        (10000, ["TS_027"]),
+        (10001, ["TS_100"]),
+    ]
+
+
+def _load_changes(filter, client: MirrorClient, since: datetime.date, dataset_ids):
+    changes = load_changes(filter, client, since=since, dataset_ids=dataset_ids)
+    loaded = []
+    while True:
+        try:
+            dataset, tomograms = next(changes)
+        except StopIteration as stop:
+            return loaded, stop.value
+        loaded.append((dataset.id, [t.name for t in tomograms]))
+
+
+def test_listing_watermark(client: MirrorClient):
+    datasets = [dataset for dataset, _ in DatasetFilter().load(client)]
+
+    assert listing_watermark(datasets) == datetime.date(2023, 3, 4)
+    assert listing_watermark([]) is None
+
+
+def test_load_changes_of_dataset_filter_loads_changed_and_removed_datasets(client: MirrorClient):
+    since = datetime.date(2023, 2, 1)
+
+    loaded, removed = _load_changes(DatasetFilter(), client, since, (10000, 10001, 9999))
+
+    assert loaded == [(10001, ["TS_100"])]
+    assert removed == (9999,)
+
+
+def test_load_changes_of_dataset_filter_keeps_ids(client: MirrorClient):
+    since = datetime.date(2023, 1, 1)
+
+    loaded, removed = _load_changes(DatasetFilter(ids=(10000,)), client, since, (10000, 10001))
+
+    assert loaded == [(10000, ["TS_026", "TS_027"])]
+    assert removed == (10001,)
+
+
+def test_load_changes_of_dataset_filter_loads_datasets_with_new_tomograms(client: MirrorClient, tmp_path: Path):
+    with open(tmp_path / "catalog.json") as f:
+        catalog = json.load(f)
+    catalog["tables"]["depositions"] = [{"id": 41, "release_date": "2023-03-04"}]
+    catalog["tables"]["tomograms"].append(
+        {"id": 24, "name": "TS_026_new", "tomogram_voxel_spacing_id": 11, "deposition_id": 41}
+    )
+    with open(tmp_path / "catalog.json", "w") as f:
+        json.dump(catalog, f)
+    client = MirrorClient(str(tmp_path))
+    since = datetime.date(2023, 3, 4)
+
+    loaded, removed = _load_changes(DatasetFilter(), client, since, (10000, 10001))
+
+    assert loaded == [(10000, ["TS_026", "TS_027", "TS_026_new"]), (10001, ["TS_100"])]
+    assert removed == ()
+
+
+def test_load_changes_of_other_filter_loads_everything(client: MirrorClient):
+    since = datetime.date(2023, 2, 1)
+
+    loaded, removed = _load_changes(RunFilter(ids=(1,)), client, since, (10000, 10001))
+
+    assert loaded == [(10000, ["TS_026"])]
+    assert removed == (10001,)
@@ -1,12 +1,20 @@
-from cryoet_data_portal import Client, Run, Tomogram, TomogramVoxelSpacing
+import datetime
+import json
+import os
+
+from cryoet_data_portal import Client, Dataset, Run, Tomogram, TomogramVoxelSpacing
 import pytest
 from pytestqt.qtbot import QtBot
 
-from napari_cryoet_data_portal._filter import DatasetFilter, RunFilter, SpacingFilter, TomogramFilter
+from napari_cryoet_data_portal._client_pool import clear_clients
+from napari_cryoet_data_portal._filter import DatasetFilter, RunFilter, SearchFilter, SpacingFilter, TomogramFilter
 from napari_cryoet_data_portal._listing_widget import ListingWidget
+from napari_cryoet_data_portal._mirror import MirrorClient
 from napari_cryoet_data_portal._tests._utils import (
     tree_item_children,
+    tree_items_names,
     tree_top_items,
+    write_mirror,
 )
 from napari_cryoet_data_portal._uri_widget import GRAPHQL_URI
 
@@ -86,3 +94,66 @@ def test_load_with_tomogram_filter_lists_only_that_data(widget: ListingWidget, q
     assert len(dataset_items) == 1
     tomogram_items = tree_item_children(dataset_items[0])
     assert len(tomogram_items) == 1
+
+
+def test_load_lists_data_of_mirror(widget: ListingWidget, qtbot: QtBot, tmp_path):
+    mirror = write_mirror(str(tmp_path / "mirror"))
+
+    with qtbot.waitSignal(widget._progress.finished, timeout=60000):
+        widget.load(mirror)
+
+    dataset_items = tree_top_items(widget.tree)
+    assert tree_items_names(dataset_items) == ("10000 (1)",)
+    assert tree_items_names(tree_item_children(dataset_items[0])) == ("TS_026",)
+
+
+def test_load_with_search_filter_lists_matches(widget: ListingWidget, qtbot: QtBot, tmp_path):
+    mirror = write_mirror(str(tmp_path / "mirror"))
+    filter = SearchFilter(text="ribosome", page_size=1)
+
+    with qtbot.waitSignal(widget._progress.finished, timeout=60000):
+        widget.load(mirror, filter=filter)
+
+    dataset_items = tree_top_items(widget.tree)
+    assert tree_items_names(dataset_items) == ("10000 (1)",)
+    assert tree_items_names(tree_item_children(dataset_items[0])) == ("TS_026",)
+
+
+def test_dataset_loaded_again_adds_tomograms_to_item(widget: ListingWidget, tmp_path):
+    client = MirrorClient(write_mirror(str(tmp_path / "mirror")))
+    dataset = client.find(Dataset)[0]
+    tomogram = client.find(Tomogram)[0]
+
+    widget._onDatasetLoaded((dataset, [tomogram]))
+    widget._onDatasetLoaded((dataset, [tomogram]))
+
+    dataset_items = tree_top_items(widget.tree)
+    assert tree_items_names(dataset_items) == ("10000 (1)",)
+    assert tree_items_names(tree_item_children(dataset_items[0])) == ("TS_026",)
+
+
+def test_load_again_only_updates_changed_datasets(widget: ListingWidget, qtbot: QtBot, tmp_path):
+    mirror = write_mirror(str(tmp_path / "mirror"))
+    with qtbot.waitSignal(widget._progress.finished, timeout=60000):
+        widget.load(mirror)
+    assert widget._watermark == datetime.date(2023, 1, 2)
+    unchanged_item = tree_top_items(widget.tree)[0]
+    catalog_path = os.path.join(mirror, "catalog.json")
+    with open(catalog_path) as f:
+        catalog = json.load(f)
+    tables = catalog["tables"]
+    tables["datasets"] = [{"id": 10001, "title": "New dataset", "release_date": "2023-02-03"}]
+    tables["runs"].append({"id": 6, "name": "TS_100", "dataset_id": 10001})
+    tables["tomogram_voxel_spacings"].append({"id": 7, "run_id": 6})
+    tables["tomograms"].append({"id": 8, "name": "TS_100", "tomogram_voxel_spacing_id": 7})
+    with open(catalog_path, "w") as f:
+        json.dump(catalog, f)
+    clear_clients()
+
+    with qtbot.waitSignal(widget._progress.finished, timeout=60000):
+        widget.load(mirror)
+
+    dataset_items = tree_top_items(widget.tree)
+    assert tree_items_names(dataset_items) == ("10001 (1)",)
+    assert unchanged_item not in dataset_items
+    assert widget._watermark == datetime.date(2023, 2, 3)
@@ -3,8 +3,10 @@ from pytestqt.qtbot import QtBot
 
 from cryoet_data_portal import Dataset, Tomogram
 
+from napari_cryoet_data_portal._client_pool import get_client
 from napari_cryoet_data_portal._metadata_widget import MetadataWidget
-from napari_cryoet_data_portal._tests._utils import tree_top_items
+from napari_cryoet_data_portal._projection import LISTING_FIELDS, find_items, to_model
+from napari_cryoet_data_portal._tests._utils import tree_top_items, write_mirror
 
 
 @pytest.fixture()
@@ -35,4 +37,19 @@ def test_load_tomogram_lists_metadata(widget: MetadataWidget, tomogram: Tomogram
         widget.load(tomogram)
     
     items = tree_top_items(widget._main.tree)
-    assert len(items) > 0
\ No newline at end of file
+    assert len(items) > 0
+
+def test_load_projected_tomogram_lists_all_metadata(widget: MetadataWidget, qtbot: QtBot, tmp_path):
+    mirror = write_mirror(str(tmp_path / "mirror"))
+    client = get_client(mirror)
+    item = find_items(client, Tomogram, fields=LISTING_FIELDS)[0]
+    tomogram = to_model(client, Tomogram, item, LISTING_FIELDS)
+    assert tomogram.https_omezarr_dir is None
+    widget.setUri(mirror)
+
+    with qtbot.waitSignal(widget._progress.finished):
+        widget.load(tomogram)
+
+    assert tomogram.https_omezarr_dir is not None
+    items = tree_top_items(widget._main.tree)
+    assert "https_omezarr_dir" in [item.text(0) for item in items]
@@ -0,0 +1,96 @@
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pytest
+from cryoet_data_portal import Annotation, Dataset, Run, Tomogram
+
+from napari_cryoet_data_portal import _store
+from napari_cryoet_data_portal._cache import CACHE_DIR_ENV
+from napari_cryoet_data_portal._client_pool import get_client
+from napari_cryoet_data_portal._download import download
+from napari_cryoet_data_portal._filter import DatasetFilter, TomogramFilter
+from napari_cryoet_data_portal._mirror import CATALOG_NAME, MirrorClient, mirror_root
+from napari_cryoet_data_portal._reader import read_annotation_files, read_tomogram
+from napari_cryoet_data_portal._tests._utils import write_mirror
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    path = tmp_path / "cache"
+    monkeypatch.setenv(CACHE_DIR_ENV, str(path))
+    return path
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    _store._CACHE.clear()
+    yield
+    _store._CACHE.clear()
+
+
+@pytest.fixture()
+def mirror(tmp_path: Path) -> str:
+    return write_mirror(str(tmp_path / "mirror"))
+
+
+def test_mirror_root(mirror: str, tmp_path: Path):
+    assert mirror_root(mirror) == mirror
+    assert mirror_root(os.path.join(mirror, CATALOG_NAME)) == mirror
+    assert mirror_root(f"file://{mirror}") == mirror
+    assert mirror_root(str(tmp_path)) is None
+    assert mirror_root("https://graphql.cryoetdataportal.cziscience.com/v1/graphql") is None
+
+
+def test_get_client_of_mirror(mirror: str):
+    assert isinstance(get_client(mirror), MirrorClient)
+
+
+def test_filters_and_relationships(mirror: str):
+    client = MirrorClient(mirror)
+
+    (dataset, tomograms), = list(DatasetFilter().load(client))
+    assert dataset.id == 10000
+    assert [t.name for t in tomograms] == ["TS_026"]
+    (dataset, tomograms), = list(TomogramFilter(ids=(3,)).load(client))
+    assert dataset.title == "Test dataset"
+    assert list(TomogramFilter(ids=(4,)).load(client)) == []
+    assert [r.id for r in Run.find(client, [Run.dataset.title.ilike("%TEST%")])] == [1]
+    assert Dataset.find(client, [Dataset.id > 10000]) == []
+
+
+def test_read_tomogram_and_annotations(mirror: str):
+    client = MirrorClient(mirror)
+    tomogram = Tomogram.find(client, [Tomogram.name == "TS_026"])[0]
+    annotation = Annotation.find(
+        client, [Annotation.tomogram_voxel_spacing_id == tomogram.tomogram_voxel_spacing_id]
+    )[0]
+
+    data, attributes, _ = read_tomogram(tomogram)
+    (points, _, _), = list(read_annotation_files(annotation, tomogram=tomogram))
+
+    assert data[0].shape == (8, 8, 8)
+    np.testing.assert_allclose(attributes["scale"], (13.48,) * 3)
+    assert len(points) == 3
+
+
+def test_download_exports_mirror(mirror: str, tmp_path: Path):
+    output_dir = str(tmp_path / "export")
+
+    report = download(TomogramFilter(ids=(3,)), output_dir, levels=(1,), uri=mirror)
+
+    assert report.failed == []
+    client = get_client(output_dir)
+    assert isinstance(client, MirrorClient)
+    (_, tomograms), = list(DatasetFilter().load(client))
+    data, _, _ = read_tomogram(tomograms[0])
+    np.testing.assert_array_equal(
+        np.asarray(data[1]), np.asarray(read_tomogram(Tomogram.find(MirrorClient(mirror))[0])[0][1])
+    )
+    annotation = Annotation.find(client)[0]
+    assert len(list(read_annotation_files(annotation))[0][0]) == 3
+    with open(os.path.join(output_dir, CATALOG_NAME)) as f:
+        tables = json.load(f)["tables"]
+    assert tables["datasets"][0]["release_date"] == "2023-01-02"
+    assert tables["tomograms"][0]["s3_omezarr_dir"] is None
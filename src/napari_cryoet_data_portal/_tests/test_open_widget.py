@@ -1,10 +1,22 @@
+from types import SimpleNamespace
+
+import numpy as np
 import pytest
 from cryoet_data_portal import Tomogram
 from napari.components import ViewerModel
 from napari.layers import Points
 from pytestqt.qtbot import QtBot
+from qtpy.QtCore import Qt
 
-from napari_cryoet_data_portal._open_widget import OpenWidget
+from napari_cryoet_data_portal import _open_widget
+from napari_cryoet_data_portal._mirror import MirrorClient
+from napari_cryoet_data_portal._open_widget import (
+    OpenWidget,
+    Refinement,
+    _grid_offsets,
+    _sorted_annotation_files,
+)
+from napari_cryoet_data_portal._tests._utils import write_mirror
 
 
 @pytest.fixture()
@@ -52,3 +64,261 @@ def test_set_tomogram_adds_layers_to_viewer_without_clearing_existing(
         widget.setTomogram(tomogram)
 
     assert len(widget._viewer.layers) > 1
+
+
+def test_refinement_replaces_image_data_and_keeps_state(widget: OpenWidget):
+    low = np.zeros((4, 4, 4), dtype=np.float32)
+    widget._onLayerLoaded((low, {"name": "tomogram", "scale": (4, 4, 4), "translate": (1.5, 1.5, 1.5)}, "image"))
+    widget._flushLayers()
+    layer = widget._viewer.layers["tomogram"]
+    layer.contrast_limits = (-1, 2)
+    layer.colormap = "magma"
+    layer.gamma = 0.5
+    layer.opacity = 0.3
+    high = np.ones((16, 16, 16), dtype=np.float32)
+    inserted = []
+    widget._viewer.layers.events.inserted.connect(
+        lambda event: inserted.append((event.value.data.shape, tuple(event.value.scale)))
+    )
+
+    widget._onLayerLoaded(Refinement((high, {"name": "tomogram", "scale": (1, 1, 1), "translate": (0, 0, 0)}, "image")))
+    widget._flushLayers()
+
+    # The refined data is only added with its final scale.
+    assert inserted == [((16, 16, 16), (1, 1, 1))]
+    assert len(widget._viewer.layers) == 1
+    refined = widget._viewer.layers[0]
+    assert refined.name == "tomogram"
+    assert refined.data.shape == (16, 16, 16)
+    np.testing.assert_allclose(refined.scale, (1, 1, 1))
+    np.testing.assert_allclose(refined.translate, (0, 0, 0))
+    np.testing.assert_allclose(refined.contrast_limits, (-1, 2))
+    assert refined.colormap.name == "magma"
+    assert refined.gamma == 0.5
+    assert refined.opacity == 0.3
+
+
+def test_refinement_ignored_when_image_layer_removed(widget: OpenWidget):
+    low = np.zeros((4, 4, 4), dtype=np.float32)
+    widget._onLayerLoaded((low, {"name": "tomogram", "scale": (4, 4, 4), "translate": (0, 0, 0)}, "image"))
+    widget._flushLayers()
+    widget._viewer.layers.clear()
+    high = np.ones((16, 16, 16), dtype=np.float32)
+
+    widget._onLayerLoaded(Refinement((high, {"name": "tomogram", "scale": (1, 1, 1), "translate": (0, 0, 0)}, "image")))
+    widget._flushLayers()
+
+    assert len(widget._viewer.layers) == 0
+
+
+def test_loaded_layers_are_added_together(widget: OpenWidget, qtbot: QtBot):
+    points = np.zeros((3, 3))
+
+    for name in ("a", "b", "c"):
+        widget._onLayerLoaded((points, {"name": name}, "points"))
+
+    assert len(widget._viewer.layers) == 0
+    qtbot.waitUntil(lambda: len(widget._viewer.layers) == 3)
+
+
+def test_keep_unchanged_layers(widget: OpenWidget, qtbot: QtBot):
+    unchanged = widget._viewer.add_points(np.zeros((3, 3)), name="unchanged", scale=(2, 2, 2))
+    changed = widget._viewer.add_points(np.zeros((3, 3)), name="changed")
+    removed = widget._viewer.add_points(np.zeros((3, 3)), name="removed")
+    widget._keep_unchanged_layers.setChecked(True)
+    widget._stale_layers = list(widget._viewer.layers)
+
+    widget._onLayerLoaded((np.zeros((3, 3)), {"name": "unchanged", "scale": (2, 2, 2)}, "points"))
+    widget._onLayerLoaded((np.zeros((5, 3)), {"name": "changed"}, "points"))
+    widget._onTomogramLoaded(None)
+
+    layers = widget._viewer.layers
+    assert [layer.name for layer in layers] == ["unchanged", "changed"]
+    assert layers["unchanged"] is unchanged
+    assert layers["changed"] is not changed
+    assert len(layers["changed"].data) == 5
+    assert removed not in layers
+
+
+def test_keep_unchanged_layers_replaces_layer_of_other_tomogram(widget: OpenWidget):
+    metadata = {"id": 1, "https_omezarr_dir": "https://a/TS_026.zarr"}
+    old = widget._viewer.add_points(np.zeros((3, 3)), name="TS_026", metadata=metadata)
+    widget._keep_unchanged_layers.setChecked(True)
+    widget._stale_layers = list(widget._viewer.layers)
+
+    other_metadata = {"id": 2, "https_omezarr_dir": "https://b/TS_026.zarr"}
+    widget._onLayerLoaded((np.zeros((3, 3)), {"name": "TS_026", "metadata": other_metadata}, "points"))
+    widget._onTomogramLoaded(None)
+
+    layers = widget._viewer.layers
+    assert [layer.name for layer in layers] == ["TS_026"]
+    assert layers["TS_026"] is not old
+    assert layers["TS_026"].metadata["id"] == 2
+
+
+def _fake_tomogram(name: str, size: int = 10, voxel_spacing: float = 2):
+    return SimpleNamespace(
+        name=name,
+        size_x=size,
+        size_y=size,
+        size_z=size,
+        voxel_spacing=voxel_spacing,
+    )
+
+
+def test_grid_offsets():
+    tomograms = [_fake_tomogram(str(i), size=100 * (i + 1)) for i in range(5)]
+
+    offsets = _grid_offsets(tomograms)
+
+    cell = 500 * 2 * 1.1
+    np.testing.assert_allclose(
+        offsets,
+        [(0, 0, 0), (0, 0, cell), (0, 0, 2 * cell), (0, cell, 0), (0, cell, cell)],
+    )
+
+
+def test_load_many_tomograms_concurrently(
+    widget: OpenWidget, qtbot: QtBot, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(_open_widget, "MAX_CONCURRENT_LOADS", 2)
+    tomograms = [_fake_tomogram(name) for name in ("a", "b", "c")]
+
+    def load(tomogram, resolution, progressive=False, offset=None, region=None, selection=None):
+        yield (np.zeros((3, 3)), {"name": tomogram.name, "translate": offset}, "points")
+
+    monkeypatch.setattr(widget, "_loadTomogram", load)
+    widget.setTomograms(tomograms)
+
+    assert widget.title() == "Tomograms: 3 selected"
+    assert widget.tomograms() == tuple(tomograms)
+
+    widget.load()
+
+    assert len(widget._active_loads) == 2
+    qtbot.waitUntil(lambda: len(widget._active_loads) == 0)
+    layers = widget._viewer.layers
+    assert sorted(layer.name for layer in layers) == ["a", "b", "c"]
+    np.testing.assert_allclose(layers["b"].translate, (0, 0, 22))
+    np.testing.assert_allclose(layers["c"].translate, (0, 22, 0))
+
+
+def test_sorted_annotation_files_puts_small_files_first():
+    mask = SimpleNamespace(shape_type="SegmentationMask", format="zarr")
+    many = SimpleNamespace(shape_type="Point", format="ndjson")
+    few = SimpleNamespace(shape_type="OrientedPoint", format="ndjson")
+    annotations = [
+        SimpleNamespace(object_count=1, files=[mask]),
+        SimpleNamespace(object_count=1000, files=[many]),
+        SimpleNamespace(object_count=10, files=[few]),
+    ]
+
+    files = _sorted_annotation_files(annotations)
+
+    assert [f for _, f in files] == [few, many, mask]
+
+
+def test_set_tomogram_of_mirror_adds_layers_to_viewer(
+    widget: OpenWidget, qtbot: QtBot, tmp_path
+):
+    mirror = write_mirror(str(tmp_path / "mirror"))
+    tomogram = Tomogram.find(MirrorClient(mirror))[0]
+    widget.setUri(mirror)
+
+    with qtbot.waitSignal(widget._progress.finished, timeout=60000):
+        widget.setTomogram(tomogram)
+
+    assert [layer.name for layer in widget._viewer.layers] == [
+        "TS_026",
+        "TS_026-ribosome",
+    ]
+
+
+def test_unchecked_annotations_are_not_loaded(
+    widget: OpenWidget, qtbot: QtBot, tmp_path
+):
+    mirror = write_mirror(str(tmp_path / "mirror"))
+    tomogram = Tomogram.find(MirrorClient(mirror))[0]
+    widget.setUri(mirror)
+    with qtbot.waitSignal(widget._progress.finished, timeout=60000):
+        widget.setTomogram(tomogram)
+    widget._annotations.item(0).setCheckState(Qt.CheckState.Unchecked)
+
+    with qtbot.waitSignal(widget._progress.finished, timeout=60000):
+        widget.load()
+
+    assert [layer.name for layer in widget._viewer.layers] == ["TS_026"]
+    assert widget._annotations.count() == 1
+
+
+def test_points_slab_only_shows_points_near_current_slice(
+    widget: OpenWidget, qtbot: QtBot, tmp_path
+):
+    mirror = write_mirror(str(tmp_path / "mirror"))
+    tomogram = Tomogram.find(MirrorClient(mirror))[0]
+    widget.setUri(mirror)
+    with qtbot.waitSignal(widget._progress.finished, timeout=60000):
+        widget.setTomogram(tomogram)
+    points = widget._viewer.layers["TS_026-ribosome"]
+    # The points are at z = 0, 1 and 2 voxels, and each voxel is 13.48 Å.
+    widget._viewer.dims.set_point(0, 0)
+
+    widget._points_slab.setValue(30)
+
+    np.testing.assert_array_equal(points.shown, [True, True, False])
+
+    widget._viewer.dims.set_point(0, 2 * 13.48)
+
+    np.testing.assert_array_equal(points.shown, [False, True, True])
+
+    widget._points_slab.setValue(0)
+
+    np.testing.assert_array_equal(points.shown, [True, True, True])
+
+
+def test_open_slab_region_only_reads_slices_near_current_slice(
+    widget: OpenWidget, qtbot: QtBot, tmp_path
+):
+    mirror = write_mirror(str(tmp_path / "mirror"))
+    tomogram = Tomogram.find(MirrorClient(mirror))[0]
+    widget.setUri(mirror)
+    with qtbot.waitSignal(widget._progress.finished, timeout=60000):
+        widget.setTomogram(tomogram)
+    widget._viewer.dims.set_point(0, 2 * 13.48)
+    widget.resolution.setCurrentText(_open_widget.HIGH_RESOLUTION.name)
+    widget._region.setCurrentText(_open_widget.REGION_SLAB)
+    widget._region_thickness.setValue(30)
+
+    with qtbot.waitSignal(widget._progress.finished, timeout=60000):
+        widget.load()
+
+    image = widget._viewer.layers["TS_026"]
+    assert isinstance(image.data, np.ndarray)
+    assert image.data.shape == (3, 8, 8)
+    np.testing.assert_allclose(image.scale, (13.48, 13.48, 13.48))
+    np.testing.assert_allclose(image.translate, (13.48, 0, 0))
+
+
+def test_open_box_region_reads_drawn_box_and_keeps_it(
+    widget: OpenWidget, qtbot: QtBot, tmp_path
+):
+    mirror = write_mirror(str(tmp_path / "mirror"))
+    tomogram = Tomogram.find(MirrorClient(mirror))[0]
+    widget.setUri(mirror)
+    with qtbot.waitSignal(widget._progress.finished, timeout=60000):
+        widget.setTomogram(tomogram)
+    box = widget._viewer.add_shapes(
+        [[[0, 13.48, 26.96], [0, 53.92, 26.96], [0, 53.92, 67.4], [0, 13.48, 67.4]]],
+        shape_type="rectangle",
+    )
+    widget.resolution.setCurrentText(_open_widget.HIGH_RESOLUTION.name)
+    widget._region.setCurrentText(_open_widget.REGION_BOX)
+    widget._region_thickness.setValue(30)
+
+    with qtbot.waitSignal(widget._progress.finished, timeout=60000):
+        widget.load()
+
+    assert box in widget._viewer.layers
+    image = widget._viewer.layers["TS_026"]
+    np.testing.assert_array_equal(image.data, np.arange(8 * 8 * 8).reshape((8, 8, 8))[0:2, 1:5, 2:6])
+    np.testing.assert_allclose(image.translate, (0, 13.48, 2 * 13.48))
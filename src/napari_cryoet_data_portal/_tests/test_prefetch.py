@@ -0,0 +1,87 @@
+import time
+from pathlib import Path
+
+import numpy as np
+import zarr
+from pytestqt.qtbot import QtBot
+from qtpy.QtCore import QThread
+from qtpy.QtWidgets import QTreeWidgetItem
+
+from napari_cryoet_data_portal._listing_tree_widget import ListingTreeWidget
+from napari_cryoet_data_portal._prefetch import (
+    _at_lowest_priority,
+    _prefetch_lowest_level,
+    _RateLimiter,
+)
+from napari_cryoet_data_portal._store import open_store
+from napari_cryoet_data_portal._tests._utils import (
+    tree_items_names,
+    write_ome_zarr,
+)
+
+
+def test_prefetch_lowest_level_fills_cache(tmp_path: Path):
+    data = np.arange(16**3, dtype=np.uint16).reshape((16, 16, 16))
+    path = write_ome_zarr(str(tmp_path / "image.zarr"), [data, data[::2, ::2, ::2]])
+
+    fetched = sum(_prefetch_lowest_level(path))
+
+    assert fetched > 0
+    store = open_store(path)
+    array = zarr.open_group(store, mode="r")["1"]
+    np.testing.assert_array_equal(array[:], data[::2, ::2, ::2])
+    assert store.bytes_fetched == 0
+
+
+def test_at_lowest_priority_restores_priority_before_each_yield(qtbot: QtBot):
+    thread = QThread.currentThread()
+    thread.setPriority(QThread.Priority.HighPriority)
+    priorities = []
+
+    def work():
+        for i in range(3):
+            priorities.append(thread.priority())
+            yield i
+
+    try:
+        wrapped = _at_lowest_priority(work())
+        assert next(wrapped) == 0
+        # A quit worker abandons the generator here without closing it.
+        assert thread.priority() == QThread.Priority.HighPriority
+        assert next(wrapped) == 1
+        assert thread.priority() == QThread.Priority.HighPriority
+    finally:
+        thread.setPriority(QThread.Priority.NormalPriority)
+    assert priorities == [QThread.Priority.LowestPriority] * 2
+
+
+def test_rate_limiter_throttles():
+    limiter = _RateLimiter(max_bytes_per_second=1000)
+    start = time.monotonic()
+
+    for _ in limiter.throttle(200):
+        pass
+
+    assert time.monotonic() - start >= 0.2
+
+
+def test_rate_limiter_without_limit_does_not_throttle():
+    limiter = _RateLimiter(max_bytes_per_second=None)
+
+    steps = list(limiter.throttle(2**30))
+
+    assert len(steps) == 1
+
+
+def test_neighbour_items_alternates_next_and_previous(qtbot: QtBot):
+    tree = ListingTreeWidget()
+    qtbot.add_widget(tree)
+    dataset = QTreeWidgetItem(("dataset",))
+    for name in ("a", "b", "c", "d", "e"):
+        dataset.addChild(QTreeWidgetItem((name,)))
+    tree.addTopLevelItem(dataset)
+    dataset.child(3).setHidden(True)
+
+    neighbours = tree.neighbourItems(dataset.child(2), 2)
+
+    assert tree_items_names(neighbours) == ("e", "b", "a")
@@ -0,0 +1,131 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+from cryoet_data_portal import Dataset, Run, Tomogram
+
+from napari_cryoet_data_portal._mirror import MirrorClient
+from napari_cryoet_data_portal._projection import (
+    LISTING_FIELDS,
+    complete,
+    find_items,
+    to_model,
+    to_where,
+)
+from napari_cryoet_data_portal._tests._utils import write_mirror
+
+
+@pytest.fixture()
+def client(tmp_path: Path) -> MirrorClient:
+    return MirrorClient(write_mirror(str(tmp_path / "mirror")))
+
+
+def test_find_items_finds_only_fields_and_related(client: MirrorClient):
+    related = {"dataset": {}, "tomogram_voxel_spacings": {"tomograms": {}}}
+
+    items = find_items(client, Run, fields=LISTING_FIELDS, related=related)
+
+    assert items == [
+        {
+            "id": 1,
+            "dataset": {"id": 10000, "last_modified_date": None, "release_date": "2023-01-02"},
+            "tomogram_voxel_spacings": [
+                {
+                    "id": 2,
+                    "tomograms": [
+                        {
+                            "id": 3,
+                            "name": "TS_026",
+                            "size_x": 8,
+                            "size_y": 8,
+                            "size_z": 8,
+                            "tomogram_voxel_spacing_id": 2,
+                            "voxel_spacing": 13.48,
+                        }
+                    ],
+                }
+            ],
+        }
+    ]
+
+
+def test_find_items_with_limit_offset_and_order(client: MirrorClient):
+    ids = [item["id"] for item in find_items(client, Tomogram, fields={Tomogram: ("id",)})]
+    assert ids == [3]
+
+    items = find_items(
+        client, Tomogram, fields={Tomogram: ("id",)}, limit=1, offset=1, order_by=[{"id": "desc"}]
+    )
+
+    assert items == []
+
+
+def test_listing_fields_make_smaller_responses(client: MirrorClient):
+    related = {"tomogram_voxel_spacing": {"run": {"dataset": {}}}}
+
+    full = find_items(client, Tomogram, related=related)
+    projected = find_items(client, Tomogram, fields=LISTING_FIELDS, related=related)
+
+    # The local mirror only has a few fields, so the portal saves more.
+    assert len(json.dumps(projected)) < len(json.dumps(full)) / 2
+
+
+def test_complete_finds_other_fields_in_place(client: MirrorClient):
+    item = find_items(client, Dataset, fields=LISTING_FIELDS)[0]
+    dataset = to_model(client, Dataset, item, LISTING_FIELDS)
+    assert dataset.title is None
+
+    completed = complete(dataset, client)
+
+    assert completed is dataset
+    assert dataset.title == "Test dataset"
+    assert complete(dataset, None) is dataset
+
+
+def test_complete_from_many_threads_queries_once(client: MirrorClient, monkeypatch: pytest.MonkeyPatch):
+    item = find_items(client, Dataset, fields=LISTING_FIELDS)[0]
+    dataset = to_model(client, Dataset, item, LISTING_FIELDS)
+    calls = []
+    find = client.find
+
+    def slow_find(*args, **kwargs):
+        calls.append(None)
+        time.sleep(0.05)
+        return find(*args, **kwargs)
+
+    monkeypatch.setattr(client, "find", slow_find)
+
+    with ThreadPoolExecutor(8) as executor:
+        titles = list(executor.map(lambda _: complete(dataset, client).title, range(8)))
+
+    assert len(calls) == 1
+    assert titles == ["Test dataset"] * 8
+
+
+def test_to_model_without_fields_is_complete(client: MirrorClient):
+    item = find_items(client, Dataset)[0]
+
+    dataset = to_model(client, Dataset, item)
+
+    assert complete(dataset, None) is dataset
+    assert dataset.title == "Test dataset"
+
+
+def test_to_where_nests_filters_on_same_related_entity():
+    expressions = (
+        Tomogram.tomogram_voxel_spacing.run.dataset_id == 10000,
+        Tomogram.tomogram_voxel_spacing.run.name == "TS_026",
+        Tomogram.id._in([1]),
+    )
+
+    where = to_where(expressions)
+
+    assert where == {
+        "tomogram_voxel_spacing": {
+            "run": {"dataset_id": {"_eq": 10000}, "name": {"_eq": "TS_026"}},
+        },
+        "id": {"_in": [1]},
+    }
+
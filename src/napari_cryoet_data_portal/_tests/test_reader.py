@@ -1,17 +1,31 @@
 import pytest
+from pathlib import Path
 from typing import Callable
 
+import mrcfile
+import npe2
 import numpy as np
 from cryoet_data_portal import Annotation
 from napari import Viewer
 from napari.layers import Points
 
+import napari_cryoet_data_portal
+
+from napari_cryoet_data_portal._open_widget import (
+    MID_RESOLUTION,
+    _handle_image_at_resolution,
+)
 from napari_cryoet_data_portal._reader import (
     read_annotation,
     read_annotation_files,
     read_points_annotations_ndjson,
+    read_region,
+    read_segmentation_mask_ome_zarr,
+    read_tomogram_mrc,
     read_tomogram_ome_zarr,
+    tomogram_mrc_reader,
 )
+from napari_cryoet_data_portal._tests._utils import write_ome_zarr
 
 CLOUDFRONT_URI = "https://files.cryoetdataportal.cziscience.com"
 TOMOGRAM_DIR = f"{CLOUDFRONT_URI}/10000/TS_026/Tomograms/VoxelSpacing13.480"
@@ -68,3 +82,99 @@ def test_read_annotation_files(annotation_with_points: Annotation):
     assert len(data) > 0
     assert len(attrs["name"]) > 0
     assert layer_type == "points"
+
+
+@pytest.fixture()
+def mrc_path(tmp_path: Path) -> str:
+    path = str(tmp_path / "TS_026.mrc")
+    data = np.arange(8 * 6 * 4, dtype=np.float32).reshape((8, 6, 4))
+    with mrcfile.new(path) as mrc:
+        mrc.set_data(data)
+        mrc.voxel_size = 13.48
+    return path
+
+
+def test_read_tomogram_mrc(mrc_path: str):
+    data, attrs, layer_type = read_tomogram_mrc(mrc_path)
+
+    assert data.shape == (8, 6, 4)
+    assert data[1, 2, 3].compute() == 1 * 24 + 2 * 4 + 3
+    np.testing.assert_allclose(attrs["scale"], (13.48, 13.48, 13.48), atol=0.01)
+    assert attrs["name"] == "TS_026"
+    assert layer_type == "image"
+
+
+def test_read_tomogram_mrc_with_pyramid(mrc_path: str):
+    data, attrs, _ = read_tomogram_mrc(mrc_path, pyramid_levels=2)
+
+    assert attrs["multiscale"]
+    assert [d.shape for d in data] == [(8, 6, 4), (4, 3, 2), (2, 1, 1)]
+    full = np.asarray(data[0])
+    np.testing.assert_allclose(data[1][0, 0, 0], full[:2, :2, :2].mean())
+
+
+def test_tomogram_mrc_reader(mrc_path: str):
+    manifest = npe2.PluginManifest.from_file(
+        Path(napari_cryoet_data_portal.__file__).parent / "napari.yaml"
+    )
+    readers = {r.command: r for r in manifest.contributions.readers}
+    assert "*.mrc" in readers["napari-cryoet-data-portal.tomogram_mrc_reader"].filename_patterns
+
+    layers = tomogram_mrc_reader(mrc_path)(mrc_path)
+
+    assert len(layers) == 1
+    data, _, layer_type = layers[0]
+    assert data.shape == (8, 6, 4)
+    assert layer_type == "image"
+
+
+@pytest.fixture()
+def ome_zarr_path(tmp_path: Path) -> str:
+    data = np.arange(16 * 16 * 16, dtype=np.int32).reshape((16, 16, 16))
+    levels = [data, data[::2, ::2, ::2]]
+    return write_ome_zarr(str(tmp_path / "image.zarr"), levels, scale=2)
+
+
+def test_read_region(ome_zarr_path: str):
+    layer = read_tomogram_ome_zarr(ome_zarr_path)
+
+    data, attrs, layer_type = read_region(layer, (4, 0, 10), (9, 30, 13))
+
+    assert isinstance(data, np.ndarray)
+    np.testing.assert_array_equal(data, np.asarray(layer[0][0][2:5, 0:16, 5:7]))
+    assert attrs["scale"] == (2, 2, 2)
+    assert attrs["translate"] == (4, 0, 10)
+    assert layer_type == "image"
+
+
+def test_read_region_at_level_is_aligned_with_level(ome_zarr_path: str):
+    layer = read_tomogram_ome_zarr(ome_zarr_path)
+    data, attrs, _ = layer
+    whole_data, whole_attrs, _ = _handle_image_at_resolution((data, dict(attrs), "image"), MID_RESOLUTION)
+
+    region, region_attrs, _ = read_region(layer, (8, -100, 8), (16, 100, 100), level=1)
+
+    np.testing.assert_array_equal(region, np.asarray(whole_data[2:5, :, 2:]))
+    assert region_attrs["scale"] == whole_attrs["scale"]
+    np.testing.assert_allclose(
+        region_attrs["translate"],
+        np.asarray(whole_attrs["translate"]) + np.array((2, 0, 2)) * 4,
+    )
+
+
+def test_read_region_of_segmentation_mask(ome_zarr_path: str):
+    layer = read_segmentation_mask_ome_zarr(ome_zarr_path)
+
+    data, attrs, layer_type = read_region(layer, (0, 0, 0), (3, 3, 3))
+
+    np.testing.assert_array_equal(data, np.asarray(layer[0][0])[:2, :2, :2])
+    assert attrs["translate"] == (0, 0, 0)
+    assert layer_type == "labels"
+
+
+def test_read_region_outside_is_empty(ome_zarr_path: str):
+    layer = read_tomogram_ome_zarr(ome_zarr_path)
+
+    data, _, _ = read_region(layer, (100, 0, 0), (200, 10, 10))
+
+    assert data.shape == (0, 6, 6)
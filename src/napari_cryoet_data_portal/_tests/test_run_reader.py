@@ -0,0 +1,64 @@
+from pathlib import Path
+
+import pytest
+
+from napari_cryoet_data_portal import _store
+from napari_cryoet_data_portal._cache import CACHE_DIR_ENV
+from napari_cryoet_data_portal._mirror import MirrorClient
+from napari_cryoet_data_portal._run_reader import read_runs
+from napari_cryoet_data_portal._tests._utils import write_mirror
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    path = tmp_path / "cache"
+    monkeypatch.setenv(CACHE_DIR_ENV, str(path))
+    return path
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    _store._CACHE.clear()
+    yield
+    _store._CACHE.clear()
+
+
+@pytest.fixture()
+def mirror(tmp_path: Path) -> str:
+    return write_mirror(str(tmp_path / "mirror"))
+
+
+def test_read_runs_reads_tomograms_and_annotations_with_few_queries(
+    mirror: str, monkeypatch: pytest.MonkeyPatch
+):
+    queries = []
+    find = MirrorClient.find
+
+    def counting_find(self, cls, query_filters=None):
+        queries.append(cls.__name__)
+        return find(self, cls, query_filters)
+
+    monkeypatch.setattr(MirrorClient, "find", counting_find)
+
+    layers = list(read_runs([1], uri=mirror))
+
+    assert sorted((attrs["name"], typ) for _, attrs, typ in layers) == [
+        ("TS_026", "image"),
+        ("TS_026-ribosome", "points"),
+    ]
+    assert sorted(queries) == [
+        "Annotation",
+        "AnnotationFile",
+        "Tomogram",
+        "TomogramVoxelSpacing",
+    ]
+
+
+def test_read_runs_without_annotations(mirror: str):
+    layers = list(read_runs([1], uri=mirror, annotations=False))
+
+    assert [typ for _, _, typ in layers] == ["image"]
+
+
+def test_read_runs_of_unknown_run(mirror: str):
+    assert list(read_runs([2], uri=mirror)) == []
@@ -0,0 +1,149 @@
+import asyncio
+import time
+
+import aiohttp
+import pytest
+
+from napari_cryoet_data_portal import _session, _store
+from napari_cryoet_data_portal._session import (
+    HttpOptions,
+    retry,
+    retry_async,
+    storage_options,
+)
+
+
+@pytest.fixture(autouse=True)
+def options():
+    options = HttpOptions(max_connections=4, retries=2, retry_backoff=0)
+    previous = _session.http_options()
+    _session.set_http_options(options)
+    yield options
+    _session.set_http_options(previous)
+
+
+def test_storage_options_share_session_for_http(options: HttpOptions):
+    http = storage_options("https://example.com/a.zarr")
+    other = storage_options("https://example.com/b.ndjson")
+
+    assert repr(http) == repr(other)
+    assert storage_options("/local/a.zarr") == {}
+
+    async def make_session():
+        session = await http["get_client"]()
+        limit = session.connector.limit
+        await session.close()
+        return limit
+
+    assert asyncio.run(make_session()) == options.max_connections
+
+
+def test_retry_recovers_from_transient_errors():
+    calls = []
+
+    def flaky():
+        calls.append(None)
+        if len(calls) < 3:
+            raise aiohttp.ServerDisconnectedError()
+        return "ok"
+
+    assert retry(flaky) == "ok"
+    assert len(calls) == 3
+
+
+def test_retry_raises_other_errors_immediately():
+    calls = []
+
+    def missing():
+        calls.append(None)
+        raise FileNotFoundError()
+
+    with pytest.raises(FileNotFoundError):
+        retry(missing)
+    assert len(calls) == 1
+
+
+@pytest.mark.parametrize(("status", "expected_calls"), [(503, 3), (404, 1)])
+def test_retry_retries_responses_only_with_transient_status(status: int, expected_calls: int):
+    calls = []
+
+    def respond():
+        calls.append(None)
+        raise aiohttp.ClientResponseError(None, (), status=status)
+
+    with pytest.raises(aiohttp.ClientResponseError):
+        retry(respond)
+    assert len(calls) == expected_calls
+
+
+def test_retry_async_gives_up_after_retries():
+    calls = []
+
+    async def timeout():
+        calls.append(None)
+        raise asyncio.TimeoutError()
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(retry_async(timeout))
+    assert len(calls) == 3
+
+
+def test_portal_url_honours_transport():
+    https, s3 = "https://example.com/a.zarr", "s3://bucket/a.zarr"
+
+    _session.set_http_options(HttpOptions(transport="s3"))
+    assert _session.portal_url(https, s3) == s3
+    assert _session.portal_url(https, None) == https
+
+    _session.set_http_options(HttpOptions(transport="https"))
+    assert _session.portal_url(https, s3) == https
+
+    with pytest.raises(ValueError):
+        HttpOptions(transport="ftp")
+
+
+def test_auto_transport_prefers_fastest_measured(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(_session, "_THROUGHPUT", _session._Throughput())
+    _session.set_http_options(HttpOptions(transport="auto"))
+    https, s3 = "https://example.com/a.zarr", "s3://bucket/a.zarr"
+    nbytes = 2**20
+
+    assert _session.portal_url(https, s3) == s3
+    _session.record_throughput(s3, nbytes, 2)
+    assert _session.portal_url(https, s3) == https
+    _session.record_throughput(https, nbytes, 1)
+    assert _session.portal_url(https, s3) == https
+    _session.record_throughput(s3, nbytes, 0.01)
+    assert _session.portal_url(https, s3) == s3
+
+
+def test_auto_transport_follows_throughput_measured_by_reads(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(_session, "_THROUGHPUT", _session._Throughput())
+    _session.set_http_options(HttpOptions(transport="auto"))
+    seconds = {"https": 0.001, "s3": 0.005}
+
+    def read_file(url):
+        time.sleep(seconds[url.split(":")[0]])
+        return bytes(2**20)
+
+    monkeypatch.setattr(_store, "_read_file", read_file)
+
+    def read(i):
+        url = _session.portal_url(f"https://example.com/{i}", f"s3://bucket/{i}")
+        _store.read_bytes(url)
+        return url.split(":")[0]
+
+    assert [read(i) for i in range(4)] == ["s3", "https", "https", "https"]
+    seconds["https"] = 0.1
+    transports = [read(i) for i in range(4, 20)]
+    assert transports[-1] == "s3"
+    _store._CACHE.clear()
+
+
+def test_storage_options_for_s3_are_anonymous():
+    _session.set_http_options(HttpOptions(s3_endpoint_url="http://localhost:9000"))
+
+    options = storage_options("s3://bucket/a.zarr")
+
+    assert options["anon"] is True
+    assert options["client_kwargs"] == {"endpoint_url": "http://localhost:9000"}
@@ -0,0 +1,160 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+import zarr
+
+from napari_cryoet_data_portal._cache import CACHE_DIR_ENV
+from napari_cryoet_data_portal._open_widget import (
+    LOW_RESOLUTION,
+    MID_RESOLUTION,
+    _handle_image_at_resolution,
+)
+from napari_cryoet_data_portal._reader import read_segmentation_mask_ome_zarr
+from napari_cryoet_data_portal._sparse import SparseChunkArray
+from napari_cryoet_data_portal._tests._utils import write_ome_zarr
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    path = tmp_path / "cache"
+    monkeypatch.setenv(CACHE_DIR_ENV, str(path))
+    return path
+
+
+@pytest.fixture()
+def mask_path(tmp_path: Path) -> str:
+    full = np.zeros((32, 32, 32), dtype=np.uint8)
+    full[8:16, 20:24, 4:8] = 1
+    levels = [full[::2**i, ::2**i, ::2**i] for i in range(3)]
+    return write_ome_zarr(str(tmp_path / "mask.zarr"), levels, scale=2)
+
+
+def test_read_segmentation_mask_ome_zarr(mask_path: str):
+    data, attrs, layer_type = read_segmentation_mask_ome_zarr(mask_path)
+
+    assert layer_type == "labels"
+    assert len(data) == 3
+    assert all(isinstance(d, SparseChunkArray) for d in data)
+    assert data[0].shape == (32, 32, 32)
+    assert data[1].shape == (16, 16, 16)
+    assert data[2].shape == (8, 8, 8)
+    np.testing.assert_allclose(attrs["scale"], (2, 2, 2))
+
+
+def test_occupancy_lists_only_stored_chunks(mask_path: str):
+    data, _, _ = read_segmentation_mask_ome_zarr(mask_path)
+
+    occupancy = data[0].load_occupancy()
+
+    assert occupancy is not None
+    assert occupancy.occupied == {(2, 5, 1), (3, 5, 1)}
+    assert occupancy.bounding_box() == ((8, 16), (20, 24), (4, 8))
+
+
+def test_crop_to_occupied_reads_same_values(mask_path: str):
+    data, _, _ = read_segmentation_mask_ome_zarr(mask_path)
+
+    cropped = data[0].crop_to_occupied()
+
+    assert cropped.origin == (8, 20, 4)
+    assert cropped.shape == (8, 4, 4)
+    expected = zarr.open_group(mask_path, mode="r")["0"][8:16, 20:24, 4:8]
+    np.testing.assert_array_equal(np.asarray(cropped), expected)
+    np.testing.assert_array_equal(cropped[1], expected[1])
+    np.testing.assert_array_equal(cropped[..., 1:3], expected[..., 1:3])
+
+
+def test_read_skips_empty_chunks(mask_path: str, monkeypatch: pytest.MonkeyPatch):
+    data, _, _ = read_segmentation_mask_ome_zarr(mask_path)
+    sparse = data[0]
+    assert sparse.load_occupancy() is not None
+    reads = []
+    array = sparse._array
+    monkeypatch.setattr(sparse, "_array", _RecordingArray(array, reads))
+
+    values = np.asarray(sparse)
+
+    assert values.sum() == 128
+    assert len(reads) == 2
+
+
+def test_read_occupied_finds_and_caches_unlisted_occupancy(mask_path: str, cache_dir: Path):
+    array = zarr.open_group(mask_path, mode="r")["1"]
+    url = "https://example.com/mask.zarr/1"
+
+    data, origin = SparseChunkArray(array, url).read_occupied()
+
+    assert origin == (4, 8, 0)
+    assert data.shape == (4, 4, 4)
+    assert data.sum() == 16
+    assert any(cache_dir.rglob("*.json"))
+    cached = SparseChunkArray(array, url).load_occupancy()
+    assert cached is not None
+    assert cached.occupied == {(1, 2, 0)}
+
+
+def test_unlisted_occupancy_reads_all_chunks(mask_path: str, monkeypatch: pytest.MonkeyPatch):
+    group = zarr.open_group(mask_path, mode="r+")
+    # A label that is too small to be in the coarser levels.
+    group["0"][0, 0, 0] = 2
+    sparse = SparseChunkArray(group["0"], "https://example.com/mask.zarr/0")
+    reads = []
+    monkeypatch.setattr(sparse, "_array", _RecordingArray(group["0"], reads))
+
+    values = np.asarray(sparse)
+
+    assert sparse.load_occupancy() is None
+    assert values[0, 0, 0] == 2
+    assert values.sum() == 130
+    assert len(reads) == 1
+
+
+def test_getitem_steps_through_read_bounds(mask_path: str):
+    data, _, _ = read_segmentation_mask_ome_zarr(mask_path)
+    expected = zarr.open_group(mask_path, mode="r")["0"][:]
+
+    np.testing.assert_array_equal(data[0][::2, 21:5:-3, 4], expected[::2, 21:5:-3, 4])
+    np.testing.assert_array_equal(data[0][8:8, ::-1], expected[8:8, ::-1])
+
+
+def test_getitem_rejects_fancy_keys(mask_path: str):
+    data, _, _ = read_segmentation_mask_ome_zarr(mask_path)
+
+    with pytest.raises(IndexError):
+        data[0][np.array([0, 1])]
+
+
+def test_handle_labels_at_resolution_offsets_translate(mask_path: str):
+    layer = read_segmentation_mask_ome_zarr(mask_path)
+
+    data, attrs, _ = _handle_image_at_resolution(layer, LOW_RESOLUTION)
+
+    assert isinstance(data, np.ndarray)
+    assert data.shape == (4, 4, 4)
+    np.testing.assert_allclose(attrs["scale"], (8, 8, 8))
+    np.testing.assert_allclose(attrs["translate"], (3, 3 + 4 * 8, 3))
+
+
+def test_handle_labels_at_mid_resolution_stays_lazy(mask_path: str):
+    layer = read_segmentation_mask_ome_zarr(mask_path)
+
+    data, attrs, _ = _handle_image_at_resolution(layer, MID_RESOLUTION)
+
+    assert isinstance(data, SparseChunkArray)
+    assert data.origin == (4, 8, 0)
+
+
+class _RecordingArray:
+    def __init__(self, array, reads) -> None:
+        self._array = array
+        self._reads = reads
+        self.shape = array.shape
+        self.chunks = array.chunks
+        self.ndim = array.ndim
+        self.dtype = array.dtype
+        self.fill_value = array.fill_value
+
+    def __getitem__(self, key):
+        self._reads.append(key)
+        return self._array[key]
@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+
+from napari_cryoet_data_portal._spatial import PointsIndex
+
+
+@pytest.fixture()
+def points():
+    rng = np.random.default_rng(0)
+    return {
+        "ribosome": rng.uniform(0, 100, (200, 3)),
+        "membrane": rng.uniform(0, 100, (50, 3)),
+        "empty": np.empty((0, 3)),
+    }
+
+
+def test_in_box_matches_brute_force(points):
+    index = PointsIndex(points)
+    lower, upper = np.array((10, 20, 30)), np.array((40, 80, 60))
+
+    found = index.in_box(lower, upper)
+
+    assert tuple(found) == ("ribosome", "membrane", "empty")
+    for name, p in points.items():
+        expected = np.flatnonzero(np.all((p >= lower) & (p <= upper), axis=1))
+        np.testing.assert_array_equal(found[name], expected)
+
+
+def test_in_slab_matches_brute_force(points):
+    index = PointsIndex(points)
+
+    found = index.in_slab(50, 10, axis=1)
+
+    for name, p in points.items():
+        expected = np.flatnonzero(np.abs(p[:, 1] - 50) <= 5)
+        np.testing.assert_array_equal(found[name], expected)
+
+
+def test_within_matches_brute_force(points):
+    index = PointsIndex(points)
+    center = np.array((50, 50, 50))
+
+    found = index.within(center, 25)
+
+    for name, p in points.items():
+        expected = np.flatnonzero(np.linalg.norm(p - center, axis=1) <= 25)
+        np.testing.assert_array_equal(found[name], expected)
+
+
+def test_nearest_matches_brute_force(points):
+    index = PointsIndex(points)
+    queries = np.array(((0, 0, 0), (50, 50, 50)))
+    all_points = np.concatenate(list(points.values()))
+    names = np.repeat(np.arange(3), [len(p) for p in points.values()])
+    indices = np.concatenate([np.arange(len(p)) for p in points.values()])
+
+    distances, annotations, found = index.nearest(queries, k=2)
+
+    assert distances.shape == annotations.shape == found.shape == (2, 2)
+    for i, query in enumerate(queries):
+        expected = np.argsort(np.linalg.norm(all_points - query, axis=1))[:2]
+        np.testing.assert_array_equal(annotations[i], names[expected])
+        np.testing.assert_array_equal(found[i], indices[expected])
+
+
+def test_nearest_with_too_few_points():
+    index = PointsIndex({"one": [(1, 2, 3)]})
+
+    distances, annotations, found = index.nearest([(1, 2, 3)], k=2)
+
+    np.testing.assert_array_equal(distances, [[0, np.inf]])
+    np.testing.assert_array_equal(annotations, [[0, -1]])
+    np.testing.assert_array_equal(found, [[0, -1]])
+
+
+def test_empty_index():
+    index = PointsIndex({})
+
+    assert len(index) == 0
+    assert index.in_box((0, 0, 0), (1, 1, 1)) == {}
+    assert index.within((0, 0, 0), 1) == {}
+    distances, _, _ = index.nearest([(0, 0, 0)])
+    np.testing.assert_array_equal(distances, [[np.inf]])
+
+
+def test_from_layers_uses_physical_coordinates():
+    layers = [
+        (np.zeros((2, 3)), {"name": "TS_026"}, "image"),
+        ([(1, 1, 1), (2, 2, 2)], {"name": "ribosome", "scale": (10, 10, 10)}, "points"),
+        ([(1, 1, 1)], {"name": "ribosome", "scale": (10, 10, 10), "translate": (0, 0, 100)}, "points"),
+    ]
+
+    index = PointsIndex.from_layers(layers)
+
+    assert index.names == ("ribosome", "ribosome [1]")
+    found = index.in_box((5, 5, 5), (15, 15, 15))
+    np.testing.assert_array_equal(found["ribosome"], [0])
+    np.testing.assert_array_equal(found["ribosome [1]"], [])
+
+
+def test_mask(points):
+    index = PointsIndex(points)
+    found = index.in_slab(50, 10)
+
+    mask = index.mask(found, "membrane")
+
+    np.testing.assert_array_equal(mask, np.abs(points["membrane"][:, 0] - 50) <= 5)
@@ -0,0 +1,56 @@
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from napari_cryoet_data_portal._cache import CACHE_DIR_ENV
+from napari_cryoet_data_portal._statistics import (
+    HISTOGRAM_BINS,
+    compute_image_statistics,
+    load_tomogram_statistics,
+)
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    path = tmp_path / "cache"
+    monkeypatch.setenv(CACHE_DIR_ENV, str(path))
+    return path
+
+
+def test_compute_image_statistics_ignores_outliers():
+    data = np.linspace(0, 1, 10000, dtype=np.float32)
+    data[0] = -1000
+    data[-1] = 1000
+
+    statistics = compute_image_statistics(data)
+
+    low, high = statistics.contrast_limits
+    assert 0 <= low < 0.01
+    assert 0.99 < high <= 1
+    assert len(statistics.counts) == HISTOGRAM_BINS
+    assert sum(statistics.counts) == data.size
+    assert statistics.bin_edges[0] == -1000
+    assert statistics.bin_edges[-1] == 1000
+
+
+def test_compute_image_statistics_of_constant_image():
+    statistics = compute_image_statistics(np.full((4, 4), 3, dtype=np.uint8))
+
+    assert statistics.contrast_limits == (3, 4)
+
+
+def test_load_tomogram_statistics_is_cached():
+    tomogram = SimpleNamespace(id=1, name="TS_001", https_omezarr_dir="https://example.com/TS_001.zarr")
+    data = np.arange(100, dtype=np.float32)
+
+    computed = load_tomogram_statistics(tomogram, data)
+    cached = load_tomogram_statistics(tomogram, _UnreadableArray())
+
+    assert cached == computed
+
+
+class _UnreadableArray:
+    def __array__(self, *args, **kwargs):
+        raise AssertionError("Data should not be read")
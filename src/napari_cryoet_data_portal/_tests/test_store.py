@@ -0,0 +1,231 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import fsspec
+import numpy as np
+import pytest
+import zarr
+from zarr.core.buffer import default_buffer_prototype
+from zarr.storage import MemoryStore
+
+from napari_cryoet_data_portal import _store
+from napari_cryoet_data_portal._cache import CACHE_DIR_ENV, JsonCache
+from napari_cryoet_data_portal._reader import read_tomogram_ome_zarr
+from napari_cryoet_data_portal._store import (
+    CachedStore,
+    open_store,
+    preload_metadata,
+    read_bytes,
+)
+from napari_cryoet_data_portal._tests._utils import write_ome_zarr
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    path = tmp_path / "cache"
+    monkeypatch.setenv(CACHE_DIR_ENV, str(path))
+    return path
+
+
+@pytest.fixture()
+def image_path(tmp_path: Path) -> str:
+    data = np.zeros((8, 8, 8), dtype=np.uint8)
+    levels = [data, data[::2, ::2, ::2], data[::4, ::4, ::4]]
+    return write_ome_zarr(str(tmp_path / "image.zarr"), levels)
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    _store._CACHE.clear()
+    yield
+    _store._CACHE.clear()
+
+
+class _SlowStore(MemoryStore):
+    def __init__(self) -> None:
+        super().__init__()
+        self.gets = 0
+
+    async def get(self, key, prototype, byte_range=None):
+        self.gets += 1
+        await asyncio.sleep(0.05)
+        return await super().get(key, prototype, byte_range)
+
+
+def test_concurrent_store_gets_share_one_fetch():
+    inner = _SlowStore()
+    prototype = default_buffer_prototype()
+
+    async def run():
+        await inner.set("a", prototype.buffer.from_bytes(b"data"))
+        stores = [CachedStore(inner, "memory://x") for _ in range(3)]
+        return await asyncio.gather(*(s.get("a", prototype) for s in stores)), stores
+
+    values, stores = asyncio.run(run())
+
+    assert inner.gets == 1
+    assert all(v.to_bytes() == b"data" for v in values)
+    assert sum(s.bytes_fetched for s in stores) == 4
+
+
+def test_cancelled_store_get_does_not_cancel_shared_fetch():
+    inner = _SlowStore()
+    prototype = default_buffer_prototype()
+
+    async def run():
+        await inner.set("a", prototype.buffer.from_bytes(b"data"))
+        owner = asyncio.ensure_future(CachedStore(inner, "memory://z").get("a", prototype))
+        await asyncio.sleep(0)
+        waiters = [
+            asyncio.ensure_future(CachedStore(inner, "memory://z").get("a", prototype))
+            for _ in range(2)
+        ]
+        await asyncio.sleep(0.01)
+        waiters[0].cancel()
+        return await asyncio.gather(owner, waiters[1])
+
+    values = asyncio.run(run())
+
+    assert inner.gets == 1
+    assert [v.to_bytes() for v in values] == [b"data", b"data"]
+
+
+def test_concurrent_read_bytes_share_one_fetch(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    path = tmp_path / "points.ndjson"
+    path.write_bytes(b"{}")
+    opens = []
+    lock = threading.Lock()
+    fs_open = fsspec.open
+
+    def slow_open(url, *args, **kwargs):
+        with lock:
+            opens.append(url)
+        time.sleep(0.05)
+        return fs_open(url, *args, **kwargs)
+
+    monkeypatch.setattr(fsspec, "open", slow_open)
+
+    with ThreadPoolExecutor(4) as executor:
+        values = list(executor.map(read_bytes, [str(path)] * 4))
+
+    assert values == [b"{}"] * 4
+    assert len(opens) == 1
+
+
+def test_failed_read_bytes_is_not_cached(tmp_path: Path):
+    path = str(tmp_path / "missing.ndjson")
+
+    with pytest.raises(FileNotFoundError):
+        read_bytes(path)
+
+    Path(path).write_bytes(b"{}")
+    assert read_bytes(path) == b"{}"
+
+
+def test_json_cache_put_from_many_threads(cache_dir: Path):
+    cache = JsonCache("test")
+    values = [{"value": i} for i in range(32)]
+
+    with ThreadPoolExecutor(8) as executor:
+        list(executor.map(lambda v: cache.put("key", v), values))
+
+    assert cache.get("key") in values
+    assert list(cache_dir.rglob("*.tmp")) == []
+
+
+def test_preload_metadata_fetches_concurrently_then_persists(image_path: str):
+    store = open_store(image_path)
+
+    preload_metadata(store)
+
+    # One round for the root group and one for its arrays and labels.
+    assert store.fetch_count == 5 + 4 * 4
+    _store._CACHE.clear()
+    store = open_store(image_path)
+    preload_metadata(store)
+    group = zarr.open_group(store, mode="r")
+    assert [group[p].shape for p in ("0", "1", "2")] == [(8, 8, 8), (4, 4, 4), (2, 2, 2)]
+    assert store.fetch_count == 0
+
+
+def test_preload_metadata_fetches_again_after_max_age(image_path: str, monkeypatch: pytest.MonkeyPatch):
+    preload_metadata(open_store(image_path))
+    monkeypatch.setattr(_store, "METADATA_MAX_AGE_SECONDS", -1)
+    _store._CACHE.clear()
+    store = open_store(image_path)
+
+    preload_metadata(store)
+
+    assert store.fetch_count == 5 + 4 * 4
+
+
+def test_preload_metadata_uses_consolidated_metadata(image_path: str):
+    zarr.consolidate_metadata(image_path)
+    store = open_store(image_path)
+
+    preload_metadata(store)
+
+    assert store.fetch_count == 5
+    group = zarr.open_group(store, mode="r")
+    assert group["2"].shape == (2, 2, 2)
+    assert store.fetch_count == 5
+
+
+def test_read_tomogram_ome_zarr_after_preload(image_path: str):
+    preload_metadata(open_store(image_path))
+
+    data, attrs, layer_type = read_tomogram_ome_zarr(image_path)
+
+    assert layer_type == "image"
+    assert [d.shape for d in data] == [(8, 8, 8), (4, 4, 4), (2, 2, 2)]
+
+
+def _write_sharded_array(path: str) -> np.ndarray:
+    data = np.arange(16**3, dtype=np.uint16).reshape((16, 16, 16))
+    array = zarr.create_array(
+        path, shape=data.shape, chunks=(4, 4, 4), shards=(16, 16, 16),
+        dtype=data.dtype, zarr_format=3,
+    )
+    array[:] = data
+    return data
+
+
+def test_read_ahead_coalesces_chunk_reads_in_shard(tmp_path: Path):
+    path = str(tmp_path / "sharded.zarr")
+    data = _write_sharded_array(path)
+    fetch_counts = []
+
+    for read_ahead_bytes in (0, 2**20):
+        _store._CACHE.clear()
+        store = CachedStore(open_store(path)._store, path, read_ahead_bytes=read_ahead_bytes)
+        array = zarr.open_array(store, mode="r")
+        for z in range(0, 12, 4):
+            np.testing.assert_array_equal(array[z:z + 4, :4, :4], data[z:z + 4, :4, :4])
+        fetch_counts.append(store.fetch_count)
+
+    # Three chunk requests become one.
+    assert fetch_counts[1] == fetch_counts[0] - 2
+
+
+def test_read_ahead_fetches_each_window_once_for_concurrent_chunk_reads(tmp_path: Path):
+    path = str(tmp_path / "sharded.zarr")
+    data = np.arange(32**3, dtype=np.uint16).reshape((32, 32, 32))
+    array = zarr.create_array(
+        path, shape=data.shape, chunks=(4, 8, 8), shards=(32, 32, 32),
+        dtype=data.dtype, compressors=None, zarr_format=3,
+    )
+    array[:] = data
+    store = CachedStore(open_store(path)._store, path, read_ahead_bytes=2**14)
+    array = zarr.open_array(store, mode="r")
+    metadata_bytes, metadata_count = store.bytes_fetched, store.fetch_count
+
+    # The 16 chunks are read concurrently and lie in the first two windows
+    # of the shard, which are each fetched once.
+    np.testing.assert_array_equal(array[0:4], data[0:4])
+
+    index_bytes = 16 * 8 * 4 * 4 + 4
+    assert store.bytes_fetched - metadata_bytes == index_bytes + 2 * 2**14
+    assert store.fetch_count - metadata_count == 3
@@ -0,0 +1,93 @@
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+import pytest
+import zarr
+
+from napari_cryoet_data_portal import _subtomograms
+from napari_cryoet_data_portal._subtomograms import extract_subtomograms
+from napari_cryoet_data_portal._tests._utils import write_ome_zarr
+
+
+@pytest.fixture()
+def data() -> np.ndarray:
+    return np.arange(16 * 16 * 16, dtype=np.int32).reshape((16, 16, 16))
+
+
+@pytest.fixture()
+def image_path(tmp_path: Path, data: np.ndarray) -> str:
+    levels = [data, data[::2, ::2, ::2]]
+    return write_ome_zarr(str(tmp_path / "image.zarr"), levels)
+
+
+@pytest.fixture()
+def chunk_reads(monkeypatch: pytest.MonkeyPatch) -> Counter:
+    reads: Counter = Counter()
+    read_chunk = _subtomograms._read_chunk
+
+    def counted(array, chunk):
+        reads[chunk] += 1
+        return read_chunk(array, chunk)
+
+    monkeypatch.setattr(_subtomograms, "_read_chunk", counted)
+    return reads
+
+
+def _expected(data: np.ndarray, center, size: int, fill_value=0) -> np.ndarray:
+    padded = np.pad(data, size, constant_values=fill_value)
+    start = np.asarray(center) - size // 2 + size
+    return padded[tuple(slice(s, s + size) for s in start)]
+
+
+def test_extract_subtomograms_matches_slicing(image_path: str, data: np.ndarray, chunk_reads: Counter):
+    points = [(8, 8, 8), (9, 8, 7), (1, 2, 3), (15, 15, 15)]
+
+    cubes = extract_subtomograms(image_path, points, 6)
+
+    assert cubes.shape == (4, 6, 6, 6)
+    for cube, point in zip(cubes, points):
+        np.testing.assert_array_equal(cube, _expected(data, point, 6))
+    # Overlapping cubes share chunks, which are only read once.
+    assert max(chunk_reads.values()) == 1
+
+
+def test_extract_subtomograms_at_level(image_path: str, data: np.ndarray):
+    cubes = extract_subtomograms(image_path, [(8, 8, 8)], (2, 4, 4), level=1, fill_value=-1)
+
+    np.testing.assert_array_equal(cubes[0], data[::2, ::2, ::2][3:5, 2:6, 2:6])
+
+
+def test_extract_subtomograms_outside_is_filled(image_path: str):
+    cubes = extract_subtomograms(image_path, [(-10, 0, 0)], 4, fill_value=-1)
+
+    np.testing.assert_array_equal(cubes[0], -1)
+
+
+def test_extract_subtomograms_within_memory_budget_writes_to_disk(
+    image_path: str, data: np.ndarray, tmp_path: Path, chunk_reads: Counter
+):
+    rng = np.random.default_rng(0)
+    points = rng.integers(0, 16, (20, 3))
+    output_path = str(tmp_path / "cubes.zarr")
+    # Only hold the chunks of a single cube at once.
+    chunk_bytes = 4 * 4 * 4 * data.dtype.itemsize
+
+    cubes = extract_subtomograms(image_path, points, 4, output_path=output_path, max_bytes=8 * chunk_bytes)
+
+    stored = zarr.open_array(output_path, mode="r")
+    assert stored.shape == (20, 4, 4, 4)
+    for i, point in enumerate(points):
+        np.testing.assert_array_equal(stored[i], _expected(data, point, 4))
+    np.testing.assert_array_equal(cubes[:], stored[:])
+    # Points are visited in order, so most chunks are still read once.
+    assert sum(chunk_reads.values()) < 2 * len(chunk_reads)
+
+
+def test_batches_limit_chunks():
+    starts = np.array([(0, 0, 0), (8, 8, 8), (1, 1, 1)])
+
+    batches = list(_subtomograms._batches(starts, (4, 4, 4), (16, 16, 16), (4, 4, 4), 8))
+
+    assert [b for b, _ in batches] == [[0, 2], [1]]
+    assert all(len(chunks) <= 8 for _, chunks in batches)
@@ -78,4 +78,16 @@ def test_disconnected_only_shows_uri(widget: DataPortalWidget):
     assert all(
         w.isVisibleTo(widget) == (w is widget._uri)
         for w in sub_widgets
-    )
\ No newline at end of file
+    )
+
+
+def test_prefetch_controls_update_prefetcher(widget: DataPortalWidget):
+    widget._open.prefetch_depth.setValue(3)
+    widget._open.prefetch_rate.setValue(0)
+
+    assert widget._prefetcher.depth == 3
+    assert widget._prefetcher.max_bytes_per_second is None
+
+    widget._open.prefetch_rate.setValue(5)
+
+    assert widget._prefetcher.max_bytes_per_second == 5 * 2**20
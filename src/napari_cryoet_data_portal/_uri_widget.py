@@ -3,6 +3,7 @@ from typing import Optional, Tuple
 from qtpy.QtCore import Signal
 from qtpy.QtWidgets import (
     QComboBox,
+    QFileDialog,
     QGroupBox,
     QHBoxLayout,
     QLineEdit,
@@ -10,10 +11,12 @@ from qtpy.QtWidgets import (
     QVBoxLayout,
     QWidget,
 )
-from cryoet_data_portal import Client, Dataset, Run, Tomogram, TomogramVoxelSpacing
+from cryoet_data_portal import Dataset, Run, Tomogram, TomogramVoxelSpacing
 
-from napari_cryoet_data_portal._filter import Filter, make_filter
+from napari_cryoet_data_portal._client_pool import get_client
+from napari_cryoet_data_portal._filter import Filter, SearchFilter, make_filter
 from napari_cryoet_data_portal._logging import logger
+from napari_cryoet_data_portal._mirror import mirror_root
 from napari_cryoet_data_portal._progress_widget import ProgressWidget
 
 
@@ -36,12 +39,16 @@ class UriWidget(QGroupBox):
         self._disconnect_button = QPushButton("Disconnect")
 
         self._uri_edit = QLineEdit(GRAPHQL_URI)
-        # Only allow the default portal URI because invalid ones will cause
-        # indefinite hangs:
-        # https://github.com/chanzuckerberg/cryoet-data-portal/issues/16
-        self._uri_edit.setReadOnly(True)
         self._uri_edit.setCursorPosition(0)
         self._uri_edit.setPlaceholderText("Enter a URI to CryoET portal data")
+        self._uri_edit.setToolTip(
+            "The portal URI or the directory of a local mirror of the portal"
+        )
+        self._mirror_button = QPushButton("Mirror...")
+        self._mirror_button.setToolTip(
+            "Choose the directory of a local mirror written by "
+            "napari-cryoet-data-portal-download"
+        )
         
         filter_ids_layout = QHBoxLayout()
         filter_ids_layout.setContentsMargins(0, 0, 0, 0)
@@ -50,8 +57,12 @@ class UriWidget(QGroupBox):
         self._filter_ids_type.addItem("Run IDs", Run)
         self._filter_ids_type.addItem("Voxel Spacing IDs", TomogramVoxelSpacing)
         self._filter_ids_type.addItem("Tomogram IDs", Tomogram)
+        self._filter_ids_type.addItem("Search", SearchFilter)
         self._filter_ids_edit = QLineEdit()
-        self._filter_ids_edit.setToolTip("Comma separated IDs of interest")
+        self._filter_ids_edit.setToolTip(
+            "Comma separated IDs of interest, or text to search for in "
+            "dataset titles, run names, tomogram names and object names"
+        )
         filter_ids_layout.addWidget(self._filter_ids_type)
         filter_ids_layout.addWidget(self._filter_ids_edit)
         
@@ -63,6 +74,7 @@ class UriWidget(QGroupBox):
 
         self._connect_button.clicked.connect(self._onConnectClicked)
         self._disconnect_button.clicked.connect(self._onDisconnectClicked)
+        self._mirror_button.clicked.connect(self._onMirrorClicked)
         self._uri_edit.returnPressed.connect(self._onConnectClicked)
         self._filter_ids_edit.returnPressed.connect(self._onConnectClicked)
 
@@ -71,6 +83,7 @@ class UriWidget(QGroupBox):
         control_layout.addWidget(self._connect_button)
         control_layout.addWidget(self._disconnect_button)
         control_layout.addWidget(self._uri_edit)
+        control_layout.addWidget(self._mirror_button)
 
         layout = QVBoxLayout()
         layout.addLayout(control_layout)
@@ -81,14 +94,23 @@ class UriWidget(QGroupBox):
 
     def _onConnectClicked(self) -> None:
         uri = self._uri_edit.text().strip()
-        filter_ids = _csv_to_ids(self._filter_ids_edit.text())
-        filter = make_filter(
-            self._filter_ids_type.currentData(),
-            ids=filter_ids,
-        )
+        filter_type = self._filter_ids_type.currentData()
+        filter: Filter
+        if filter_type is SearchFilter:
+            filter = SearchFilter(text=self._filter_ids_edit.text().strip())
+        else:
+            filter_ids = _csv_to_ids(self._filter_ids_edit.text())
+            filter = make_filter(filter_type, ids=filter_ids)
         logger.debug("UriWidget._onConnectClicked: %s, %s", uri, filter)
         self._progress.submit(uri, filter)
 
+    def _onMirrorClicked(self) -> None:
+        logger.debug("UriWidget._onMirrorClicked")
+        path = QFileDialog.getExistingDirectory(self, "Choose a local mirror")
+        if path:
+            self._uri_edit.setText(path)
+            self._onConnectClicked()
+
     def _onDisconnectClicked(self) -> None:
         logger.debug("UriWidget._onDisconnectClicked")
         self._progress.cancel()
@@ -96,7 +118,14 @@ class UriWidget(QGroupBox):
         self.disconnected.emit()
 
     def _connect(self, uri: str, filter: Filter) -> Tuple[str, Filter]:
-        _ = Client(uri)
+        # Only allow the default portal URI or local mirrors because invalid
+        # portal URIs will cause indefinite hangs:
+        # https://github.com/chanzuckerberg/cryoet-data-portal/issues/16
+        if uri != GRAPHQL_URI and mirror_root(uri) is None:
+            raise ValueError(
+                f"URI must be {GRAPHQL_URI} or a directory of a local mirror: {uri}"
+            )
+        _ = get_client(uri)
         return uri, filter
 
     def _onConnected(self, result: Tuple[str, Filter]) -> None:
@@ -108,6 +137,8 @@ class UriWidget(QGroupBox):
     def _updateVisibility(self, uri_exists: bool) -> None:
         logger.debug("UriWidget._updateVisibility: %s", uri_exists)
         self._connect_button.setVisible(not uri_exists)
+        self._mirror_button.setVisible(not uri_exists)
+        self._uri_edit.setReadOnly(uri_exists)
         self._filter_ids_type.setDisabled(uri_exists)
         self._filter_ids_edit.setReadOnly(uri_exists)
         self._disconnect_button.setVisible(uri_exists)
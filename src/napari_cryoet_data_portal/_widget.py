@@ -1,4 +1,4 @@
-from typing import TYPE_CHECKING, Optional
+from typing import TYPE_CHECKING, List, Optional
 
 from qtpy.QtCore import Qt
 from qtpy.QtWidgets import (
@@ -8,10 +8,12 @@ from qtpy.QtWidgets import (
 )
 from cryoet_data_portal import Tomogram
 
+from napari_cryoet_data_portal._client_pool import clear_clients
 from napari_cryoet_data_portal._listing_widget import ListingWidget
 from napari_cryoet_data_portal._logging import logger
 from napari_cryoet_data_portal._metadata_widget import MetadataWidget
 from napari_cryoet_data_portal._open_widget import OpenWidget
+from napari_cryoet_data_portal._prefetch import Prefetcher
 from napari_cryoet_data_portal._uri_widget import UriWidget
 
 if TYPE_CHECKING:
@@ -50,11 +52,24 @@ class DataPortalWidget(QWidget):
         self._open = OpenWidget(napari_viewer)
         self._open.hide()
 
+        self._prefetcher = Prefetcher(self)
+
         self._uri.connected.connect(self._onUriConnected)
         self._uri.disconnected.connect(self._onUriDisconnected)
         self._listing.tree.currentItemChanged.connect(
             self._onListingItemChanged
         )
+        self._listing.tree.itemSelectionChanged.connect(
+            self._onListingSelectionChanged
+        )
+        self._open.open.clicked.connect(self._prefetcher.cancel)
+        self._open.prefetch_depth.valueChanged.connect(
+            self._onPrefetchDepthChanged
+        )
+        self._open.prefetch_rate.valueChanged.connect(
+            self._onPrefetchRateChanged
+        )
+        self._open.loaded.connect(self._onTomogramLoaded)
 
         layout = QVBoxLayout()
         layout.addWidget(self._uri)
@@ -67,11 +82,24 @@ class DataPortalWidget(QWidget):
 
     def _onUriConnected(self, uri: str, filter: object) -> None:
         logger.debug("DataPortalWidget._onUriConnected")
+        self._metadata.setUri(uri)
         self._open.setUri(uri)
+        self._prefetcher.setUri(uri)
         self._listing.load(uri, filter=filter)
 
+    def _onPrefetchDepthChanged(self, depth: int) -> None:
+        logger.debug("DataPortalWidget._onPrefetchDepthChanged: %s", depth)
+        self._prefetcher.depth = depth
+
+    def _onPrefetchRateChanged(self, rate: float) -> None:
+        logger.debug("DataPortalWidget._onPrefetchRateChanged: %s", rate)
+        # Zero means that the rate is not limited.
+        self._prefetcher.max_bytes_per_second = rate * 2**20 if rate > 0 else None
+
     def _onUriDisconnected(self) -> None:
         logger.debug("DataPortalWidget._onUriDisconnected")
+        self._prefetcher.cancel()
+        clear_clients()
         for widget in (self._listing, self._metadata, self._open):
             widget.cancel()
             widget.hide()
@@ -80,6 +108,7 @@ class DataPortalWidget(QWidget):
         self, item: QTreeWidgetItem, old_item: QTreeWidgetItem
     ) -> None:
         logger.debug("DataPortalWidget._onListingItemClicked: %s", item)
+        self._prefetcher.cancel()
         # The new current item can be none when reconnecting since that
         # clears the listing tree.
         if item is None:
@@ -88,7 +117,37 @@ class DataPortalWidget(QWidget):
             return
         data = item.data(0, Qt.ItemDataRole.UserRole)
         self._metadata.load(data)
+        if len(self._selectedTomograms()) > 1:
+            # Many selected tomograms are handled when the selection changes.
+            return
         if isinstance(data, Tomogram):
             self._open.setTomogram(data)
         else:
             self._open.hide()
+
+    def _onListingSelectionChanged(self) -> None:
+        logger.debug("DataPortalWidget._onListingSelectionChanged")
+        tomograms = self._selectedTomograms()
+        if len(tomograms) > 1:
+            self._prefetcher.cancel()
+            self._open.setTomograms(tomograms)
+        elif len(tomograms) == 1 and len(self._open.tomograms()) > 1:
+            # Reducing a selection may not change the current item.
+            self._open.setTomogram(tomograms[0])
+
+    def _selectedTomograms(self) -> List[Tomogram]:
+        items = self._listing.tree.selectedItems()
+        data = (item.data(0, Qt.ItemDataRole.UserRole) for item in items)
+        return [d for d in data if isinstance(d, Tomogram)]
+
+    def _onTomogramLoaded(self, tomogram: Tomogram) -> None:
+        logger.debug("DataPortalWidget._onTomogramLoaded: %s", tomogram)
+        item = self._listing.tree.currentItem()
+        if item is None or item.data(0, Qt.ItemDataRole.UserRole) is not tomogram:
+            return
+        neighbours = self._listing.tree.neighbourItems(
+            item, self._prefetcher.depth
+        )
+        self._prefetcher.submit(
+            [n.data(0, Qt.ItemDataRole.UserRole) for n in neighbours]
+        )